@@ -1,53 +1,268 @@
 # app/agent.py
+import asyncio
 import json
-import os
 import logging
-import traceback
 import re
-from typing import List, Optional, Dict, Any, Tuple
-from uuid import uuid4
+import time
+from typing import Annotated, List, Optional, Dict, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, SkipValidation, ValidationError
 
-# Import LangChain components
+# Import LangChain components (provider integrations such as langchain_openai are
+# imported lazily in get_llm, since they dominate cold-start time)
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
-from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
-from langchain.chains.llm import LLMChain
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, SystemMessage, ToolMessage, BaseMessage, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+from langchain_core.utils.json import parse_partial_json
 
 # Import LangGraph components
 from langgraph.graph import StateGraph
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
-
-# Import LiteLLM for model provider abstraction
-import litellm
 
 # Schemas and config imports
 from .schemas import GaiaAnswer
 from .config import settings
-from .tools import TOOLS, web_search_tool, code_execution_tool
+from .tools import TOOLS
+from .checkpoint import get_checkpointer
+from .llm_cache import get_llm_cache, is_deterministic
+from .deadline import Deadline, current_deadline
+from .budget import AgentBudget, current_budget
+from .observations import create_observation_compressor
+from .http_clients import get_provider_client
+from .metrics import AGENT_ITERATIONS, AGENT_STOPS, AGENT_TOKENS, ANSWERS, DEADLINES, ERRORS, REGISTRY, TOOL_CALLS, TOOL_DURATION, LLMMetricsCallbackHandler, instrument_node
 
 # Define MAX_AGENT_ITERATIONS constant
 MAX_AGENT_ITERATIONS = settings.max_agent_iterations
 
 # Define AgentState class for LangGraph
+class Replace(list):
+    """A list written to an append-only AgentState field that replaces its value instead
+    (a new turn starting from compacted history, with an empty step log)."""
+
+def append_items(existing: List[Any], new: List[Any]) -> List[Any]:
+    """Reducer of the append-only AgentState fields: nodes return only the entries they add."""
+    if isinstance(new, Replace):
+        return list(new)
+    return existing + new if new else existing
+
 class AgentState(BaseModel):
-    """State object for the LangGraph agent."""
-    messages: List[BaseMessage] = Field(default_factory=list)
+    """State object for the LangGraph agent.
+
+    `messages` and `intermediate_steps_log` only grow during a run, so nodes return just
+    what they add (see StateUpdate) and the `append_items` reducer appends it: a node's
+    update, and the "updates" stream event carrying it, stay the same size however long
+    the run gets. Step-log entries are compact: a `tool_observation` step names its tool
+    call, and the observation text lives only in the matching ToolMessage.
+    """
+    messages: Annotated[SkipValidation[List[BaseMessage]], append_items] = Field(default_factory=list)
     current_gaia_question: Optional[str] = None
     iteration: int = 0
-    intermediate_steps_log: List[Dict[str, Any]] = Field(default_factory=list)
+    intermediate_steps_log: Annotated[SkipValidation[List[Dict[str, Any]]], append_items] = Field(default_factory=list)
+
+class StateUpdate:
+    """What one graph node adds to the state: messages and step-log entries to append,
+    and new values for the other fields. `as_dict()` is the node's return value."""
+
+    __slots__ = ("messages", "steps", "values")
+
+    def __init__(self):
+        self.messages: List[BaseMessage] = []
+        self.steps: List[Dict[str, Any]] = []
+        self.values: Dict[str, Any] = {}
+
+    def log(self, step_type: str, content: Any) -> None:
+        self.steps.append({"type": step_type, "content": content})
+
+    def as_dict(self) -> Dict[str, Any]:
+        # Untouched fields are left out, so their channels (and checkpoint blobs) aren't rewritten
+        update = dict(self.values)
+        if self.messages:
+            update["messages"] = self.messages
+        if self.steps:
+            update["intermediate_steps_log"] = self.steps
+        return update
 
 # --- Basic Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_llm():
-    """Initialize and return the LLM based on configuration."""
-    provider = settings.llm_provider.lower().strip('"\'')
+# --- Prompt and answer parsing (built once at import time) ---
+AGENT_SYSTEM_PROMPT = """You are a helpful AI assistant that can answer questions about a wide range of topics.
+You can search the web for information using the web_search tool, and you can execute code using the code_execution tool.
+Call several tools at once when their inputs don't depend on each other."""
+KNOWLEDGE_INSTRUCTIONS = """Look facts up with the knowledge_search tool before web_search: it searches a local document collection and falls back to the web when nothing there is relevant."""
+
+# The final answer is itself a tool call whose arguments are a GaiaAnswer
+ANSWER_TOOL = GaiaAnswer.__name__
+ANSWER_INSTRUCTIONS_STRUCTURED = f"""When you have enough information, call the {ANSWER_TOOL} tool with the final answer, your reasoning and the source URLs you used, instead of replying in text."""
+ANSWER_INSTRUCTIONS_TEXT = """When you have enough information, reply without tool calls.
+Always provide your reasoning process and cite sources when possible, using "Reasoning:" and "Source: <url>" lines."""
+
+def build_agent_prompt(cache_control: bool = False, structured: bool = True, knowledge: bool = False) -> ChatPromptTemplate:
+    """System prompt followed by the conversation.
+
+    The system prompt is the stable prefix of every model call. With `cache_control` it is
+    sent as a content block marked `{"type": "ephemeral"}`, which providers with explicit
+    prompt caching (Anthropic, Gemini via OpenRouter) use to reuse the prefix across calls;
+    providers with automatic prefix caching need no marker. `structured` asks for the final
+    answer as a call to the GaiaAnswer tool rather than as labelled text. `knowledge` points
+    the model at the knowledge_search tool (registered when a local index is configured).
+    """
+    text = f"{AGENT_SYSTEM_PROMPT}\n{KNOWLEDGE_INSTRUCTIONS}" if knowledge else AGENT_SYSTEM_PROMPT
+    text = f"{text}\n{ANSWER_INSTRUCTIONS_STRUCTURED if structured else ANSWER_INSTRUCTIONS_TEXT}"
+    if cache_control:
+        system = SystemMessage(content=[{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}])
+    else:
+        system = ("system", text)
+    return ChatPromptTemplate.from_messages([system, MessagesPlaceholder("messages")])
+
+AGENT_PROMPT = build_agent_prompt(settings.llm_prompt_cache_control, settings.structured_answers, bool(settings.knowledge_index_path))
+
+REASONING_PATTERN = re.compile(r"(?:Reasoning|Thought process|Rationale):\s*(.*?)(?:\n\n|\Z)", re.DOTALL | re.IGNORECASE)
+SOURCES_PATTERN = re.compile(r"(?:Source|Reference):\s*(https?://\S+)", re.IGNORECASE)
+CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+def parse_structured_answer(data: Any) -> GaiaAnswer:
+    """Validate GaiaAnswer fields (tool-call arguments or a JSON object); OutputParserException if they don't fit."""
+    if not isinstance(data, dict):
+        raise OutputParserException(f"Expected a {ANSWER_TOOL} object, got {type(data).__name__}.")
+    try:
+        return GaiaAnswer(**data)
+    except ValidationError as e:
+        raise OutputParserException(f"Invalid {ANSWER_TOOL}: {e.errors(include_url=False)}") from None
+
+class GaiaAnswerParser(BaseOutputParser[GaiaAnswer]):
+    """Parses a text reply into a GaiaAnswer.
+
+    A reply that is a JSON object (optionally fenced, possibly cut off) is validated as a
+    GaiaAnswer; anything else is prose, with reasoning and sources taken from its labelled
+    lines. Structured answers normally arrive as GaiaAnswer tool calls and skip this parser.
+    """
+
+    def parse(self, text: str) -> GaiaAnswer:
+        if not text or not text.strip():
+            raise OutputParserException("Model returned no answer text.")
+        stripped = CODE_FENCE_PATTERN.sub("", text.strip())
+        if stripped.startswith("{"):
+            return parse_structured_answer(parse_partial_json(stripped))
+        reasoning_match = REASONING_PATTERN.search(text)
+        return GaiaAnswer(
+            answer=text,
+            reasoning=reasoning_match.group(1).strip() if reasoning_match else "",
+            sources=SOURCES_PATTERN.findall(text)
+        )
+
+    @property
+    def _type(self) -> str:
+        return "gaia_answer"
+
+ANSWER_VALUE_START = re.compile(r'"answer"\s*:\s*"')
+JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class AnswerStreamParser:
+    """Incrementally extracts the `answer` field from a streamed GaiaAnswer tool call.
+
+    Fed the AIMessageChunks of the agent's model calls, it accumulates the argument
+    fragments of the GaiaAnswer call and decodes the `answer` string as far as it has
+    arrived, returning the new text, so the final answer can be streamed as tokens. Each
+    character is scanned once; an escape sequence split across fragments waits for the rest.
+    """
+
+    def __init__(self):
+        self._reset(None)
+
+    def _reset(self, message_id: Optional[str]) -> None:
+        self._message_id = message_id
+        self._index: Optional[int] = None
+        self._args = ""
+        self._pos: Optional[int] = None  # Next undecoded character of the answer value
+        self._done = False
+
+    def feed(self, chunk: AIMessageChunk) -> str:
+        if chunk.id != self._message_id:  # A new model call
+            self._reset(chunk.id)
+        for call in chunk.tool_call_chunks:
+            if call.get("name") == ANSWER_TOOL:
+                self._index = call.get("index")
+            if self._index is not None and call.get("index") == self._index and call.get("args"):
+                self._args += call["args"]
+        if self._done or self._index is None:
+            return ""
+        if self._pos is None:
+            match = ANSWER_VALUE_START.search(self._args)
+            if match is None:
+                return ""
+            self._pos = match.end()
+        return self._decode()
+
+    def _decode(self) -> str:
+        out, args, pos = [], self._args, self._pos
+        while pos < len(args):
+            char = args[pos]
+            if char == '"':
+                self._done = True
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+            if pos + 1 >= len(args):
+                break
+            if args[pos + 1] != "u":
+                out.append(JSON_ESCAPES.get(args[pos + 1], args[pos + 1]))
+                pos += 2
+                continue
+            # \uXXXX, or a surrogate pair \uXXXX\uXXXX
+            length = 12 if args[pos + 2:pos + 4].lower() in ("d8", "d9", "da", "db") else 6
+            if pos + length > len(args):
+                break
+            try:
+                out.append(json.loads(f'"{args[pos:pos + length]}"'))
+            except ValueError:
+                out.append(args[pos:pos + length])
+            pos += length
+        self._pos = pos
+        return "".join(out)
+
+def compact_history(messages: List[BaseMessage], max_tokens: Optional[int]) -> List[BaseMessage]:
+    """Carry earlier turns of a session into the next one.
+
+    Each turn is reduced to its question and final answer (tool calls and observations are
+    dropped), then the oldest turns are trimmed so the rest fit `max_tokens` (approximate
+    count; None keeps everything). The result always starts with a question.
+    """
+    compact = [
+        m for m in messages
+        if isinstance(m, HumanMessage) or (isinstance(m, AIMessage) and not m.tool_calls and not m.text.startswith("LLM Error:"))
+    ]
+    if max_tokens is None:
+        return compact
+    return trim_messages(compact, max_tokens=max_tokens, token_counter=count_tokens_approximately,
+                         strategy="last", start_on="human", allow_partial=False)
+
+def build_agent_chain(llm: BaseLanguageModel) -> Runnable:
+    """Compose the agent prompt with the model bound to TOOLS (and the GaiaAnswer tool when STRUCTURED_ANSWERS is on)."""
+    try:
+        model = llm.bind_tools([*TOOLS, GaiaAnswer] if settings.structured_answers else TOOLS)
+    except NotImplementedError:
+        logger.warning(f"{type(llm).__name__} does not support tool binding; using it without tools.")
+        model = llm
+    return AGENT_PROMPT | model
+
+def get_llm(provider: Optional[str] = None, model_name: Optional[str] = None):
+    """Initialize and return the LLM based on configuration.
+
+    `provider` and `model_name` override LLM_PROVIDER and the provider's model setting;
+    the router provider uses them to create each of its backends.
+    """
+    provider = (provider or settings.llm_provider).lower().strip('"\'')
+
+    if provider in ("openrouter", "ollama"):
+        # Deferred: langchain_openai pulls in the whole openai SDK
+        from langchain_openai import ChatOpenAI
 
     if provider == "openrouter":
         logger.info(f"Configuring LLM for OpenRouter.")
@@ -55,18 +270,21 @@ def get_llm():
             logger.critical("LLM_PROVIDER is 'openrouter' but OPENROUTER_API_KEY is not set.")
             raise ValueError("OPENROUTER_API_KEY must be set for OpenRouter provider.")
 
-        # Configure litellm for OpenRouter
-        os.environ["OPENAI_API_KEY"] = settings.openrouter_api_key
-        os.environ["OPENAI_API_BASE"] = settings.openrouter_base_url
-        
-        model_name = settings.openrouter_model_name
+        model_name = model_name or settings.openrouter_model_name
         logger.info(f"Using OpenRouter model: {model_name}")
 
-        # Use ChatOpenAI which is compatible with OpenRouter via LiteLLM
+        # Use ChatOpenAI (OpenAI-compatible API) over the shared pooled client;
+        # credentials are passed explicitly rather than through os.environ
+        http_client = get_provider_client("openrouter")
         llm = ChatOpenAI(
             model=model_name,
             openai_api_key=settings.openrouter_api_key,
-            openai_api_base=settings.openrouter_base_url
+            openai_api_base=settings.openrouter_base_url,
+            temperature=settings.llm_temperature,
+            http_async_client=http_client,
+            timeout=http_client.timeout,
+            max_retries=0, # Retries with jittered backoff happen in the pooled client's transport
+            stream_usage=True # Token usage is reported for streamed responses too (see /metrics)
         )
 
     elif provider == "ollama":
@@ -74,168 +292,368 @@ def get_llm():
         if not settings.ollama_base_url:
             logger.warning(f"OLLAMA_BASE_URL not explicitly set, using default: {settings.ollama_base_url}")
 
-        # Use ChatOpenAI which is compatible with Ollama via LiteLLM
+        # Use ChatOpenAI (Ollama exposes an OpenAI-compatible API) over the shared pooled client
+        model_name = model_name or settings.ollama_model_name
+        http_client = get_provider_client("ollama")
         llm = ChatOpenAI(
-            model=settings.ollama_model_name,
+            model=model_name,
             openai_api_key="ollama", # Placeholder, not actually used
-            openai_api_base=settings.ollama_base_url
+            openai_api_base=settings.ollama_base_url,
+            temperature=settings.llm_temperature,
+            http_async_client=http_client,
+            timeout=http_client.timeout,
+            max_retries=0, # Retries with jittered backoff happen in the pooled client's transport
+            stream_usage=True # Token usage is reported for streamed responses too (see /metrics)
         )
-        logger.info(f"Using Ollama model: {settings.ollama_model_name} via {settings.ollama_base_url}")
+        logger.info(f"Using Ollama model: {model_name} via {settings.ollama_base_url}")
+
+    elif provider == "stub":
+        # Offline scripted model for benchmarks: no network, reproducible latencies
+        from .stub import create_stub_llm
+        llm = create_stub_llm()
+        if model_name:
+            llm = llm.model_copy(update={"model_name": model_name})
+        logger.info(f"Using stub LLM (latency {llm.latency!r}, {len(llm.script)} scripted turns)")
+    elif provider == "router":
+        # Several backends behind latency/error/cost routing with failover and optional hedging
+        from .router import create_router_llm
+        llm = create_router_llm(get_llm)
+        logger.info(f"Using LLM router over {list(llm.backends)} (hedging {'on' if settings.router_hedge else 'off'})")
     else:
-        logger.critical(f"Unsupported LLM_PROVIDER in config: '{provider}'. Choose 'openrouter' or 'ollama'.")
+        logger.critical(f"Unsupported LLM_PROVIDER in config: '{provider}'. Choose 'openrouter', 'ollama', 'router' or 'stub'.")
         raise ValueError(f"Unsupported LLM_PROVIDER: {provider}")
 
     return llm
 
-def get_compiled_agent():
-    """Creates and compiles a LangGraph agent."""
+def get_compiled_agent(llm: Optional[BaseLanguageModel] = None, checkpointer_backend: Optional[str] = None):
+    """Creates and compiles a LangGraph ReAct agent.
+
+    The graph is `agent -> (tools -> agent)* -> end`: the agent node calls the
+    tool-bound model, the tools node executes every requested tool call
+    concurrently, and a conditional edge stops at a final answer. The run's
+    AgentBudget (see app/budget.py; MAX_AGENT_ITERATIONS when none is set)
+    forces that answer once it is spent or the run has converged.
+
+    `llm` overrides the configured provider (e.g. a fake model in benchmarks) and
+    `checkpointer_backend` overrides `settings.checkpointer`.
+    """
     logger.info("Creating LangGraph agent...")
     
     # Get the LLM
-    llm = get_llm()
+    if llm is None:
+        llm = get_llm()
+    
+    llm_cache = get_llm_cache()
+    if llm_cache is not None and is_deterministic(llm):
+        # Identical calls (same messages, model, parameters and tools) replay the stored completion
+        llm = llm.model_copy(update={"cache": llm_cache})
+        logger.info("Model-call cache enabled (temperature 0).")
+    
+    if REGISTRY.enabled:
+        # LLM latency, time to first token and token usage for /metrics. Attached as the model's
+        # own callbacks: a config-level callback list would replace the handlers LangGraph
+        # passes down (including the one that streams tokens to /invoke/stream)
+        llm_metrics = LLMMetricsCallbackHandler(getattr(llm, "model_name", None) or settings.active_llm_model)
+        llm = llm.model_copy(update={"callbacks": [*(llm.callbacks or []), llm_metrics]})
+    
+    # Assemble the prompt/model pipelines and answer parser once; every agent
+    # iteration reuses them instead of rebuilding a template and chain per call
+    agent_chain = build_agent_chain(llm)
+    answer_chain = AGENT_PROMPT | llm # No tools: used to force an answer at the iteration limit
+    answer_parser = GaiaAnswerParser()
+    # One bounded retry that forces a GaiaAnswer tool call when an answer can't be parsed
+    repair_chain = None
+    if settings.structured_answers and settings.answer_repair:
+        try:
+            repair_chain = AGENT_PROMPT | llm.bind_tools([GaiaAnswer], tool_choice=ANSWER_TOOL)
+        except NotImplementedError:
+            logger.warning(f"{type(llm).__name__} does not support tool binding; malformed answers are not repaired.")
+    
+    # Tools by name, each with a process-wide concurrency limit
+    tools_by_name = {tool.name: tool for tool in TOOLS}
+    tool_semaphores = {
+        name: asyncio.Semaphore(settings.tool_concurrency_limits.get(name, settings.tool_max_concurrency))
+        for name in tools_by_name
+    }
+    
+    # Reranks search results and drops repeated passages before the model sees them
+    compressor = create_observation_compressor()
     
     # Create a state graph
     workflow = StateGraph(AgentState)
     
-    # Define agent node
-    def agent_node(state: AgentState) -> AgentState:
-        """Core agent node that processes messages and decides next actions."""
-        # Check iteration limit
-        if state.iteration >= MAX_AGENT_ITERATIONS:
-            logger.warning(f"Agent reached maximum iterations ({MAX_AGENT_ITERATIONS}). Stopping.")
-            # Add a message indicating we've reached the limit
-            state.messages.append(AIMessage(content=f"I've reached the maximum number of steps ({MAX_AGENT_ITERATIONS}). Here's my best answer based on what I've learned so far."))
-            # Log this as a step
-            state.intermediate_steps_log.append({
-                "type": "iteration_limit_reached",
-                "content": f"Reached maximum iterations: {MAX_AGENT_ITERATIONS}"
-            })
-            return state
-        
-        # Increment iteration counter
-        state.iteration += 1
-        logger.info(f"Agent iteration {state.iteration}/{MAX_AGENT_ITERATIONS}")
-        
-        # Get the last message to determine what to do next
-        last_message = state.messages[-1] if state.messages else None
+    def spend(response_message: BaseMessage) -> None:
+        """Charge a model call's tokens to the run's budget."""
+        budget = current_budget()
+        if budget is not None:
+            budget.record_llm(response_message)
+    
+    async def repair_answer(state: AgentState, output: str, error: OutputParserException) -> Optional[GaiaAnswer]:
+        """Ask the model once to restate an unparseable answer as a GaiaAnswer call; None if that fails too."""
+        if repair_chain is None:
+            return None
+        note = HumanMessage(content=f"Your final answer could not be parsed ({error}). Call {ANSWER_TOOL} with it, keeping its content:\n\n{output}")
+        timeout = settings.answer_repair_timeout_seconds
+        deadline = current_deadline()
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+        try:
+            response = await asyncio.wait_for(repair_chain.ainvoke({"messages": state.messages + [note]}), timeout)
+            spend(response)
+            call = next((tc for tc in response.tool_calls if tc["name"] == ANSWER_TOOL), None)
+            if call is None:
+                raise OutputParserException(f"Repair reply did not call {ANSWER_TOOL}.")
+            return parse_structured_answer(call["args"])
+        except Exception as repair_error:
+            logger.error(f"Answer repair failed: {repair_error!r}")
+            return None
+    
+    async def record_final_answer(state: AgentState, update: StateUpdate, response_message: BaseMessage) -> None:
+        """Turn the model's final reply into a GaiaAnswer and log it.
+
+        The fast path is a GaiaAnswer tool call, validated as is. A text reply goes through
+        GaiaAnswerParser; if either can't be parsed, one repair call is made before falling
+        back to the raw output.
+        """
+        answer_call = next((tc for tc in getattr(response_message, "tool_calls", None) or [] if tc["name"] == ANSWER_TOOL), None)
+        output = response_message.text
+        try:
+            if answer_call is not None:
+                output = json.dumps(answer_call["args"])
+                gaia_answer, answer_format = parse_structured_answer(answer_call["args"]), "tool"
+            else:
+                gaia_answer = answer_parser.parse(output)
+                answer_format = "json" if gaia_answer.answer != output else "text"
+        except OutputParserException as parse_error:
+            ERRORS.inc("parse")
+            logger.warning(f"Could not parse the final answer: {parse_error}")
+            gaia_answer, answer_format = await repair_answer(state, output, parse_error), "repaired"
+            if gaia_answer is None:
+                # Fall back to the raw output
+                gaia_answer, answer_format = GaiaAnswer(
+                    answer=output.strip() or "The model returned an empty answer.",
+                    reasoning="",
+                    sources=[]
+                ), "raw"
+        ANSWERS.inc(answer_format)
         
+        # Log the structured response
+        update.log("final_answer", {
+            "answer": gaia_answer.answer,
+            "reasoning": gaia_answer.reasoning,
+            "sources": gaia_answer.sources
+        })
+        update.messages.append(AIMessage(content=gaia_answer.answer))
+    
+    async def force_final_answer(state: AgentState, update: StateUpdate, step_type: str, reason: str, note: str) -> None:
+        """Ask for the best answer from what has been gathered so far, without tools."""
+        update.log(step_type, reason)
+        response_message = await answer_chain.ainvoke({"messages": state.messages + [HumanMessage(content=note)]})
+        spend(response_message)
+        await record_final_answer(state, update, response_message)
+    
+    async def stop_early(state: AgentState, update: StateUpdate, budget: AgentBudget, reason: str) -> None:
+        """Force the final answer because the run has converged or spent its token or tool-call budget."""
+        logger.info(f"Agent stopping early ({reason}): {budget.header()}")
+        if reason == "converged":
+            await force_final_answer(
+                state, update, "converged", f"No new information in the last {budget.stale} tool round(s)",
+                "Your last tool calls returned nothing new. Give your best final answer based on what you've learned so far.")
+        else:
+            limit = budget.max_tokens if reason == "tokens" else budget.max_tool_calls
+            await force_final_answer(
+                state, update, "budget_exhausted", f"Spent the {reason.replace('_', ' ')} budget of {limit}",
+                "You've used up the budget for this question. Give your best final answer based on what you've learned so far.")
+    
+    async def answer_before_deadline(state: AgentState, update: StateUpdate, deadline: Deadline) -> None:
+        logger.warning(f"Request deadline nearly reached ({deadline}). Forcing a final answer.")
+        DEADLINES.inc("forced_answer")
+        budget = current_budget()
+        if budget is not None:
+            budget.stop_reason = "deadline"
+        await force_final_answer(
+            state, update, "deadline_reached", f"{deadline.remaining():.1f}s left of the {deadline.seconds}s request deadline",
+            "You are running out of time. Give your best final answer based on what you've learned so far.")
+    
+    # Define agent node
+    async def agent_node(state: AgentState) -> Dict[str, Any]:
+        """Core agent node that processes messages and decides next actions.
+
+        The node is a coroutine so LangGraph awaits it on the server's event loop;
+        the model call itself is awaited (`ainvoke`) rather than run synchronously,
+        so other requests keep being served while the LLM round-trip is in flight.
+        Under a request deadline the model call may only use the time before the
+        deadline's answer reserve; once that is reached, the reserve is spent on
+        asking for a final answer. The run's budget (iterations, tokens, tool calls,
+        convergence) is checked before every model call the same way.
+        """
+        deadline = current_deadline()
+        budget = current_budget()
+        max_iterations = budget.max_iterations if budget is not None else MAX_AGENT_ITERATIONS
+        update = StateUpdate()
         try:
-            # Process the current question
-            question = state.current_gaia_question
+            stop = budget.exhausted() if budget is not None else None
+            # Check iteration limit
+            if state.iteration >= max_iterations:
+                logger.warning(f"Agent reached maximum iterations ({max_iterations}). Forcing a final answer.")
+                if budget is not None:
+                    budget.stop_reason = "iterations"
+                await force_final_answer(
+                    state, update, "iteration_limit_reached", f"Reached maximum iterations: {max_iterations}",
+                    f"You've reached the maximum number of steps ({max_iterations}). Give your best final answer based on what you've learned so far.")
+                return update.as_dict()
             
-            # Create a simple prompt template
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a helpful AI assistant that can answer questions about a wide range of topics.
-                You can search the web for information using the web_search tool, and you can execute code using the code_execution tool.
-                Always provide your reasoning process and cite sources when possible."""),
-                ("user", "{input}")
-            ])
+            if stop is not None:
+                budget.stop_reason = stop
+                await stop_early(state, update, budget, stop)
+                return update.as_dict()
             
-            # Create a simple chain
-            chain = LLMChain(llm=llm, prompt=prompt)
+            if deadline is not None and deadline.reserve_reached:
+                await answer_before_deadline(state, update, deadline)
+                return update.as_dict()
             
-            # Run the chain
-            response = chain.run(input=question)
+            # Increment iteration counter
+            iteration = update.values["iteration"] = state.iteration + 1
+            if budget is not None:
+                budget.iterations = iteration
+            logger.info(f"Agent iteration {iteration}/{max_iterations}")
             
-            # Try to extract structured components for GaiaAnswer
+            # Run the prebuilt prompt -> tool-bound model pipeline over the conversation so far;
+            # await it so the event loop is not blocked during the LLM call
             try:
-                # This is a simplified extraction approach
-                answer = response
-                reasoning = ""
-                sources = []
-                
-                # Look for reasoning section
-                reasoning_match = re.search(r"(?:Reasoning|Thought process|Rationale):\s*(.*?)(?:\n\n|\Z)", 
-                                           response, re.DOTALL | re.IGNORECASE)
-                if reasoning_match:
-                    reasoning = reasoning_match.group(1).strip()
-                    
-                # Look for sources
-                sources_match = re.findall(r"(?:Source|Reference):\s*(https?://\S+)", 
-                                         response, re.IGNORECASE)
-                if sources_match:
-                    sources = sources_match
-                    
-                # Create a GaiaAnswer object
-                gaia_answer = GaiaAnswer(
-                    answer=answer,
-                    reasoning=reasoning,
-                    sources=sources
-                )
-                
-                # Log the structured response
-                state.intermediate_steps_log.append({
-                    "type": "final_answer",
-                    "content": {
-                        "answer": gaia_answer.answer,
-                        "reasoning": gaia_answer.reasoning,
-                        "sources": gaia_answer.sources
-                    }
-                })
-                
-                # Add the agent's response to the messages
-                ai_message = AIMessage(content=gaia_answer.answer)
-                state.messages.append(ai_message)
-                
-            except Exception as parse_error:
-                logger.error(f"Error parsing structured answer: {parse_error}", exc_info=True)
-                # Fall back to using the raw output
-                gaia_answer = GaiaAnswer(
-                    answer=response,
-                    reasoning="",
-                    sources=[]
-                )
-                
-                state.intermediate_steps_log.append({
-                    "type": "final_answer",
-                    "content": {
-                        "answer": gaia_answer.answer,
-                        "reasoning": "",
-                        "sources": []
-                    }
-                })
-                
-                # Add the agent's response to the messages
-                ai_message = AIMessage(content=response)
-                state.messages.append(ai_message)
+                async with asyncio.timeout(deadline.step_timeout() if deadline is not None else None) as step:
+                    response_message = await agent_chain.ainvoke({"messages": state.messages})
+                spend(response_message)
+            except TimeoutError:
+                if not step.expired():
+                    raise
+                logger.warning(f"Agent step cut off at the answer reserve of {deadline}")
+                await answer_before_deadline(state, update, deadline)
+                return update.as_dict()
+            
+            tool_calls = getattr(response_message, "tool_calls", None) or []
+            if any(tc["name"] == ANSWER_TOOL for tc in tool_calls):
+                # A final answer ends the run, even if other tool calls came with it
+                await record_final_answer(state, update, response_message)
+            elif tool_calls:
+                # Keep the tool-calling message in the history so observations can refer to it
+                update.messages.append(response_message)
+                if response_message.text.strip():
+                    update.log("llm_thought", response_message.text)
+                for tool_call in tool_calls:
+                    update.log("tool_call", {"tool_name": tool_call["name"], "tool_args": tool_call["args"], "tool_call_id": tool_call.get("id")})
+            else:
+                await record_final_answer(state, update, response_message)
                 
         except Exception as e:
+            ERRORS.inc("agent")
+            if budget is not None:
+                budget.stop_reason = "error"
             error_msg = f"Error in agent processing: {str(e)}"
             logger.error(error_msg, exc_info=True)
             
             # Add an error message
-            state.messages.append(AIMessage(content=f"LLM Error: {error_msg}"))
+            update.messages.append(AIMessage(content=f"LLM Error: {error_msg}"))
             
             # Log the error
-            state.intermediate_steps_log.append({
-                "type": "error_message",
-                "content": error_msg
-            })
+            update.log("error_message", error_msg)
         
-        return state
+        return update.as_dict()
+    
+    async def run_tool_call(tool_call: Dict[str, Any]) -> ToolMessage:
+        """Execute one tool call under its tool's concurrency limit; errors become observations."""
+        name = tool_call["name"]
+        tool = tools_by_name.get(name)
+        if tool is None:
+            TOOL_CALLS.inc("unknown", "error")
+            content = f"Error: unknown tool '{name}'. Available tools: {', '.join(tools_by_name)}."
+        else:
+            start = time.perf_counter()
+            deadline = current_deadline()
+            try:
+                # Waiting for the tool's concurrency limit counts against the request deadline too
+                async with asyncio.timeout(deadline.step_timeout() if deadline is not None else None) as step:
+                    async with tool_semaphores[name]:
+                        content = await tool.ainvoke(tool_call["args"])
+                TOOL_CALLS.inc(name, "ok")
+            except Exception as e:
+                if isinstance(e, TimeoutError) and step.expired():
+                    logger.warning(f"Tool '{name}' cancelled at the answer reserve of {deadline}")
+                    TOOL_CALLS.inc(name, "deadline")
+                    content = f"Error: tool '{name}' did not finish before the request deadline."
+                else:
+                    logger.error(f"Tool '{name}' failed: {e}", exc_info=True)
+                    TOOL_CALLS.inc(name, "error")
+                    ERRORS.inc("tool")
+                    content = f"Error running tool '{name}': {str(e)}"
+            TOOL_DURATION.observe(time.perf_counter() - start, name)
+        return ToolMessage(content=str(content), name=name, tool_call_id=tool_call["id"])
+    
+    # Define tools node
+    async def tools_node(state: AgentState) -> Dict[str, Any]:
+        """Runs every tool call from the last AI message concurrently, as far as the tool-call budget allows."""
+        tool_calls = state.messages[-1].tool_calls
+        budget = current_budget()
+        allowed = len(tool_calls)
+        if budget is not None and budget.max_tool_calls is not None:
+            allowed = max(0, min(allowed, budget.max_tool_calls - budget.tool_calls))
+        logger.info(f"Running {allowed} of {len(tool_calls)} tool call(s): {[tc['name'] for tc in tool_calls]}")
+        # gather preserves order, so observations line up with the calls that produced them
+        observations = await asyncio.gather(*(run_tool_call(tc) for tc in tool_calls[:allowed]))
+        if budget is not None:
+            budget.record_tool_round(observations)
+        if compressor is not None and observations:
+            # Convergence is judged on the raw observations above; the model gets the compressed ones
+            earlier = compressor.recent_observations(state.messages)
+            observations = compressor.compress(state.current_gaia_question or "", tool_calls[:allowed], observations, earlier)
+        # Every call still needs an observation, or the next model call is rejected
+        observations += [ToolMessage(content="Error: the tool-call budget for this question is used up.", name=tc["name"], tool_call_id=tc["id"])
+                         for tc in tool_calls[allowed:]]
+        update = StateUpdate()
+        for observation in observations:
+            update.messages.append(observation)
+            # The text is in the ToolMessage; the log only points at it
+            update.log("tool_observation", {"tool_name": observation.name, "tool_call_id": observation.tool_call_id})
+        return update.as_dict()
+    
+    def route_after_agent(state: AgentState) -> str:
+        """Continue to the tools while the model is calling them; otherwise finish."""
+        last_message = state.messages[-1] if state.messages else None
+        if isinstance(last_message, AIMessage) and last_message.tool_calls:
+            return "tools"
+        return "end"
     
     # Add nodes to the graph
-    workflow.add_node("agent", agent_node)
+    workflow.add_node("agent", instrument_node("agent", agent_node))
+    workflow.add_node("tools", instrument_node("tools", tools_node))
     
     # Define the starting point
     workflow.set_entry_point("agent")
     
     # Define end node
-    def end_node(state: AgentState) -> AgentState:
+    async def end_node(state: AgentState) -> Dict[str, Any]:
         """End node that marks the completion of the agent's work."""
         logger.info("Agent workflow completed.")
-        return state
+        AGENT_ITERATIONS.observe(state.iteration)
+        budget = current_budget()
+        if budget is not None:
+            budget.stop_reason = budget.stop_reason or "answer"
+            AGENT_TOKENS.observe(budget.tokens)
+            AGENT_STOPS.inc(budget.stop_reason)
+        return {}
     
     # Add end node to the graph
-    workflow.add_node("end", end_node)
+    workflow.add_node("end", instrument_node("end", end_node))
     
-    # Add edges - simplified to just go from agent to end
-    workflow.add_edge("agent", "end")
+    # Add edges: agent -> tools -> agent until a final answer (or the iteration limit), then end
+    workflow.add_conditional_edges("agent", route_after_agent, {"tools": "tools", "end": "end"})
+    workflow.add_edge("tools", "agent")
+    workflow.set_finish_point("end")
     
-    # Compile the graph with memory checkpointer
+    # Compile the graph with the configured (bounded by default) checkpointer
     logger.info("Compiling LangGraph agent...")
-    memory = MemorySaver()
-    compiled_graph = workflow.compile(checkpointer=memory)
+    checkpointer = get_checkpointer(checkpointer_backend)
+    compiled_graph = workflow.compile(checkpointer=checkpointer)
     logger.info("LangGraph agent compiled successfully.")
     
-    return compiled_graph
\ No newline at end of file
+    return compiled_graph
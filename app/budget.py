@@ -0,0 +1,111 @@
+# app/budget.py
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from .config import settings
+from .schemas import AgentBudgetRequest
+
+
+class AgentBudget:
+    """Limits and spend of one agent run: iterations, LLM tokens, tool calls and wall time.
+
+    The agent node records what each step spent and stops the run when a limit is used up
+    or the run has converged: `stale_rounds` tool rounds in a row that returned nothing
+    it had not already seen in this run (repeated searches, identical errors).
+    """
+
+    def __init__(self, max_iterations: int, max_tokens: Optional[int] = None, max_tool_calls: Optional[int] = None,
+                 stale_rounds: Optional[int] = None):
+        self.max_iterations = max_iterations
+        self.max_tokens = max_tokens
+        self.max_tool_calls = max_tool_calls
+        self.stale_rounds = stale_rounds  # None disables early stopping
+        self.iterations = 0
+        self.tokens = 0
+        self.tool_calls = 0
+        self.stale = 0  # Consecutive tool rounds without new observations
+        self.stop_reason: Optional[str] = None
+        self.started = time.monotonic()
+        self._observations: Set[str] = set()
+
+    def record_llm(self, message: BaseMessage) -> None:
+        usage = getattr(message, "usage_metadata", None) or {}
+        self.tokens += usage.get("total_tokens") or (usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+
+    def record_tool_round(self, observations: List[ToolMessage]) -> None:
+        """Count a round of tool calls and whether any of their observations is new to this run."""
+        self.tool_calls += len(observations)
+        fingerprints = {hashlib.sha1(f"{o.name}\x00{o.content}".encode("utf-8")).hexdigest() for o in observations}
+        self.stale = 0 if fingerprints - self._observations else self.stale + 1
+        self._observations |= fingerprints
+
+    def exhausted(self) -> Optional[str]:
+        """The limit that ends the run before its next model call, if any."""
+        if self.stale_rounds is not None and self.stale >= self.stale_rounds:
+            return "converged"
+        if self.iterations >= self.max_iterations:
+            return "iterations"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "tokens"
+        if self.max_tool_calls is not None and self.tool_calls >= self.max_tool_calls:
+            return "tool_calls"
+        return None
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "iterations": self.iterations, "max_iterations": self.max_iterations,
+            "tokens": self.tokens, "max_tokens": self.max_tokens,
+            "tool_calls": self.tool_calls, "max_tool_calls": self.max_tool_calls,
+            "seconds": round(time.monotonic() - self.started, 3),
+            "stop_reason": self.stop_reason,
+        }
+
+    def header(self) -> str:
+        """Spend as an `X-Agent-Budget` value, e.g. `iterations=2/7, tokens=1530, tool_calls=1, seconds=0.412, stop=answer`."""
+        spent = lambda used, limit: f"{used}/{limit}" if limit is not None else str(used)
+        return (f"iterations={spent(self.iterations, self.max_iterations)}, tokens={spent(self.tokens, self.max_tokens)}, "
+                f"tool_calls={spent(self.tool_calls, self.max_tool_calls)}, seconds={time.monotonic() - self.started:.3f}, "
+                f"stop={self.stop_reason}")
+
+
+_current_budget: ContextVar[Optional[AgentBudget]] = ContextVar("agent_budget", default=None)
+
+
+def _capped(requested: Optional[int], default: Optional[int], cap: Optional[int]) -> Optional[int]:
+    value = default if requested is None else requested
+    if cap is None:
+        return value
+    return cap if value is None else min(value, cap)
+
+
+def request_budget(requested: Optional[AgentBudgetRequest] = None) -> AgentBudget:
+    """Budget for a request: its own limits where given (capped by BUDGET_MAX_*), else MAX_AGENT_*."""
+    requested = requested or AgentBudgetRequest()
+    return AgentBudget(
+        max_iterations=_capped(requested.max_iterations, settings.max_agent_iterations, settings.budget_max_iterations),
+        max_tokens=_capped(requested.max_tokens, settings.max_agent_tokens, settings.budget_max_tokens),
+        max_tool_calls=_capped(requested.max_tool_calls, settings.max_agent_tool_calls, settings.budget_max_tool_calls),
+        stale_rounds=settings.early_stop_stale_rounds if settings.early_stopping else None,
+    )
+
+
+def current_budget() -> Optional[AgentBudget]:
+    """Budget of the agent run in this context, if any."""
+    return _current_budget.get()
+
+
+@contextmanager
+def budget_scope(budget: Optional[AgentBudget]) -> Iterator[Optional[AgentBudget]]:
+    """Make `budget` the current one; its clock starts here, when the run does, not while it was queued."""
+    if budget is not None:
+        budget.started = time.monotonic()
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
@@ -0,0 +1,350 @@
+# app/cache.py
+import hashlib
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .config import settings
+from .metrics import ANSWER_CACHE_LOOKUPS
+from .schemas import GaiaAnswer
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_BACKENDS = ("memory", "sqlite", "none")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form used for cache keys: NFKC, case-folded, single-spaced, no trailing punctuation."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!. ")
+
+
+def cache_key(model: str, normalized_question: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalized_question}".encode("utf-8")).hexdigest()
+
+
+def char_ngrams(text: str, n: int) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+
+def _cosine(a: Counter, a_norm: float, b: Counter, b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(count * b.get(gram, 0) for gram, count in a.items()) / (a_norm * b_norm)
+
+
+def connect_shared_sqlite(path: str) -> sqlite3.Connection:
+    """Open a SQLite file for sharing between worker processes: WAL journal (readers never
+    block the writer), a busy timeout instead of immediate "database is locked" errors, and
+    autocommit so no transaction is held open between statements.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=settings.sqlite_busy_timeout_seconds)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Durable across crashes of the app, not of the OS; fine for caches
+    return conn
+
+
+
+# --- Storage backends ---
+class AnswerCacheBackend(ABC):
+    """Key/value store for cached answers with TTL and LRU eviction."""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float]):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the payload for `key`, refreshing its LRU position, or None if absent/expired."""
+
+    @abstractmethod
+    def set(self, key: str, model: str, question: str, payload: Dict[str, Any], grams: Iterable[str] = ()) -> None:
+        """Store `payload` and evict down to `max_entries`; `grams` index the entry for `candidates`."""
+
+    @abstractmethod
+    def candidates(self, model: str, grams: Iterable[str], limit: int) -> Iterator[Tuple[str, str]]:
+        """Yield (key, normalized question) for up to `limit` live entries of `model`, most shared `grams` first."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryAnswerCacheBackend(AnswerCacheBackend):
+    """Process-local LRU dictionary."""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float]):
+        super().__init__(max_entries, ttl_seconds)
+        # key -> (model, question, payload, stored_at)
+        self._data: "OrderedDict[str, Tuple[str, str, Dict[str, Any], float]]" = OrderedDict()
+        # Inverted index for `candidates`: (model, gram) -> keys, and key -> its grams for removal
+        self._postings: Dict[Tuple[str, str], Set[str]] = {}
+        self._grams: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _drop(self, key: str) -> None:
+        model = self._data.pop(key)[0]
+        for gram in self._grams.pop(key, ()):
+            keys = self._postings[(model, gram)]
+            keys.discard(key)
+            if not keys:
+                del self._postings[(model, gram)]
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if self._expired(item[3]):
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return item[2]
+
+    def set(self, key, model, question, payload, grams=()):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (model, question, payload, time.time())
+            grams = tuple(set(grams))
+            if grams:
+                self._grams[key] = grams
+                for gram in grams:
+                    self._postings.setdefault((model, gram), set()).add(key)
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+
+    def candidates(self, model, grams, limit):
+        with self._lock:
+            shared: Counter = Counter()
+            for gram in set(grams):
+                shared.update(self._postings.get((model, gram), ()))
+            items: List[Tuple[str, str]] = []
+            for key, _ in shared.most_common():
+                item = self._data[key]
+                if self._expired(item[3]):
+                    self._drop(key)
+                    continue
+                items.append((key, item[1]))
+                if len(items) == limit:
+                    break
+        return iter(items)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteAnswerCacheBackend(AnswerCacheBackend):
+    """Local SQLite file store; survives restarts and is shared by all worker processes.
+
+    `table` lets other caches (e.g. web search results) keep their entries in the same file.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: Optional[float], table: str = "answers"):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = connect_shared_sqlite(path)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, question TEXT NOT NULL,"
+            " payload TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        # Inverted index for `candidates`; rows go with their entry on expiry and eviction
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_grams ("
+            " gram TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (gram, key)) WITHOUT ROWID"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_grams_key ON {table}_grams (key)")
+        self._conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_drop_grams AFTER DELETE ON {table}"
+            f" BEGIN DELETE FROM {table}_grams WHERE key = OLD.key; END"
+        )
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else float("-inf")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT payload FROM {self.table} WHERE key = ? AND stored_at >= ?", (key, self._cutoff())
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def set(self, key, model, question, payload, grams=()):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, model, question, payload, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, question, json.dumps(payload), now, now),
+            )
+            # REPLACE doesn't fire the delete trigger, so an overwritten entry's grams are dropped here
+            self._conn.execute(f"DELETE FROM {self.table}_grams WHERE key = ?", (key,))
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table}_grams (gram, key) VALUES (?, ?)", ((gram, key) for gram in set(grams))
+            )
+            self._conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (self._cutoff(),))
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def candidates(self, model, grams, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT a.key, a.question FROM ("
+                f" SELECT key, COUNT(*) AS shared FROM {self.table}_grams"
+                f" WHERE gram IN (SELECT value FROM json_each(?)) GROUP BY key"
+                f") g JOIN {self.table} a ON a.key = g.key"
+                f" WHERE a.model = ? AND a.stored_at >= ? ORDER BY g.shared DESC LIMIT ?",
+                (json.dumps(sorted(set(grams))), model, self._cutoff(), limit),
+            ).fetchall()
+        return iter(rows)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Cache front-end ---
+class AnswerCache:
+    """Two-tier GaiaAnswer cache: exact match on (model, normalized question), then
+    an optional character n-gram cosine similarity tier above `similarity_threshold`.
+
+    The similarity tier only scores the `similarity_candidates` entries sharing the most
+    n-grams with the question, found through the backend's inverted n-gram index.
+    """
+
+    def __init__(
+        self,
+        backend: AnswerCacheBackend,
+        model: str,
+        similarity_threshold: Optional[float] = None,
+        ngram_size: int = 3,
+        similarity_candidates: int = 32,
+    ):
+        self.backend = backend
+        self.model = model
+        self.similarity_threshold = similarity_threshold
+        self.ngram_size = ngram_size
+        self.similarity_candidates = similarity_candidates
+        # Vectors are derived data, so they are kept per process and bounded like the backend
+        self._vectors: "OrderedDict[str, Tuple[Counter, float]]" = OrderedDict()
+        self._counters = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+    def _vector(self, question: str) -> Tuple[Counter, float]:
+        cached = self._vectors.get(question)
+        if cached is None:
+            grams = char_ngrams(question, self.ngram_size)
+            cached = (grams, math.sqrt(sum(c * c for c in grams.values())))
+            self._vectors[question] = cached
+            while len(self._vectors) > self.backend.max_entries:
+                self._vectors.popitem(last=False)
+        else:
+            self._vectors.move_to_end(question)
+        return cached
+
+    def lookup(self, question: str) -> Tuple[Optional[GaiaAnswer], str]:
+        """Return (answer, tier) where tier is 'exact', 'similar' or 'miss'."""
+        normalized = normalize_question(question)
+        payload = self.backend.get(cache_key(self.model, normalized))
+        if payload is not None:
+            self._counters["exact_hits"] += 1
+            ANSWER_CACHE_LOOKUPS.inc("exact")
+            return GaiaAnswer(**payload), "exact"
+
+        if self.similarity_threshold is not None:
+            query, query_norm = self._vector(normalized)
+            best_key, best_score = None, self.similarity_threshold
+            for key, candidate in self.backend.candidates(self.model, query, self.similarity_candidates):
+                score = _cosine(query, query_norm, *self._vector(candidate))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is not None:
+                payload = self.backend.get(best_key)
+                if payload is not None:
+                    logger.info(f"Answer cache similarity hit (score={best_score:.3f})")
+                    self._counters["similar_hits"] += 1
+                    ANSWER_CACHE_LOOKUPS.inc("similar")
+                    return GaiaAnswer(**payload), "similar"
+
+        self._counters["misses"] += 1
+        ANSWER_CACHE_LOOKUPS.inc("miss")
+        return None, "miss"
+
+    def store(self, question: str, answer: GaiaAnswer) -> None:
+        normalized = normalize_question(question)
+        grams = self._vector(normalized)[0] if self.similarity_threshold is not None else ()
+        self.backend.set(cache_key(self.model, normalized), self.model, normalized, answer.model_dump(), grams)
+        self._counters["stores"] += 1
+
+    def record_bypass(self) -> None:
+        self._counters["bypassed"] += 1
+        ANSWER_CACHE_LOOKUPS.inc("bypassed")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["exact_hits"] + self._counters["similar_hits"] + self._counters["misses"]
+        hits = lookups - self._counters["misses"]
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            **self._counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+def get_answer_cache(backend: Optional[str] = None) -> Optional[AnswerCache]:
+    """Create the answer cache selected by `settings.answer_cache_backend` (None when disabled)."""
+    backend = (backend or settings.answer_cache_backend).lower().strip('"\'')
+    if backend == "none":
+        logger.info("Answer cache disabled.")
+        return None
+    if backend == "memory":
+        store = MemoryAnswerCacheBackend(settings.answer_cache_max_entries, settings.answer_cache_ttl_seconds)
+    elif backend == "sqlite":
+        store = SqliteAnswerCacheBackend(settings.answer_cache_path, settings.answer_cache_max_entries, settings.answer_cache_ttl_seconds)
+    else:
+        logger.critical(f"Unsupported ANSWER_CACHE_BACKEND in config: '{backend}'. Choose one of {ANSWER_CACHE_BACKENDS}.")
+        raise ValueError(f"Unsupported ANSWER_CACHE_BACKEND: {backend}")
+    logger.info(
+        f"Answer cache: backend={backend}, max_entries={settings.answer_cache_max_entries}, "
+        f"ttl={settings.answer_cache_ttl_seconds}s, similarity_threshold={settings.answer_cache_similarity_threshold}"
+    )
+    return AnswerCache(
+        store,
+        model=settings.active_llm_model,
+        similarity_threshold=settings.answer_cache_similarity_threshold,
+        ngram_size=settings.answer_cache_ngram_size,
+        similarity_candidates=settings.answer_cache_similarity_candidates,
+    )
@@ -0,0 +1,452 @@
+# app/checkpoint.py
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from .cache import connect_shared_sqlite
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTER_BACKENDS = ("bounded", "memory", "sqlite", "none")
+
+
+class _ThreadEntry:
+    """Bookkeeping for one thread: when it was last used, what it stores and how big it is."""
+    __slots__ = ("last_access", "bytes", "checkpoints", "write_keys", "blob_keys")
+
+    def __init__(self) -> None:
+        self.last_access = time.monotonic()
+        self.bytes = 0
+        self.checkpoints = 0
+        self.write_keys: Set[Tuple[str, str, str]] = set()
+        self.blob_keys: Set[Tuple[str, str, str, Any]] = set()
+
+
+class BoundedMemorySaver(MemorySaver):
+    """In-memory checkpointer with LRU/TTL eviction and a memory cap.
+
+    Threads are kept in least-recently-used order. After every write, threads idle
+    for longer than `ttl_seconds` are dropped, followed by the least recently used
+    ones until both `max_threads` and `max_bytes` (serialized size) are respected.
+    The thread being written is never evicted by its own write.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = 1000,
+        ttl_seconds: Optional[float] = 900.0,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        serde=None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._threads: "OrderedDict[str, _ThreadEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._total_checkpoints = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    # --- Accounting helpers ---
+    def _touch(self, thread_id: str) -> _ThreadEntry:
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            entry = self._threads[thread_id] = _ThreadEntry()
+        else:
+            entry.last_access = time.monotonic()
+            self._threads.move_to_end(thread_id)
+        return entry
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        now = time.monotonic()
+        while self._threads:
+            thread_id, entry = next(iter(self._threads.items()))
+            if thread_id == keep:
+                break
+            expired = self.ttl_seconds is not None and now - entry.last_access > self.ttl_seconds
+            over_count = len(self._threads) > self.max_threads
+            over_bytes = self.max_bytes is not None and self._total_bytes > self.max_bytes
+            if not (expired or over_count or over_bytes):
+                break
+            self.delete_thread(thread_id)
+            self._evictions += 1
+
+    # --- BaseCheckpointSaver overrides ---
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            result = super().get_tuple(config)
+            if thread_id in self._threads:
+                self._touch(thread_id)
+            else:
+                # The parent's defaultdict creates an empty entry on lookup; don't keep it
+                self.storage.pop(thread_id, None)
+            return result
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            entry = self._touch(thread_id)
+            added = sum(len(part[1]) for part in self.storage[thread_id][checkpoint_ns][checkpoint["id"]][:2])
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                entry.blob_keys.add(key)
+                added += len(self.blobs[key][1])
+            entry.bytes += added
+            entry.checkpoints += 1
+            self._total_bytes += added
+            self._total_checkpoints += 1
+            self._evict(keep=thread_id)
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        outer_key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self._lock:
+            before = sum(len(w[2][1]) for w in self.writes.get(outer_key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            added = sum(len(w[2][1]) for w in self.writes.get(outer_key, {}).values()) - before
+            entry = self._touch(thread_id)
+            entry.write_keys.add(outer_key)
+            entry.bytes += added
+            self._total_bytes += added
+            self._evict(keep=thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            entry = self._threads.pop(thread_id, None)
+            if entry is None:
+                super().delete_thread(thread_id)
+                return
+            # Delete through the per-thread key index instead of scanning every write/blob
+            self.storage.pop(thread_id, None)
+            for key in entry.write_keys:
+                self.writes.pop(key, None)
+            for key in entry.blob_keys:
+                self.blobs.pop(key, None)
+            self._total_bytes -= entry.bytes
+            self._total_checkpoints -= entry.checkpoints
+
+    def stats(self) -> Dict[str, Any]:
+        """Current size of the store, suitable for health checks and metrics."""
+        with self._lock:
+            self._evict()  # Let TTL expiry show up even when the server is idle
+            return {
+                "backend": "bounded",
+                "threads": len(self._threads),
+                "checkpoints": self._total_checkpoints,
+                "bytes": self._total_bytes,
+                "evictions": self._evictions,
+            }
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """Checkpointer in a local SQLite file, shared by every worker process of the API.
+
+    Checkpoints are stored whole (channel values included) with their pending writes.
+    Threads idle for longer than `ttl_seconds`, then the least recently used ones beyond
+    `max_threads`, are deleted after writes; the thread being written is never evicted by
+    its own write. Async methods run the queries in a worker thread. Checkpoint count and
+    size are kept as running totals by triggers, so `stats()` doesn't scan the tables.
+    """
+
+    def __init__(self, path: str, *, max_threads: int = 1000, ttl_seconds: Optional[float] = 900.0, serde=None) -> None:
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._evictions = 0
+        self._lock = threading.Lock()
+        self._conn = connect_shared_sqlite(path)
+        # REPLACE deletes the row it replaces; this makes that fire the delete triggers too
+        self._conn.execute("PRAGMA recursive_triggers = ON")
+        self._conn.executescript(
+            "BEGIN IMMEDIATE;"
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+            " parent_checkpoint_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+            " task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, value BLOB,"
+            " task_path TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));"
+            "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);"
+            # Seeded once from what a file written before the totals existed holds
+            "CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO totals (name, value) SELECT 'checkpoints', COUNT(*) FROM checkpoints;"
+            "INSERT OR IGNORE INTO totals (name, value) SELECT 'bytes',"
+            " (SELECT COALESCE(SUM(LENGTH(checkpoint)), 0) FROM checkpoints) + (SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes);"
+            "CREATE TRIGGER IF NOT EXISTS checkpoints_added AFTER INSERT ON checkpoints BEGIN"
+            " UPDATE totals SET value = value + 1 WHERE name = 'checkpoints';"
+            " UPDATE totals SET value = value + COALESCE(LENGTH(NEW.checkpoint), 0) WHERE name = 'bytes'; END;"
+            "CREATE TRIGGER IF NOT EXISTS checkpoints_removed AFTER DELETE ON checkpoints BEGIN"
+            " UPDATE totals SET value = value - 1 WHERE name = 'checkpoints';"
+            " UPDATE totals SET value = value - COALESCE(LENGTH(OLD.checkpoint), 0) WHERE name = 'bytes'; END;"
+            "CREATE TRIGGER IF NOT EXISTS writes_added AFTER INSERT ON writes BEGIN"
+            " UPDATE totals SET value = value + COALESCE(LENGTH(NEW.value), 0) WHERE name = 'bytes'; END;"
+            "CREATE TRIGGER IF NOT EXISTS writes_removed AFTER DELETE ON writes BEGIN"
+            " UPDATE totals SET value = value - COALESCE(LENGTH(OLD.value), 0) WHERE name = 'bytes'; END;"
+            "COMMIT;"
+        )
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        # Same scheme as MemorySaver: monotonically increasing, unique across workers
+        current_v = 0 if current is None else current if isinstance(current, int) else int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Helpers ---
+    def _touch(self, thread_id: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO threads (thread_id, last_access) VALUES (?, ?)", (thread_id, time.time()))
+
+    def _delete(self, thread_id: str) -> None:
+        for table in ("checkpoints", "writes", "threads"):
+            self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        expired: List[str] = []
+        if self.ttl_seconds is not None:
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT thread_id FROM threads WHERE last_access < ?", (time.time() - self.ttl_seconds,))]
+        overflow = [row[0] for row in self._conn.execute(
+            "SELECT thread_id FROM threads ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_threads,))]
+        for thread_id in dict.fromkeys(expired + overflow):
+            if thread_id != keep:
+                self._delete(thread_id)
+                self._evictions += 1
+
+    def _tuple(self, row: Tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+            " ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((wtype, value))) for task_id, channel, wtype, value in writes],
+        )
+
+    # --- BaseCheckpointSaver implementation ---
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            self._touch(thread_id)
+            return self._tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+                 " FROM checkpoints WHERE 1 = 1")
+        params: List[Any] = []
+        if config is not None:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            tuples = []
+            for row in rows:
+                if limit is not None and len(tuples) >= limit:
+                    break
+                item = self._tuple(row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                tuples.append(item)
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint,"
+                " metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, serialized, metadata_type, serialized_metadata),
+            )
+            self._touch(thread_id)
+            self._evict(keep=thread_id)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts) overwrite; regular writes are kept once per index
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(lambda: [*self.list(config, filter=filter, before=before, limit=limit)]):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict()  # Let TTL expiry show up even when the server is idle
+            threads = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]  # At most max_threads rows
+            totals = dict(self._conn.execute("SELECT name, value FROM totals"))
+        return {"backend": "sqlite", "path": self.path, "threads": threads, "checkpoints": totals["checkpoints"],
+                "bytes": totals["bytes"], "evictions": self._evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_checkpointer(backend: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """Create the checkpointer selected by `settings.checkpointer` (None means no checkpointing)."""
+    backend = (backend or settings.checkpointer).lower().strip('"\'')
+    if backend == "bounded":
+        logger.info(
+            f"Using bounded in-memory checkpointer (max_threads={settings.checkpoint_max_threads}, "
+            f"ttl={settings.checkpoint_ttl_seconds}s, max_bytes={settings.checkpoint_max_bytes})"
+        )
+        return BoundedMemorySaver(
+            max_threads=settings.checkpoint_max_threads,
+            ttl_seconds=settings.checkpoint_ttl_seconds,
+            max_bytes=settings.checkpoint_max_bytes,
+        )
+    if backend == "sqlite":
+        logger.info(
+            f"Using shared SQLite checkpointer at {settings.checkpoint_path} "
+            f"(max_threads={settings.checkpoint_max_threads}, ttl={settings.checkpoint_ttl_seconds}s)"
+        )
+        return SqliteCheckpointSaver(
+            settings.checkpoint_path,
+            max_threads=settings.checkpoint_max_threads,
+            ttl_seconds=settings.checkpoint_ttl_seconds,
+        )
+    if backend == "memory":
+        logger.warning("Using unbounded MemorySaver checkpointer; memory grows with every request.")
+        return MemorySaver()
+    if backend == "none":
+        logger.info("Checkpointing disabled; every question runs statelessly.")
+        return None
+    logger.critical(f"Unsupported CHECKPOINTER in config: '{backend}'. Choose one of {CHECKPOINTER_BACKENDS}.")
+    raise ValueError(f"Unsupported CHECKPOINTER: {backend}")
+
+
+def checkpointer_stats(checkpointer: Optional[BaseCheckpointSaver]) -> Dict[str, Any]:
+    """Checkpoint count and size for any checkpointer this module can create."""
+    if checkpointer is None:
+        return {"backend": "none", "threads": 0, "checkpoints": 0, "bytes": 0}
+    if isinstance(checkpointer, (BoundedMemorySaver, SqliteCheckpointSaver)):
+        return checkpointer.stats()
+    if isinstance(checkpointer, MemorySaver):
+        return {
+            "backend": "memory",
+            "threads": len(checkpointer.storage),
+            "checkpoints": sum(len(ns) for thread in checkpointer.storage.values() for ns in thread.values()),
+            "bytes": sum(len(blob[1]) for blob in checkpointer.blobs.values()),
+        }
+    return {"backend": type(checkpointer).__name__}
@@ -1,6 +1,6 @@
 # app/config.py
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field # Import Field if you use it
 
@@ -21,7 +21,7 @@ class Settings(BaseSettings):
     )
 
     # --- LLM Provider Selection ---
-    llm_provider: str = Field(default="openrouter", description="LLM provider: 'openrouter' or 'ollama'")
+    llm_provider: str = Field(default="openrouter", description="LLM provider: 'openrouter', 'ollama', 'router' (several backends, see ROUTER_*) or 'stub' (offline, scripted)")
 
     # --- OpenRouter Configuration ---
     openrouter_api_key: Optional[str] = Field(default=None, description="API key for OpenRouter")
@@ -33,11 +33,139 @@ class Settings(BaseSettings):
     # Default needs careful consideration based on Docker networking setup
     ollama_base_url: str = Field(default="http://host.docker.internal:11434", description="API base URL for local Ollama (adjust for Docker network)")
 
+    # --- Model-Call Configuration ---
+    llm_temperature: Optional[float] = Field(default=None, description="Sampling temperature for the LLM (None uses the provider default); 0 enables the model-call cache")
+    llm_cache_backend: str = Field(default="memory", description="Cache of repeated model calls at temperature 0: 'memory', 'sqlite' (memory plus a shared disk tier) or 'none'")
+    llm_cache_path: str = Field(default="llm_cache.sqlite3", description="SQLite file used when LLM_CACHE_BACKEND=sqlite")
+    llm_cache_max_entries: int = Field(default=2048, description="Maximum cached model calls per tier (least recently used are evicted)")
+    llm_cache_ttl_seconds: Optional[float] = Field(default=3600.0, description="Age after which a cached model call expires (None disables TTL)")
+    llm_prompt_cache_control: bool = Field(default=False, description="Mark the system prompt as a cacheable prefix ('cache_control') for providers with prompt caching, e.g. Anthropic models on OpenRouter")
+
+    # --- Provider Router Configuration (LLM_PROVIDER=router) ---
+    router_backends: List[str] = Field(default_factory=list, description="Backends as 'provider:model', e.g. '[\"openrouter:openai/gpt-4o-mini\", \"ollama:llama3:8b-instruct\"]'")
+    router_backend_costs: Dict[str, float] = Field(default_factory=dict, description="Cost per backend (e.g. USD per million tokens), weighed by ROUTER_COST_WEIGHT")
+    router_cost_weight: float = Field(default=0.1, description="Seconds of median latency one unit of backend cost is worth when ranking backends")
+    router_error_penalty: float = Field(default=4.0, description="Latency multiplier per unit of recent error rate when ranking backends")
+    router_failure_threshold: int = Field(default=3, description="Consecutive failures after which a backend is ranked last for ROUTER_COOLDOWN_SECONDS")
+    router_cooldown_seconds: float = Field(default=30.0, description="How long a failing backend is avoided")
+    router_hedge: bool = Field(default=False, description="Duplicate a slow call on the next backend and keep the first answer")
+    router_hedge_delay_seconds: float = Field(default=2.0, description="Hedge delay until a backend has ROUTER_MIN_SAMPLES latency samples")
+    router_hedge_min_delay_seconds: float = Field(default=0.05, description="Lower bound for the p95-based hedge delay")
+    router_min_samples: int = Field(default=5, description="Latency samples needed before a backend's p95 sets its hedge delay")
+
+    # --- Stub Provider Configuration (LLM_PROVIDER=stub, SEARCH_BACKEND=stub) ---
+    stub_script_path: Optional[str] = Field(default=None, description="JSON list of scripted turns for the stub LLM; None uses search-then-answer")
+    stub_latency: str = Field(default="0.05", description="Stub LLM time to first token: seconds, or 'uniform:a,b', 'normal:mu,sd', 'lognormal:median,sigma', 'exp:mean'")
+    stub_token_interval: float = Field(default=0.0, description="Seconds between streamed stub LLM words")
+    stub_seed: int = Field(default=0, description="Seed for stub latency sampling and search results")
+    stub_search_latency: str = Field(default="0.05", description="Stub search latency, same format as STUB_LATENCY")
+    stub_search_result_words: int = Field(default=0, description="Words of seeded page text per stub search result (0: one short line)")
+    stub_prefill_interval: float = Field(default=0.0, description="Extra stub LLM delay per prompt token, in seconds (models prompt processing time)")
+
+    # --- LLM HTTP Client Configuration (one pooled client per provider) ---
+    http_http2: bool = Field(default=True, description="Negotiate HTTP/2 with LLM providers when the 'h2' package is installed")
+    http_max_connections: int = Field(default=100, description="Maximum concurrent connections per provider client")
+    http_max_keepalive_connections: int = Field(default=20, description="Idle connections kept open for reuse per provider client")
+    http_keepalive_expiry_seconds: float = Field(default=30.0, description="How long an idle pooled connection is kept alive")
+    http_connect_timeout_seconds: float = Field(default=5.0, description="Timeout for establishing a connection (incl. TLS)")
+    http_read_timeout_seconds: float = Field(default=120.0, description="Timeout waiting for response data from the provider")
+    http_write_timeout_seconds: float = Field(default=30.0, description="Timeout for sending the request body")
+    http_pool_timeout_seconds: float = Field(default=10.0, description="Timeout waiting for a free pooled connection (back-pressure)")
+    http_max_retries: int = Field(default=2, description="Retries on 429/5xx responses and connect failures")
+    http_retry_backoff_base_seconds: float = Field(default=0.5, description="Base delay for jittered exponential retry backoff")
+    http_retry_backoff_max_seconds: float = Field(default=8.0, description="Upper bound for a single retry delay")
+
     # --- Tool Configuration ---
     tavily_api_key: Optional[str] = Field(default=None, description="API key for Tavily Search")
+    search_backend: str = Field(default="tavily", description="Web search backend: 'tavily' (mocked when no key is set), 'mock' or 'stub' (seeded latency and results)")
+    search_max_results: int = Field(default=3, description="Results requested per web search")
+    search_timeout_seconds: Optional[float] = Field(default=10.0, description="Timeout for a single web search call")
+    search_cache_ttl_seconds: Optional[float] = Field(default=600.0, description="How long search results are cached (None disables TTL)")
+    search_cache_max_entries: int = Field(default=512, description="Maximum cached search queries")
+    search_cache_backend: str = Field(default="memory", description="Search result cache: 'memory' (per process) or 'sqlite' (shared by workers)")
+    search_cache_path: str = Field(default="search_cache.sqlite3", description="SQLite file used when SEARCH_CACHE_BACKEND=sqlite")
+
+    # --- Knowledge Index Configuration (knowledge_search tool) ---
+    knowledge_index_path: Optional[str] = Field(default=None, description="Directory of a local knowledge index built with `python -m app.knowledge add`; None disables the knowledge_search tool")
+    knowledge_min_score: float = Field(default=0.7, description="Normalised BM25 score a local hit needs; below it knowledge_search falls back to the web")
+    knowledge_max_results: int = Field(default=3, description="Local documents returned per knowledge search")
+    knowledge_max_postings: int = Field(default=1000, description="Postings read per query term and segment, highest impact first (bounds query latency)")
+    knowledge_web_fallback: bool = Field(default=True, description="Answer knowledge searches without a good local hit with a web search")
+
+    # --- Code Execution Sandbox Configuration ---
+    sandbox_pool_size: int = Field(default=2, description="Number of prewarmed sandbox worker processes")
+    sandbox_timeout_seconds: float = Field(default=5.0, description="Wall-clock limit per code execution; the worker is killed when exceeded")
+    sandbox_cpu_seconds: int = Field(default=5, description="CPU-time rlimit per code execution (whole seconds)")
+    sandbox_memory_mb: int = Field(default=256, description="Address-space rlimit for each sandbox worker")
+    sandbox_max_output_chars: int = Field(default=10000, description="Captured stdout is truncated to this many characters")
+    sandbox_user: Optional[str] = Field(default="nobody", description="Unprivileged user sandbox workers switch to when the server runs as root (empty keeps root)")
 
     # --- Agent Configuration ---
-    max_agent_iterations: int = Field(default=7, description="Maximum iterations for agent loops")
+    max_agent_iterations: int = Field(default=7, description="Default iteration budget per question (agent model calls)")
+    max_agent_tokens: Optional[int] = Field(default=None, description="Default LLM token budget per question (None: unlimited)")
+    max_agent_tool_calls: Optional[int] = Field(default=None, description="Default tool-call budget per question (None: unlimited)")
+    budget_max_iterations: int = Field(default=20, description="Upper bound on the max_iterations a request may ask for")
+    budget_max_tokens: Optional[int] = Field(default=None, description="Upper bound on the max_tokens a request may ask for (None: uncapped)")
+    budget_max_tool_calls: Optional[int] = Field(default=None, description="Upper bound on the max_tool_calls a request may ask for (None: uncapped)")
+    early_stopping: bool = Field(default=True, description="Ask for the final answer once tool rounds stop returning anything new")
+    early_stop_stale_rounds: int = Field(default=1, description="Consecutive tool rounds without new observations after which the run has converged")
+    tool_max_concurrency: int = Field(default=8, description="Default process-wide limit on concurrent executions of each tool")
+    tool_concurrency_limits: Dict[str, int] = Field(default_factory=dict, description="Per-tool overrides, e.g. '{\"web_search\": 4}'")
+    structured_answers: bool = Field(default=True, description="Have the model return its final answer as a GaiaAnswer tool call instead of labelled text")
+    answer_repair: bool = Field(default=True, description="Make one extra model call to restate an answer that can't be parsed as a GaiaAnswer")
+    answer_repair_timeout_seconds: float = Field(default=30.0, description="Time limit for the answer repair call")
+    observation_compression: bool = Field(default=True, description="Rerank search results against the question and drop repeated passages before the next model call")
+    observation_max_tokens: int = Field(default=1000, description="Approximate token budget for one tool round's observations after compression")
+    observation_chunk_tokens: int = Field(default=80, description="Approximate size of the passages search results are split into for ranking")
+    observation_duplicate_threshold: float = Field(default=0.8, description="Share of a passage's word 3-grams already seen in the run above which it is dropped")
+
+    # --- Request Deadline Configuration ---
+    request_deadline_seconds: Optional[float] = Field(default=120.0, description="Default end-to-end time limit per question, including queueing; None disables it unless the request sets deadline_seconds")
+    request_deadline_max_seconds: float = Field(default=600.0, description="Upper bound on the deadline_seconds a request may ask for")
+    request_deadline_answer_reserve_seconds: float = Field(default=10.0, description="Time kept back from tools and agent steps to ask for the best answer before the deadline (at most a quarter of it)")
+
+    # --- Session Configuration ---
+    session_history_max_tokens: Optional[int] = Field(default=2000, description="Approximate token budget for earlier turns carried into a session's next prompt (None keeps all)")
+
+    # --- Checkpointer Configuration ---
+    checkpointer: str = Field(default="bounded", description="Checkpoint store: 'bounded' (LRU/TTL evicting), 'sqlite' (shared by workers), 'memory' (unbounded MemorySaver) or 'none' (stateless)")
+    checkpoint_path: str = Field(default="checkpoints.sqlite3", description="SQLite file used when CHECKPOINTER=sqlite")
+    checkpoint_max_threads: int = Field(default=1000, description="Maximum number of threads kept by the bounded checkpointer")
+    checkpoint_ttl_seconds: Optional[float] = Field(default=900.0, description="Idle time after which a thread's checkpoints are evicted (None disables TTL)")
+    checkpoint_max_bytes: Optional[int] = Field(default=64 * 1024 * 1024, description="Cap on serialized checkpoint bytes kept in memory (None disables the cap)")
+
+    # --- Answer Cache Configuration ---
+    answer_cache_backend: str = Field(default="memory", description="Answer cache store: 'memory', 'sqlite' or 'none'")
+    answer_cache_path: str = Field(default="answer_cache.sqlite3", description="SQLite file used when ANSWER_CACHE_BACKEND=sqlite")
+    answer_cache_max_entries: int = Field(default=1024, description="Maximum cached answers (least recently used are evicted)")
+    answer_cache_ttl_seconds: Optional[float] = Field(default=3600.0, description="Age after which a cached answer expires (None disables TTL)")
+    answer_cache_similarity_threshold: Optional[float] = Field(default=None, description="Cosine similarity (0-1) for the n-gram similarity tier; None disables it")
+    answer_cache_ngram_size: int = Field(default=3, description="Character n-gram size for the similarity tier")
+    answer_cache_similarity_candidates: int = Field(default=32, description="Entries sharing the most n-grams with a question that the similarity tier scores")
+
+    # --- Admission Control Configuration ---
+    scheduler_max_in_flight: int = Field(default=32, description="Agent runs allowed to execute at once; further requests are queued")
+    scheduler_max_queue: int = Field(default=64, description="Requests allowed to wait for a slot (all priority classes); beyond this requests get 429")
+    scheduler_queue_timeout_seconds: float = Field(default=10.0, description="Default time a request may wait in the queue before it gets 503")
+    scheduler_queue_timeouts: Dict[str, float] = Field(default_factory=lambda: {"interactive": 10.0, "batch": 120.0}, description="Queue deadline per priority class, e.g. '{\"batch\": 300}'")
+
+    # --- Batch Configuration ---
+    batch_max_concurrency: int = Field(default=4, description="Upper bound on concurrent agent runs within one /invoke/batch request")
+    batch_max_size: int = Field(default=100, description="Maximum questions accepted in one /invoke/batch request")
+
+    # --- Metrics Configuration ---
+    metrics_enabled: bool = Field(default=True, description="Record Prometheus-style metrics served at /metrics")
+
+    # --- Streaming Configuration ---
+    stream_keepalive_seconds: float = Field(default=15.0, description="Idle interval after which /invoke/stream sends an SSE keep-alive comment")
+
+    # --- Multi-Worker Configuration ---
+    workers: int = Field(default=1, description="Uvicorn worker processes started by `python -m app.main`; >1 switches unset stores to SQLite")
+    sqlite_busy_timeout_seconds: float = Field(default=5.0, description="How long a SQLite store waits for another worker's write lock")
+
+    # --- Startup Configuration ---
+    startup_background_warmup: bool = Field(default=True, description="Serve requests while the agent compiles and warms up (track it with /ready); False blocks startup until warm")
+    startup_warmup_wait_seconds: float = Field(default=30.0, description="How long a request arriving during warm-up waits for the agent before getting 503")
 
     # --- FastAPI/Server Configuration ---
     # These are typically not set via .env but via CMD/runtime flags, shown here for completeness
@@ -45,12 +173,13 @@ class Settings(BaseSettings):
     # app_port: int = 8000
 
     # --- Derived Properties/Validation (Optional) ---
-    # @computed_field # Requires Pydantic v2+
-    # @property
-    # def active_llm_model(self) -> str:
-    #     if self.llm_provider == "ollama":
-    #         return self.ollama_model_name
-    #     return self.openrouter_model_name # Default to OpenRouter model
+    @property
+    def active_llm_model(self) -> str:
+        if self.llm_provider.lower().strip('"\'') == "ollama":
+            return self.ollama_model_name
+        if self.llm_provider.lower().strip('"\'') in ("stub", "router"):
+            return self.llm_provider.lower().strip('"\'')
+        return self.openrouter_model_name # Default to OpenRouter model
 
 # Create a single instance of the settings to be imported elsewhere
 settings = Settings()
@@ -0,0 +1,62 @@
+# app/deadline.py
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from .config import settings
+
+
+class Deadline:
+    """End-to-end time limit of one request, measured on the monotonic clock.
+
+    The last `reserve` seconds are kept back from tool calls and agent steps so the agent
+    can still ask the model for its best answer before the hard deadline cancels the run.
+    """
+
+    def __init__(self, seconds: float, reserve: float = 0.0):
+        self.seconds = seconds
+        self.reserve = min(reserve, seconds / 4)  # Short deadlines keep most of their time for work
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def step_timeout(self) -> float:
+        """Time a tool call or agent step may take without eating into the answer reserve."""
+        return max(0.0, self.remaining() - self.reserve)
+
+    @property
+    def reserve_reached(self) -> bool:
+        return self.remaining() <= self.reserve
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.seconds}s, {self.remaining():.3f}s left)"
+
+
+# Set around an agent run; asyncio tasks copy the context, so LangGraph nodes and tools see it
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def request_deadline(seconds: Optional[float] = None) -> Optional[Deadline]:
+    """Deadline for a request asking for `seconds` (capped by REQUEST_DEADLINE_MAX_SECONDS);
+    without one, REQUEST_DEADLINE_SECONDS applies (None: no deadline)."""
+    if seconds is None:
+        seconds = settings.request_deadline_seconds
+    if seconds is None:
+        return None
+    return Deadline(min(seconds, settings.request_deadline_max_seconds), settings.request_deadline_answer_reserve_seconds)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the request being served in this context, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
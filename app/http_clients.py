@@ -0,0 +1,133 @@
+# app/http_clients.py
+import asyncio
+import email.utils
+import importlib.util
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# One pooled client per LLM provider, created on first use (at app startup) and
+# closed by close_provider_clients() at shutdown
+_provider_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper that retries 429/5xx responses and connect failures.
+
+    Waits use full-jitter exponential backoff (`uniform(0, min(max, base * 2**attempt))`),
+    or the server's Retry-After when it is shorter than `backoff_max`.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_retries: int, backoff_base: float, backoff_max: float):
+        self._transport = transport
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = _retry_after_seconds(response) if response is not None else None
+        if retry_after is not None and retry_after <= self.backoff_max:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Nothing reached the server, so the request is safe to resend
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Connect to {request.url.host} failed ({e!r}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{request.url.host} returned {response.status_code}; retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await response.aclose()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _http2_available() -> bool:
+    if not settings.http_http2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1.")
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled async client from the HTTP_* settings."""
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.http_connect_timeout_seconds,
+        read=settings.http_read_timeout_seconds,
+        write=settings.http_write_timeout_seconds,
+        # Waiting for a free pooled connection is our back-pressure; bound it too
+        pool=settings.http_pool_timeout_seconds,
+    )
+    http2 = _http2_available()
+    transport = RetryTransport(
+        httpx.AsyncHTTPTransport(http2=http2, limits=limits),
+        max_retries=settings.http_max_retries,
+        backoff_base=settings.http_retry_backoff_base_seconds,
+        backoff_max=settings.http_retry_backoff_max_seconds,
+    )
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+
+def get_provider_client(provider: str) -> httpx.AsyncClient:
+    """Return the shared pooled client for `provider`, creating it on first use."""
+    client = _provider_clients.get(provider)
+    if client is None or client.is_closed:
+        logger.info(
+            f"Creating pooled HTTP client for '{provider}' (max_connections={settings.http_max_connections}, "
+            f"keepalive={settings.http_max_keepalive_connections}, retries={settings.http_max_retries})"
+        )
+        client = _provider_clients[provider] = create_http_client()
+    return client
+
+
+async def close_provider_clients() -> None:
+    """Close every provider client; called from the FastAPI shutdown hook."""
+    clients = list(_provider_clients.items())
+    _provider_clients.clear()
+    for provider, client in clients:
+        logger.info(f"Closing pooled HTTP client for '{provider}'")
+        await client.aclose()
@@ -0,0 +1,392 @@
+# app/knowledge.py
+import argparse
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl  # Unix only; elsewhere ingestions aren't locked against each other
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .config import settings
+from .observations import approximate_tokens, chunk_text, terms
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+INDEX_VERSION = 1
+# BM25 parameters, fixed when a segment is written (its impacts are precomputed with them)
+K1 = 1.5
+B = 0.75
+IMPACT_SCALE = 65535  # Impacts are stored as uint16 fractions of (K1 + 1)
+
+
+def term_hash(term: str) -> int:
+    """Stable 64-bit hash of a term (Python's hash() differs between processes)."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def document_key(document: Dict[str, Any]) -> int:
+    """64-bit hash of a document's content (whitespace-normalised), to skip documents indexed before."""
+    return term_hash(" ".join(document["content"].split()))
+
+
+class KnowledgeSegment:
+    """One immutable, memory-mapped segment of the knowledge index.
+
+    Files (native byte order, flat arrays read through `memoryview.cast`, no parsing on open):
+
+    * `lexicon.bin` - sorted uint64 term hashes; `offsets.bin` - uint64 start of each term's postings (+ end)
+    * `postings.bin` - uint32 document ids; `impacts.bin` - uint16 BM25 term-frequency part of each posting.
+      Each term's postings are sorted by impact, highest first, so a query can stop after the best ones.
+    * `docs.bin` - one JSON document after another; `docs.idx` - uint64 start of each (+ end)
+    * `keys.bin` - sorted uint64 document keys (see `document_key`), checked when adding documents
+
+    Pages are only read when touched and live in the OS page cache, so worker processes
+    mapping the same segment share them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Knowledge segment {path} was written on a {self.meta.get('byteorder')}-endian machine.")
+        self.documents: int = self.meta["documents"]
+        self.hashes = self._map("lexicon.bin", "Q")
+        self.offsets = self._map("offsets.bin", "Q")
+        self.doc_ids = self._map("postings.bin", "I")
+        self.impacts = self._map("impacts.bin", "H")
+        self.doc_offsets = self._map("docs.idx", "Q")
+        self.store = self._map("docs.bin", "B")
+        self.keys = self._map("keys.bin", "Q")
+
+    def _map(self, name: str, fmt: str) -> memoryview:
+        with open(os.path.join(self.path, name), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast(fmt)
+
+    def span(self, hashed: int) -> Optional[Tuple[int, int]]:
+        """Start and end of a term's postings, or None if the segment doesn't contain it."""
+        i = bisect.bisect_left(self.hashes, hashed)
+        if i < len(self.hashes) and self.hashes[i] == hashed:
+            return self.offsets[i], self.offsets[i + 1]
+        return None
+
+    def contains(self, key: int) -> bool:
+        """Whether a document with this `document_key` is in the segment."""
+        i = bisect.bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        return json.loads(self.store[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]].tobytes())
+
+    def nbytes(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+
+def write_segment(path: str, documents: List[Dict[str, Any]]) -> int:
+    """Write `documents` (dicts with "content", optional "url"/"title") as a segment at `path`.
+
+    Returns the number of documents written; those without any indexable term are skipped.
+    """
+    postings: Dict[str, array] = defaultdict(lambda: array("I"))
+    frequencies: Dict[str, array] = defaultdict(lambda: array("H"))
+    lengths = array("I")
+    doc_offsets = array("Q", [0])
+    keys = array("Q")
+    os.makedirs(path)
+    with open(os.path.join(path, "docs.bin"), "wb") as store:
+        for document in documents:
+            counts = Counter(terms(f"{document.get('title', '')} {document['content']}"))
+            if not counts:
+                continue
+            doc_id = len(lengths)
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append(doc_id)
+                frequencies[term].append(min(tf, 65535))
+            keys.append(document_key(document))
+            payload = json.dumps(document, ensure_ascii=False).encode("utf-8")
+            store.write(payload)
+            doc_offsets.append(doc_offsets[-1] + len(payload))
+
+    average = sum(lengths) / len(lengths) if lengths else 1.0
+    norms = [K1 * (1 - B + B * length / average) for length in lengths]
+    scale = IMPACT_SCALE / (K1 + 1)
+    hashes = sorted((term_hash(term), term) for term in postings)
+    offsets, doc_ids, impacts = array("Q", [0]), array("I"), array("H")
+    for _, term in hashes:
+        ranked = sorted(
+            ((round(tf * (K1 + 1) / (tf + norms[doc]) * scale), doc) for doc, tf in zip(postings[term], frequencies[term])),
+            key=itemgetter(0), reverse=True,
+        )
+        impacts.extend(impact for impact, _ in ranked)
+        doc_ids.extend(doc for _, doc in ranked)
+        offsets.append(len(doc_ids))
+
+    for name, values in (("lexicon.bin", array("Q", (h for h, _ in hashes))), ("offsets.bin", offsets),
+                         ("postings.bin", doc_ids), ("impacts.bin", impacts), ("docs.idx", doc_offsets),
+                         ("keys.bin", array("Q", sorted(keys)))):
+        with open(os.path.join(path, name), "wb") as f:
+            values.tofile(f)
+    meta = {"version": INDEX_VERSION, "documents": len(lengths), "terms": len(hashes), "postings": len(doc_ids),
+            "average_length": average, "k1": K1, "b": B, "byteorder": sys.byteorder, "created": time.time()}
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return len(lengths)
+
+
+class KnowledgeIndex:
+    """Local document index searched by the knowledge_search tool.
+
+    A directory of append-only segments (see KnowledgeSegment) listed in `manifest.json`.
+    Ingestion writes new segments and then swaps the manifest atomically, so a running
+    server picks them up on its next search without a restart. Scoring is BM25 with IDF
+    over all segments; each query term reads at most `max_postings` postings per segment,
+    its highest-impact ones, so latency stays flat as the corpus grows. Scores are
+    normalised by the query's total IDF: 1.0 is roughly an average-length passage containing
+    every query term once.
+    """
+
+    def __init__(self, path: str, max_postings: int = 1000):
+        self.path = path
+        self.max_postings = max_postings
+        self._segments: Tuple[KnowledgeSegment, ...] = ()
+        self._manifest_mtime: Optional[int] = -1  # Not looked at yet; None once found missing
+        self._lock = threading.Lock()
+
+    # --- Reading ---
+    def _read_manifest(self) -> Dict[str, Any]:
+        with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+
+    def refresh(self) -> None:
+        """Open the segments of a manifest that changed since the last look (cheap when it didn't)."""
+        try:
+            mtime = os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            if mtime is None:
+                logger.warning(f"No knowledge index at {self.path}; knowledge_search finds nothing until one is built.")
+                self._segments = ()
+            else:
+                opened = {segment.path: segment for segment in self._segments}
+                paths = [os.path.join(self.path, name) for name in self._read_manifest()["segments"]]
+                # Segments are immutable: keep the ones already mapped, open only the new ones
+                self._segments = tuple(opened.get(path) or KnowledgeSegment(path) for path in paths)
+                logger.info(f"Knowledge index {self.path}: {len(self._segments)} segment(s), {self.documents} documents.")
+            self._manifest_mtime = mtime
+
+    @property
+    def documents(self) -> int:
+        return sum(segment.documents for segment in self._segments)
+
+    def search(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Best `limit` documents for `query`, each with its normalised `score`."""
+        self.refresh()
+        segments = self._segments
+        hashed = [term_hash(term) for term in set(terms(query))]
+        if not segments or not hashed:
+            return []
+        spans = [[segment.span(h) for h in hashed] for segment in segments]
+        total = sum(segment.documents for segment in segments)
+        idfs = []
+        for i in range(len(hashed)):
+            df = sum(end - start for start, end in (row[i] for row in spans if row[i] is not None))
+            idfs.append(math.log(1 + (total - df + 0.5) / (df + 0.5)))
+        # Impacts are fractions of (K1 + 1); an average-length document with tf=1 contributes idf
+        weights = [idf * (K1 + 1) / IMPACT_SCALE for idf in idfs]
+        best_possible = sum(idfs)
+
+        candidates: List[Tuple[float, int, int]] = []
+        for s, (segment, row) in enumerate(zip(segments, spans)):
+            scores: Dict[int, float] = {}
+            for weight, span in zip(weights, row):
+                if span is None:
+                    continue
+                start, end = span[0], min(span[1], span[0] + self.max_postings)
+                for doc, impact in zip(segment.doc_ids[start:end], segment.impacts[start:end]):
+                    scores[doc] = scores.get(doc, 0.0) + impact * weight
+            candidates.extend((score, s, doc) for doc, score in heapq.nlargest(limit, scores.items(), key=itemgetter(1)))
+
+        hits = []
+        for score, s, doc in heapq.nlargest(limit, candidates):
+            document = segments[s].document(doc)
+            hits.append({"url": document.get("url", ""), "title": document.get("title", ""),
+                         "content": document["content"], "score": round(score / best_possible, 3)})
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        segments = self._segments
+        return {"path": self.path, "segments": len(segments), "documents": sum(s.documents for s in segments),
+                "terms": sum(s.meta["terms"] for s in segments), "bytes": sum(s.nbytes() for s in segments)}
+
+    # --- Writing ---
+    @contextmanager
+    def _writer(self) -> Iterator[None]:
+        """One ingestion at a time per index directory (across processes)."""
+        os.makedirs(self.path, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_manifest(self, segments: List[str]) -> None:
+        tmp = os.path.join(self.path, f"{MANIFEST}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "segments": segments}, f)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]], segment_documents: int = 100_000,
+                      rebuild: bool = False) -> int:
+        """Index `documents` in new segments of up to `segment_documents` each; returns how many were added.
+
+        Existing segments are kept (incremental ingestion) unless `rebuild`, in which case
+        they are replaced once all new segments are written. Each segment is published in
+        the manifest as soon as it is complete. Documents whose content is already indexed
+        (in a kept segment, or earlier in this ingestion) are skipped, so adding the same
+        file twice doesn't fill search results with copies.
+        """
+        added = skipped = 0
+        with self._writer():
+            try:
+                old = self._read_manifest()["segments"]
+            except FileNotFoundError:
+                old = []
+            segments = [] if rebuild else list(old)
+            indexed = [KnowledgeSegment(os.path.join(self.path, name)) for name in segments]
+            pending: Set[int] = set()  # Keys of the segment being filled
+
+            def new_documents() -> Iterator[Dict[str, Any]]:
+                nonlocal skipped
+                for document in documents:
+                    key = document_key(document)
+                    if key in pending or any(segment.contains(key) for segment in indexed):
+                        skipped += 1
+                        continue
+                    pending.add(key)
+                    yield document
+
+            # Past any segment directory, listed or left behind by an interrupted ingestion
+            number = max((int(name.rsplit("-", 1)[1]) for name in os.listdir(self.path) if name.startswith("segment-")), default=0)
+            unseen = new_documents()
+            while batch := list(islice(unseen, segment_documents)):
+                number += 1
+                name = f"segment-{number:06d}"
+                written = write_segment(os.path.join(self.path, name), batch)
+                if not written:  # Nothing indexable in this batch
+                    shutil.rmtree(os.path.join(self.path, name))
+                    continue
+                segments.append(name)
+                indexed.append(KnowledgeSegment(os.path.join(self.path, name)))
+                pending.clear()
+                added += written
+                if not rebuild:
+                    self._write_manifest(segments)
+                logger.info(f"Wrote {name}: {written} documents ({added} so far).")
+            if rebuild:
+                self._write_manifest(segments)
+                for name in old:
+                    shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        if skipped:
+            logger.info(f"Skipped {skipped} documents already in the index.")
+        self.refresh()
+        return added
+
+
+def read_documents(paths: Iterable[str], passage_tokens: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Documents from JSONL files (objects with "content" or "text", optional "url" and "title")
+    or from any other text file (one document each). With `passage_tokens`, longer documents
+    are split into passages of about that size, each indexed on its own."""
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        else:
+            with open(path, encoding="utf-8") as f:
+                records = [{"url": f"file://{os.path.abspath(path)}", "title": os.path.basename(path), "content": f.read()}]
+        for i, record in enumerate(records):
+            content = record.get("content") or record.get("text") or ""
+            document = {"url": record.get("url") or f"kb://{os.path.basename(path)}/{record.get('id', i)}",
+                        "title": record.get("title", ""), "content": content}
+            if not passage_tokens or approximate_tokens(content) <= passage_tokens:
+                yield document
+                continue
+            for n, passage in enumerate(chunk_text(content, passage_tokens)):
+                yield {**document, "url": f"{document['url']}#p{n}", "content": passage}
+
+
+_knowledge_index: Optional[KnowledgeIndex] = None
+
+
+def get_knowledge_index() -> Optional[KnowledgeIndex]:
+    """Process-wide index at KNOWLEDGE_INDEX_PATH, opened on first use; None when not configured."""
+    global _knowledge_index
+    if not settings.knowledge_index_path:
+        return None
+    if _knowledge_index is None:
+        _knowledge_index = KnowledgeIndex(settings.knowledge_index_path, settings.knowledge_max_postings)
+    return _knowledge_index
+
+
+def main() -> None:
+    """`python -m app.knowledge add|search|stats INDEX ...` - build, query and inspect a knowledge index."""
+    parser = argparse.ArgumentParser(description="Build and query the local knowledge index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Index documents (JSONL or text files) in new segments")
+    add.add_argument("index", help="Index directory (created if missing)")
+    add.add_argument("files", nargs="+", help="JSONL files of {url, title, content} objects, or text files")
+    add.add_argument("--rebuild", action="store_true", help="Replace the existing segments instead of adding to them")
+    add.add_argument("--segment-documents", type=int, default=100_000, help="Documents per segment")
+    add.add_argument("--passage-tokens", type=int, default=200, help="Split longer documents into passages (0: never)")
+    search = commands.add_parser("search", help="Run a query against the index")
+    search.add_argument("index")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=settings.knowledge_max_results)
+    stats = commands.add_parser("stats", help="Show segment, document and size counts")
+    stats.add_argument("index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    index = KnowledgeIndex(args.index, settings.knowledge_max_postings)
+    if args.command == "add":
+        start = time.perf_counter()
+        added = index.add_documents(read_documents(args.files, args.passage_tokens or None),
+                                    args.segment_documents, rebuild=args.rebuild)
+        print(f"Indexed {added} documents in {time.perf_counter() - start:.1f}s: {json.dumps(index.stats())}")
+    elif args.command == "search":
+        print(json.dumps(index.search(args.query, args.limit), indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# app/llm_cache.py
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from .cache import AnswerCacheBackend, MemoryAnswerCacheBackend, SqliteAnswerCacheBackend
+from .config import settings
+from .metrics import LLM_CACHE_LOOKUPS, LLM_CACHE_SAVED_TOKENS
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_BACKENDS = ("memory", "sqlite", "none")
+
+# Per-response bookkeeping on messages in the history (provider response ids, token usage,
+# timings); it differs between otherwise identical runs, so it is left out of the key
+VOLATILE_MESSAGE_FIELDS = ("id", "usage_metadata", "response_metadata")
+
+
+def model_call_key(prompt: str, llm_string: str) -> str:
+    """Hash of the model and its parameters (`llm_string`, which includes bound tools) and the
+    serialized messages (`prompt`) without their volatile fields."""
+    try:
+        messages = json.loads(prompt)
+        for message in messages:
+            kwargs = message.get("kwargs", {})
+            for field in VOLATILE_MESSAGE_FIELDS:
+                kwargs.pop(field, None)
+        prompt = json.dumps(messages, sort_keys=True)
+    except (ValueError, AttributeError, TypeError):
+        pass  # Not a serialized message list; hash it as is
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def _without_usage(generation: Generation) -> Generation:
+    """Copy of a cached generation that reports no token usage, since replaying it costs no tokens."""
+    message = getattr(generation, "message", None)
+    if message is None or not getattr(message, "usage_metadata", None):
+        return generation
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    return generation.model_copy(update={"message": message.model_copy(update={"usage_metadata": usage})})
+
+
+class ModelCallCache(BaseCache):
+    """Cache of individual chat model completions, attached to the model as its LangChain `cache`.
+
+    LangChain calls `lookup`/`update` around every model call with the serialized messages and a
+    string of the model's parameters, so repeated agent steps (same prompt, history and tools)
+    are answered locally. Lookups try the process-local LRU `memory` tier first and then the
+    optional `disk` tier (SQLite, shared by workers); disk hits are promoted to memory. Only
+    attach it to deterministic models (temperature 0), where a repeat is a valid completion.
+    """
+
+    def __init__(self, memory: AnswerCacheBackend, disk: Optional[AnswerCacheBackend] = None, model: str = ""):
+        self.memory = memory
+        self.disk = disk
+        self.model = model
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                          "saved_input_tokens": 0, "saved_output_tokens": 0}
+
+    def _record_hit(self, tier: str, generations: Sequence[Generation]) -> None:
+        self._counters[f"{tier}_hits"] += 1
+        LLM_CACHE_LOOKUPS.inc(self.model, tier)
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            for direction in ("input", "output"):
+                tokens = usage.get(f"{direction}_tokens", 0) or 0
+                self._counters[f"saved_{direction}_tokens"] += tokens
+                LLM_CACHE_SAVED_TOKENS.inc(self.model, direction, amount=tokens)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = model_call_key(prompt, llm_string)
+        tier, payload = "memory", self.memory.get(key)
+        if payload is None and self.disk is not None:
+            tier, payload = "disk", self.disk.get(key)
+            if payload is not None:
+                self.memory.set(key, self.model, key, payload)
+        if payload is None:
+            self._counters["misses"] += 1
+            LLM_CACHE_LOOKUPS.inc(self.model, "miss")
+            return None
+        # Rebuilt per hit: LangChain mutates the generations it gets back
+        generations = [
+            ChatGeneration(message=message, generation_info=info)
+            for message, info in zip(messages_from_dict(payload["messages"]), payload["generation_info"])
+        ]
+        self._record_hit(tier, generations)
+        return [_without_usage(generation) for generation in generations]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if not return_val or not all(isinstance(g, ChatGeneration) for g in return_val):
+            return
+        key = model_call_key(prompt, llm_string)
+        # Message ids are per run; a replayed completion gets a fresh one from LangChain
+        payload = {
+            "messages": messages_to_dict([g.message.model_copy(update={"id": None}) for g in return_val]),
+            "generation_info": [g.generation_info for g in return_val],
+        }
+        self.memory.set(key, self.model, key, payload)
+        if self.disk is not None:
+            self.disk.set(key, self.model, key, payload)
+        self._counters["stores"] += 1
+
+    # Both tiers answer in microseconds, so the async variants run inline rather than in a thread
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drop the memory tier; the disk tier ages out through its TTL and size bound."""
+        self.memory = MemoryAnswerCacheBackend(self.memory.max_entries, self.memory.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+        lookups = hits + self._counters["misses"]
+        return {
+            "backend": type(self.disk or self.memory).__name__,
+            "entries": len(self.disk if self.disk is not None else self.memory),
+            **self._counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+
+_llm_cache: Optional[ModelCallCache] = None
+
+
+def is_deterministic(llm: Any) -> bool:
+    """Whether repeated calls may be answered from the cache: only at temperature 0."""
+    return getattr(llm, "temperature", None) == 0
+
+
+def get_llm_cache(backend: Optional[str] = None) -> Optional[ModelCallCache]:
+    """Return the process-wide model-call cache selected by `settings.llm_cache_backend` (None when disabled)."""
+    global _llm_cache
+    backend = (backend or settings.llm_cache_backend).lower().strip('"\'')
+    if backend == "none":
+        return None
+    if _llm_cache is None:
+        memory = MemoryAnswerCacheBackend(settings.llm_cache_max_entries, settings.llm_cache_ttl_seconds)
+        if backend == "memory":
+            disk = None
+        elif backend == "sqlite":
+            disk = SqliteAnswerCacheBackend(settings.llm_cache_path, settings.llm_cache_max_entries,
+                                            settings.llm_cache_ttl_seconds, table="llm_calls")
+        else:
+            logger.critical(f"Unsupported LLM_CACHE_BACKEND in config: '{backend}'. Choose one of {LLM_CACHE_BACKENDS}.")
+            raise ValueError(f"Unsupported LLM_CACHE_BACKEND: {backend}")
+        logger.info(f"Model-call cache: backend={backend}, max_entries={settings.llm_cache_max_entries}, ttl={settings.llm_cache_ttl_seconds}s")
+        _llm_cache = ModelCallCache(memory, disk, model=settings.active_llm_model)
+    return _llm_cache
+
+
+def close_llm_cache() -> None:
+    global _llm_cache
+    if _llm_cache is not None:
+        _llm_cache.close()
+        _llm_cache = None
@@ -1,15 +1,36 @@
 import os
+import asyncio
+import json
 import logging
-from fastapi import FastAPI, HTTPException, Body
+import re
+import time
+import weakref
+from contextlib import aclosing
+from fastapi import FastAPI, HTTPException, Body, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from uuid import uuid4
 import traceback
 
-from .schemas import QueryRequest, AgentResponse, StepDetail, GaiaAnswer # Import GaiaAnswer
-from .agent import get_compiled_agent, AgentState, MAX_AGENT_ITERATIONS # Import from agent module
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
-from typing import List, Optional, Dict, Any
+from .schemas import QueryRequest, AgentResponse, StepDetail, GaiaAnswer, BatchQueryRequest, BatchItemResult, BatchResponse
+from .agent import get_compiled_agent, compact_history, AgentState, Replace, AnswerStreamParser, MAX_AGENT_ITERATIONS # Import from agent module
+from .config import settings
+from .checkpoint import checkpointer_stats
+from .http_clients import close_provider_clients
+from .cache import get_answer_cache, normalize_question
+from .search import close_search_client, get_search_client
+from .knowledge import get_knowledge_index
+from .llm_cache import close_llm_cache, get_llm_cache
+from .router import get_router_stats
+from .deadline import Deadline, deadline_scope, request_deadline
+from .budget import AgentBudget, budget_scope, request_budget
+from .sandbox import close_sandbox_pool, get_sandbox_pool
+from .metrics import (AGENT_STOPS, CHECKPOINTER_BYTES, CHECKPOINTER_ENTRIES, DEADLINES, ERRORS, SCHEDULER_IN_FLIGHT,
+                      SCHEDULER_QUEUE_DEPTH, MetricsMiddleware, render_metrics)
+from .scheduler import PRIORITY_CLASSES, AdmissionRejected, Slot, get_request_scheduler
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage, BaseMessage
+from typing import List, Optional, Dict, Any, Tuple
 
 # --- Basic Logging Setup ---
 # Consistent with agent.py, but could be more specific if needed
@@ -32,130 +53,338 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+# Request latency histograms for /metrics (pure ASGI, so streaming responses are timed to the last byte)
+app.add_middleware(MetricsMiddleware)
 
 compiled_agent_graph = None
+answer_cache = None
+agent_warmup: Optional[asyncio.Task] = None
+startup_timings: Dict[str, float] = {}
 
-@app.on_event("startup")
-async def startup_event():
+async def _warm_up_agent() -> None:
+    """Compile the agent graph and prewarm the sandbox; /ready reports 200 once this succeeds."""
     global compiled_agent_graph
-    logger.info("FastAPI app startup: Initializing LangGraph agent...")
+    start = time.perf_counter()
+    logger.info("FastAPI app startup: Initializing LangGraph agent and prewarming code execution sandbox...")
     try:
-        compiled_agent_graph = get_compiled_agent()
-        logger.info("LangGraph agent initialized successfully.")
+        # Compiling imports the provider SDK, so it runs in a thread and /health and /ready keep answering
+        compiled, _ = await asyncio.gather(asyncio.to_thread(get_compiled_agent), get_sandbox_pool().start())
+        compiled_agent_graph = compiled
+        startup_timings["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"LangGraph agent initialized successfully in {startup_timings['warmup_seconds']}s.")
     except Exception as e:
         logger.critical(f"CRITICAL: Failed to initialize LangGraph agent on startup: {e}", exc_info=True)
         # Consider if the app should hard fail here
         # raise RuntimeError(f"Failed to initialize agent: {e}") from e
 
-def extract_gaia_answer_from_state(state) -> GaiaAnswer:
-    """Extract GaiaAnswer data from the agent's final state."""
-    answer = ""
-    reasoning = ""
-    sources = []
-    
-    # Look for final_answer step in intermediate_steps_log
-    for step in state.values.get("intermediate_steps_log", []):
-        if step.get("type") == "final_answer":
-            content = step.get("content", {})
-            answer = content.get("answer", "")
-            reasoning = content.get("reasoning", "")
-            sources = content.get("sources", [])
-            break
-    
-    # If no final_answer step found, use the final message as the answer
-    if not answer:
-        messages = state.values.get("messages", [])
-        for msg in reversed(messages):
-            if isinstance(msg, AIMessage) and not msg.tool_calls:
-                answer = msg.content
-                break
-    
-    return GaiaAnswer(
-        answer=answer,
-        reasoning=reasoning,
-        sources=sources
-    )
+@app.on_event("startup")
+async def startup_event():
+    global answer_cache, agent_warmup
+    logger.info("FastAPI app startup: Initializing answer cache...")
+    answer_cache = get_answer_cache()
+    agent_warmup = asyncio.create_task(_warm_up_agent())
+    if not settings.startup_background_warmup:
+        await agent_warmup
 
-@app.post("/invoke", response_model=GaiaAnswer)
-async def invoke_agent(request: QueryRequest = Body(...)):
+async def _require_agent(endpoint: str) -> None:
+    """Wait (bounded) for a warm-up still in progress; 503 if the agent is not available."""
+    if compiled_agent_graph is None and agent_warmup is not None and not agent_warmup.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(agent_warmup), settings.startup_warmup_wait_seconds)
+        except asyncio.TimeoutError:
+            pass
     if compiled_agent_graph is None:
-        logger.error("Agent not initialized call received on /invoke")
+        logger.error(f"Agent not initialized call received on {endpoint}")
         raise HTTPException(status_code=503, detail="Agent not initialized. Please try again later or check server logs.")
 
-    session_id = str(uuid4()) # Used for logging and future stateful interactions
-    logger.info(f"Received query for session '{session_id}': '{request.question}'")
+@app.on_event("shutdown")
+async def shutdown_event():
+    if agent_warmup is not None and not agent_warmup.done():
+        agent_warmup.cancel()
+    logger.info("FastAPI app shutdown: Closing pooled LLM HTTP clients...")
+    await close_provider_clients()
+    await close_search_client()
+    close_llm_cache()
+    await close_sandbox_pool()
+    if answer_cache is not None:
+        answer_cache.close()
 
-    initial_state = AgentState(
-        messages=[HumanMessage(content=request.question)],
-        current_gaia_question=request.question,
-        iteration=0,
-        intermediate_steps_log=[] # Initialize log for this session
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    ERRORS.inc(f"admission_{exc.status_code}")
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers={"Retry-After": str(exc.retry_after)})
+
+class RunLog:
+    """What an agent run has produced so far, built from LangGraph "updates" events.
+
+    Each event holds only what one node added (see AgentState), and applying it costs time
+    in proportion to that, not to the run so far. Observation texts are kept by tool call id
+    so compact `tool_observation` log entries can be rendered as full StepDetails.
+    """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        self.observations: Dict[str, str] = {}  # tool_call_id -> text, in arrival order
+        self.final_answer: Optional[Dict[str, Any]] = None
+        self.reply: Optional[str] = None  # Latest AI message without tool calls, errors included
+        self.error: Optional[str] = None  # Latest LLM error reported that way
+        self.last_message: Optional[BaseMessage] = None
+        self.deadline_reached = False
+        self.failed = False
+
+    def apply(self, update: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add one node's update; returns the step-log entries it added."""
+        if not isinstance(update, dict):  # None for nodes that changed nothing; interrupts are tuples
+            return []
+        for message in update.get("messages") or ():
+            if isinstance(message, ToolMessage):
+                self.observations[message.tool_call_id] = message.text
+            elif isinstance(message, AIMessage) and not message.tool_calls:
+                self.reply = message.text
+                if "LLM Error" in message.text or "Cannot proceed" in message.text:
+                    self.error = message.text
+            self.last_message = message
+        steps = update.get("intermediate_steps_log") or []
+        for step in steps:
+            if step["type"] == "final_answer" and self.final_answer is None:
+                self.final_answer = step["content"]
+            elif step["type"] == "deadline_reached":
+                self.deadline_reached = True
+            elif step["type"] == "error_message":
+                self.failed = True
+        self.steps.extend(steps)
+        return steps
+
+    def detail(self, step: Dict[str, Any]) -> StepDetail:
+        """A log entry as returned by the API, with the observation text filled back in."""
+        if step["type"] == "tool_observation":
+            observation = step["content"]
+            content = {"tool_name": observation["tool_name"], "content": self.observations.get(observation["tool_call_id"], ""),
+                       "tool_call_id": observation["tool_call_id"]}
+            return StepDetail(type=step["type"], content=content)
+        return StepDetail(**step)
+
+    def answer(self) -> GaiaAnswer:
+        """The run's final answer: the logged GaiaAnswer, else its last reply without tool calls."""
+        final = self.final_answer or {}
+        return GaiaAnswer(answer=final.get("answer") or self.reply or "", reasoning=final.get("reasoning", ""),
+                          sources=final.get("sources", []))
+
+    @property
+    def deadline_outcome(self) -> Optional[str]:
+        """'forced_answer' if the agent answered early because its deadline was near, else None."""
+        return "forced_answer" if self.deadline_reached else None
+
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>)\]]+")
+
+def _observation_text(content: str) -> str:
+    """Readable text of a tool observation: the first result of a web search, else the raw output."""
+    try:
+        results = json.loads(content)
+        if isinstance(results, list) and results and isinstance(results[0], dict):
+            return str(results[0].get("content", content))
+    except ValueError:
+        pass
+    return content
+
+def best_effort_answer(run: RunLog, deadline: Deadline) -> GaiaAnswer:
+    """The best GaiaAnswer available from what a run produced before its deadline cut it off.
+
+    A final answer that was already recorded is returned as is. Otherwise the answer is the
+    model's latest thought, or else the latest successful tool observation, and the URLs seen
+    in the observations are the sources.
+    """
+    if run.final_answer is not None:
+        return GaiaAnswer(**run.final_answer)
+    steps = run.steps
+    thoughts = [step["content"] for step in steps if step.get("type") == "llm_thought"]
+    observations = [text for text in run.observations.values() if not text.startswith("Error")]
+    notice = f"No final answer was reached within the {deadline.seconds:g}s deadline."
+    if thoughts:
+        answer = thoughts[-1]
+    elif observations:
+        answer = f"{notice} Latest finding: {_observation_text(observations[-1])[:500]}"
+    else:
+        answer = notice
+    tool_calls = sum(step.get("type") == "tool_call" for step in steps)
+    return GaiaAnswer(
+        answer=answer,
+        reasoning=f"{notice} This answer was assembled from partial results after {tool_calls} tool call(s).",
+        sources=list(dict.fromkeys(url for text in observations for url in URL_PATTERN.findall(text)))[:5],
     )
+
+def _stopped_at_deadline(budget: Optional[AgentBudget]) -> None:
+    """Record a run cancelled at its deadline (its end node never ran)."""
+    AGENT_STOPS.inc("deadline")
+    if budget is not None:
+        budget.stop_reason = "deadline"
+
+def _stopped_by_error(budget: Optional[AgentBudget]) -> None:
+    """Record a run that raised before its end node ran; one that had already stopped keeps its reason."""
+    if budget is not None and budget.stop_reason is None:
+        AGENT_STOPS.inc("error")
+        budget.stop_reason = "error"
+
+def _cache_directives(cache_control: Optional[str], x_cache_bypass: Optional[str]) -> Tuple[bool, bool]:
+    """Return (read_from_cache, write_to_cache) for the request's cache headers.
+
+    `X-Cache-Bypass: 1` or `Cache-Control: no-cache` skips the lookup but refreshes the entry;
+    `Cache-Control: no-store` additionally keeps the answer out of the cache.
+    """
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    bypass = (x_cache_bypass or "").strip().lower() in ("1", "true", "yes") or "no-cache" in directives
+    no_store = "no-store" in directives
+    return not (bypass or no_store), not no_store
+
+def _priority_class(x_priority: Optional[str], default: str) -> str:
+    """Scheduler priority class requested via the `X-Priority` header."""
+    priority = (x_priority or default).strip().lower()
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown X-Priority '{x_priority}'. Choose one of {list(PRIORITY_CLASSES)}.")
+    return priority
+
+# One lock per live session, so turns of the same conversation run one after another
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+def _resolve_session(request: QueryRequest) -> Tuple[str, bool]:
+    """Return (session_id, resume): the client's session to continue, or a new one."""
+    if request.session_id is None:
+        return str(uuid4()), False
+    if compiled_agent_graph.checkpointer is None:
+        raise HTTPException(status_code=400, detail="Sessions need a checkpointer; CHECKPOINTER=none runs every question statelessly.")
+    return request.session_id, True
+
+async def _new_agent_run(question: str, session_id: str, resume: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Graph input and run config for one question.
+
+    When resuming a session, the earlier turns are loaded from its checkpoint, compacted and
+    trimmed to SESSION_HISTORY_MAX_TOKENS, and the new question is appended to them. The
+    input replaces (rather than appends to) the checkpointed messages and step log.
+    """
     config = {"configurable": {"thread_id": session_id}} # LangGraph uses thread_id for checkpointers
+    history: List[BaseMessage] = []
+    if resume:
+        snapshot = await compiled_agent_graph.aget_state(config)
+        history = compact_history(snapshot.values.get("messages", []), settings.session_history_max_tokens)
+    initial_state = {
+        "messages": Replace([*history, HumanMessage(content=question)]),
+        "current_gaia_question": question,
+        "iteration": 0,
+        "intermediate_steps_log": Replace(), # Initialize log for this turn
+    }
+    return initial_state, config
+
+async def _run_agent(question: str, session_id: str, resume: bool = False, deadline: Optional[Deadline] = None,
+                     budget: Optional[AgentBudget] = None) -> Tuple[GaiaAnswer, Optional[str], Optional[str]]:
+    """Run the compiled graph for one question, continuing the session when `resume` is set.
+
+    Returns the extracted GaiaAnswer, the message of a critical LLM error (if any) and the
+    deadline outcome: None, 'forced_answer' when the agent answered from the deadline's
+    reserve, or 'partial' when the run was cancelled at the deadline and the answer was
+    assembled from its step log. Other failures propagate to the caller. What the run
+    spent is recorded on `budget`.
+    """
+    with deadline_scope(deadline), budget_scope(budget):
+        if resume:
+            async with _session_lock(session_id):
+                return await _run_agent_turn(question, session_id, resume, deadline, budget)
+        return await _run_agent_turn(question, session_id, resume, deadline, budget)
 
-    all_intermediate_steps_for_response: List[StepDetail] = []
-    final_answer_content: Optional[str] = None
-    error_message_content: Optional[str] = None
+async def _run_agent_turn(question: str, session_id: str, resume: bool, deadline: Optional[Deadline],
+                          budget: Optional[AgentBudget]) -> Tuple[GaiaAnswer, Optional[str], Optional[str]]:
+    run = RunLog()
 
     try:
-        async for event_part in compiled_agent_graph.astream(initial_state, config=config, stream_mode="values"):
-            # Capture intermediate steps from the agent's log
-            # The state is updated cumulatively by 'operator.add' for intermediate_steps_log
-            # So, the last event_part will contain all of them.
-
-            # For more granular step-by-step logging from the stream:
-            # current_step_details = event_part.get("intermediate_steps_log", [])
-            # if current_step_details:
-            #     # Assuming intermediate_steps_log is appended to, not replaced.
-            #     # If it's replaced, then current_step_details is the complete log for that step.
-            #     # For this example, assuming the AgentState adds, so last one is complete.
-            #     pass # logging already happens within agent nodes
-
-            # Check for final answer or critical errors in messages
-            messages_in_event: List[BaseMessage] = event_part.get("messages", [])
-            for msg in messages_in_event:
-                if isinstance(msg, AIMessage) and not msg.tool_calls:
-                    if "LLM Error" in msg.content or "Cannot proceed" in msg.content:
-                        error_message_content = msg.content
-                        logger.error(f"Session '{session_id}': Critical error from LLM: {msg.content}")
-                    else:
-                        final_answer_content = msg.content # This might be overwritten if agent runs more steps
-                # More specific error checks can be added
-
-        # After the stream completes, get the final state for accumulated logs
-        final_stream_state = compiled_agent_graph.get_state(config)
-        accumulated_steps_from_state = final_stream_state.values.get("intermediate_steps_log", [])
-        
-        for step in accumulated_steps_from_state:
-            all_intermediate_steps_for_response.append(StepDetail(**step))
-
-
-        # Determine final answer from the very last messages in the final state
-        if not final_answer_content and not error_message_content: # if not set by an explicit error AIMessage
-            final_messages_in_last_state: List[BaseMessage] = final_stream_state.values.get("messages", [])
-            for msg in reversed(final_messages_in_last_state): # Check latest messages first
-                if isinstance(msg, AIMessage) and not msg.tool_calls :
-                    final_answer_content = msg.content
-                    break
-            if not final_answer_content and final_messages_in_last_state: # Fallback
-                final_answer_content = f"Agent processing completed. Last message: '{final_messages_in_last_state[-1].content}'"
-            elif not final_answer_content:
-                final_answer_content = "Agent processing completed. No definitive final answer found."
-        
-        if final_answer_content:
-             logger.info(f"Session '{session_id}': Final answer: '{final_answer_content}'")
+        # The whole run, LLM and tool calls included, is cancelled when the deadline passes
+        async with asyncio.timeout(deadline.remaining() if deadline is not None else None) as run_scope:
+            initial_state, config = await _new_agent_run(question, session_id, resume)
+            async with aclosing(compiled_agent_graph.astream(initial_state, config=config, stream_mode="updates")) as events:
+                async for event in events:
+                    # Each "updates" event holds only what one node added; the run log accumulates them,
+                    # which avoids a checkpointer round-trip and works with CHECKPOINTER=none
+                    for update in event.values():
+                        error = run.error
+                        run.apply(update)
+                        if run.error is not error:
+                            logger.error(f"Session '{session_id}': Critical error from LLM: {run.error}")
+    except TimeoutError:
+        if not run_scope.expired():
+            raise
+        # Cancelled mid-run: answer from the steps completed so far instead of failing the request
+        DEADLINES.inc("partial")
+        _stopped_at_deadline(budget)
+        gaia_answer = best_effort_answer(run, deadline)
+        logger.warning(f"Session '{session_id}': Deadline of {deadline.seconds:g}s exceeded; returning a best-effort answer: {gaia_answer.answer[:50]}...")
+        return gaia_answer, None, "partial"
 
+    if run.reply is not None and run.error is None:
+        logger.info(f"Session '{session_id}': Final answer: '{run.reply}'")
+    elif run.error is None:
+        last = run.last_message.text if run.last_message is not None else None
+        logger.info(f"Session '{session_id}': Agent processing completed without a final message. Last message: '{last}'")
+
+    gaia_answer = run.answer()
+    
+    # Log the response
+    logger.info(f"Session '{session_id}': Returning GaiaAnswer: answer={gaia_answer.answer[:50]}..., reasoning={gaia_answer.reasoning[:50] if gaia_answer.reasoning else 'None'}, sources={len(gaia_answer.sources)} sources")
 
-        # Extract GaiaAnswer from the final state
-        gaia_answer = extract_gaia_answer_from_state(final_stream_state)
+    return gaia_answer, run.error, run.deadline_outcome
+
+
+@app.post("/invoke", response_model=GaiaAnswer)
+async def invoke_agent(
+    response: Response,
+    request: QueryRequest = Body(...),
+    cache_control: Optional[str] = Header(default=None),
+    x_cache_bypass: Optional[str] = Header(default=None),
+    x_priority: Optional[str] = Header(default=None),
+):
+    deadline = request_deadline(request.deadline_seconds) # Counted from arrival: queueing uses it up too
+    await _require_agent("/invoke")
+
+    session_id, resume = _resolve_session(request)
+    response.headers["X-Session-Id"] = session_id
+    logger.info(f"Received query for session '{session_id}': '{request.question}'")
+
+    # Serve repeated questions from the answer cache without running the graph. Turns of a
+    # session depend on the conversation so far, so they never read or write the cache
+    read_cache, write_cache = _cache_directives(cache_control, x_cache_bypass)
+    if answer_cache is not None and not resume:
+        if read_cache:
+            cached_answer, cache_tier = answer_cache.lookup(request.question)
+            if cached_answer is not None:
+                logger.info(f"Session '{session_id}': Answer cache hit ({cache_tier})")
+                response.headers["X-Cache"] = f"HIT-{cache_tier.upper()}"
+                return cached_answer
+            response.headers["X-Cache"] = "MISS"
+        else:
+            answer_cache.record_bypass()
+            response.headers["X-Cache"] = "BYPASS"
+
+    # Cache hits above are free; only actual agent runs take a scheduler slot
+    slot = await get_request_scheduler().acquire(_priority_class(x_priority, "interactive"))
+    budget = request_budget(request.budget)
+    try:
+        gaia_answer, error_message_content, deadline_outcome = await _run_agent(request.question, session_id, resume, deadline, budget)
+        if deadline_outcome is not None:
+            response.headers["X-Deadline-Exceeded"] = deadline_outcome
         
-        # Log the response
-        logger.info(f"Session '{session_id}': Returning GaiaAnswer: answer={gaia_answer.answer[:50]}..., reasoning={gaia_answer.reasoning[:50] if gaia_answer.reasoning else 'None'}, sources={len(gaia_answer.sources)} sources")
+        # Only successful answers are cached; LLM errors and answers rushed by the deadline should be retried next time
+        if answer_cache is not None and write_cache and not resume and error_message_content is None and deadline_outcome is None:
+            answer_cache.store(request.question, gaia_answer)
         
         return gaia_answer
 
     except Exception as e:
         logger.error(f"Error during agent invocation for session '{session_id}': {e}", exc_info=True)
+        ERRORS.inc("invocation")
+        _stopped_by_error(budget)
         # exc_info=True in logger automatically adds traceback
         error_message = f"Agent invocation failed: {str(e)}"
         logger.error(f"Session '{session_id}': {error_message}")
@@ -166,10 +395,363 @@ async def invoke_agent(request: QueryRequest = Body(...)):
             reasoning="An error occurred during processing.",
             sources=[]
         )
+    finally:
+        # Whatever the outcome: a failed or cut-off run still spent tokens and tool calls
+        response.headers["X-Agent-Budget"] = budget.header()
+        slot.release()
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that holds a scheduler slot until the response is over, however it ends."""
+
+    def __init__(self, content, slot: Slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _produce_agent_events(question: str, session_id: str, resume: bool, write_cache: bool, queue: asyncio.Queue,
+                                deadline: Optional[Deadline] = None, budget: Optional[AgentBudget] = None) -> None:
+    """Run the graph and push SSE-formatted events onto `queue`, ending with None.
+
+    LLM tokens come from LangGraph's "messages" stream mode (the model is streamed as
+    soon as a streaming consumer is attached); steps come from the "updates" events, which
+    hold only what each node added.
+    A run cut off by its deadline ends with a `deadline_exceeded` step and a best-effort answer.
+    The answer is preceded by a `budget` step with what the run spent; a failed run's `error`
+    event carries the same report as `budget`.
+    """
+    run = RunLog()
+    answer_stream = AnswerStreamParser()
+    lock = _session_lock(session_id) if resume else None
+    holds_lock = False
+    try:
+        with deadline_scope(deadline), budget_scope(budget):
+            async with asyncio.timeout(deadline.remaining() if deadline is not None else None) as run_scope:
+                if lock is not None:
+                    await lock.acquire()
+                    holds_lock = True
+                initial_state, config = await _new_agent_run(question, session_id, resume)
+                events = compiled_agent_graph.astream(initial_state, config=config, stream_mode=["messages", "updates"])
+                async with aclosing(events):
+                    async for mode, payload in events:
+                        if mode == "messages":
+                            chunk, metadata = payload
+                            # Only token chunks from the model; whole messages added to the state are reported as steps.
+                            # A structured final answer streams as the growing `answer` argument of its GaiaAnswer call
+                            if isinstance(chunk, AIMessageChunk) and metadata.get("langgraph_node") == "agent":
+                                text = chunk.text + answer_stream.feed(chunk)
+                                if text:
+                                    queue.put_nowait(_sse_event("token", {"content": text}))
+                            continue
+                        for update in payload.values():
+                            for step in run.apply(update):
+                                queue.put_nowait(_sse_event("step", run.detail(step).model_dump()))
+
+        gaia_answer = run.answer()
+        logger.info(f"Session '{session_id}': Streamed GaiaAnswer: answer={gaia_answer.answer[:50]}...")
+        failed = run.failed or run.deadline_outcome is not None
+        if answer_cache is not None and write_cache and not failed:
+            answer_cache.store(question, gaia_answer)
+        if budget is not None:
+            queue.put_nowait(_sse_event("step", StepDetail(type="budget", content=budget.usage()).model_dump()))
+        queue.put_nowait(_sse_event("answer", gaia_answer.model_dump()))
+    except Exception as e:
+        if isinstance(e, TimeoutError) and run_scope.expired():
+            DEADLINES.inc("partial")
+            _stopped_at_deadline(budget)
+            gaia_answer = best_effort_answer(run, deadline)
+            logger.warning(f"Session '{session_id}': Deadline of {deadline.seconds:g}s exceeded; streaming a best-effort answer.")
+            queue.put_nowait(_sse_event("step", StepDetail(type="deadline_exceeded", content=f"Cancelled at the {deadline.seconds:g}s request deadline").model_dump()))
+            if budget is not None:
+                queue.put_nowait(_sse_event("step", StepDetail(type="budget", content=budget.usage()).model_dump()))
+            queue.put_nowait(_sse_event("answer", gaia_answer.model_dump()))
+            return
+        logger.error(f"Error during streamed agent invocation for session '{session_id}': {e}", exc_info=True)
+        ERRORS.inc("invocation")
+        _stopped_by_error(budget)
+        error = {"detail": f"Agent invocation failed: {str(e)}"}
+        if budget is not None:
+            error["budget"] = budget.usage()
+        queue.put_nowait(_sse_event("error", error))
+    finally:
+        if holds_lock: # Not lock.locked(): a run cut off while waiting must not release another turn's lock
+            lock.release()
+        queue.put_nowait(None)
+
+async def _agent_event_stream(question: str, session_id: str, resume: bool, cached_answer: Optional[GaiaAnswer], write_cache: bool,
+                              deadline: Optional[Deadline] = None, budget: Optional[AgentBudget] = None):
+    """SSE body for /invoke/stream.
+
+    The graph runs in its own task so keep-alive comments can be sent while the model is
+    thinking. When the client disconnects, the server cancels this generator and the
+    `finally` cancels the run, which aborts any in-flight LLM request and tool call.
+    """
+    if cached_answer is not None:
+        yield _sse_event("answer", cached_answer.model_dump())
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    producer = asyncio.ensure_future(_produce_agent_events(question, session_id, resume, write_cache, queue, deadline, budget))
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.stream_keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield event
+    finally:
+        if not producer.done():
+            logger.info(f"Session '{session_id}': Client disconnected; cancelling agent run")
+            producer.cancel()
+
+@app.post("/invoke/stream")
+async def invoke_agent_stream(
+    request: QueryRequest = Body(...),
+    cache_control: Optional[str] = Header(default=None),
+    x_cache_bypass: Optional[str] = Header(default=None),
+    x_priority: Optional[str] = Header(default=None),
+):
+    """Stream the agent run as Server-Sent Events.
+
+    Events: `token` ({"content"}) for LLM output as it is generated, `step` (a StepDetail)
+    for tool calls, observations and the final answer step, then a `budget` step and one `answer`
+    (a GaiaAnswer), or one `error` ({"detail", "budget"}) event. A run cut off by its deadline
+    sends a `deadline_exceeded` step and a best-effort `answer`.
+    """
+    deadline = request_deadline(request.deadline_seconds)
+    await _require_agent("/invoke/stream")
+
+    session_id, resume = _resolve_session(request)
+    logger.info(f"Received streaming query for session '{session_id}': '{request.question}'")
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session_id} # Keep proxies from buffering the stream
+    cached_answer = None
+    read_cache, write_cache = _cache_directives(cache_control, x_cache_bypass)
+    write_cache = write_cache and not resume
+    if answer_cache is not None and not resume:
+        if read_cache:
+            cached_answer, cache_tier = answer_cache.lookup(request.question)
+            headers["X-Cache"] = f"HIT-{cache_tier.upper()}" if cached_answer is not None else "MISS"
+        else:
+            answer_cache.record_bypass()
+            headers["X-Cache"] = "BYPASS"
+
+    if cached_answer is not None:
+        return StreamingResponse(_agent_event_stream(request.question, session_id, resume, cached_answer, write_cache),
+                                 media_type="text/event-stream", headers=headers)
+    # Admit before responding so a saturated server can still answer 429/503 with Retry-After
+    slot = await get_request_scheduler().acquire(_priority_class(x_priority, "interactive"))
+    return SlotStreamingResponse(
+        _agent_event_stream(request.question, session_id, resume, cached_answer, write_cache, deadline, request_budget(request.budget)),
+        slot,
+        media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+async def _answer_batch_question(
+    question: str, session_id: str, semaphore: asyncio.Semaphore, priority: str, read_cache: bool, write_cache: bool,
+    deadline_seconds: Optional[float] = None, budget: Optional[AgentBudget] = None,
+) -> Tuple[Optional[GaiaAnswer], Optional[str], Optional[str], bool]:
+    """Answer one batch question as (answer, error, X-Cache value, deadline exceeded); never raises.
+
+    The question's deadline starts when it gets its turn to run, not when the batch arrives.
+    """
+    cache_status = None
+    if answer_cache is not None:
+        if read_cache:
+            cached_answer, cache_tier = answer_cache.lookup(question)
+            if cached_answer is not None:
+                return cached_answer, None, f"HIT-{cache_tier.upper()}", False
+            cache_status = "MISS"
+        else:
+            answer_cache.record_bypass()
+            cache_status = "BYPASS"
+
+    try:
+        async with semaphore, get_request_scheduler().slot(priority):
+            gaia_answer, error_message_content, deadline_outcome = await _run_agent(
+                question, session_id, deadline=request_deadline(deadline_seconds), budget=budget)
+    except AdmissionRejected as e:
+        ERRORS.inc(f"admission_{e.status_code}")
+        return None, f"Rejected by admission control ({e.status_code}): {e.detail}", cache_status, False
+    except Exception as e:
+        logger.error(f"Error during batch item '{session_id}': {e}", exc_info=True)
+        ERRORS.inc("invocation")
+        _stopped_by_error(budget)
+        return None, f"Agent invocation failed: {str(e)}", cache_status, False
+    if error_message_content is not None:
+        return None, error_message_content, cache_status, False
+    if answer_cache is not None and write_cache and deadline_outcome is None:
+        answer_cache.store(question, gaia_answer)
+    return gaia_answer, None, cache_status, deadline_outcome is not None
+
+async def _batch_results(questions: List[QueryRequest], max_concurrency: int, priority: str, read_cache: bool, write_cache: bool):
+    """Yield a BatchItemResult for every question, in completion order.
+
+    Questions that normalize to the same text run once; the copies are reported with
+    `duplicate_of` pointing at the first occurrence. Closing the generator early (e.g. a
+    disconnected streaming client) cancels the runs still in progress.
+    """
+    batch_id = str(uuid4())
+    groups: Dict[str, List[int]] = {}
+    for index, item in enumerate(questions):
+        groups.setdefault(normalize_question(item.question), []).append(index)
+    logger.info(f"Batch '{batch_id}': {len(questions)} questions, {len(groups)} unique, concurrency {max_concurrency}")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def answer_group(indices: List[int]) -> List[BatchItemResult]:
+        first = indices[0]
+        budget = request_budget(questions[first].budget)
+        answer, error, cache_status, deadline_exceeded = await _answer_batch_question(
+            questions[first].question, f"{batch_id}-{first}", semaphore, priority, read_cache, write_cache,
+            questions[first].deadline_seconds, budget,
+        )
+        usage = budget.usage() if budget.stop_reason is not None else None # None when no run was needed (cache hit, rejection)
+        return [
+            BatchItemResult(index=i, question=questions[i].question, answer=answer, error=error, cache=cache_status,
+                            duplicate_of=None if i == first else first, deadline_exceeded=deadline_exceeded,
+                            budget=usage)
+            for i in indices
+        ]
+
+    tasks = [asyncio.ensure_future(answer_group(indices)) for indices in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for item in await next_done:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _batch_event_stream(results):
+    errors = 0
+    async for item in results:
+        errors += item.error is not None
+        yield _sse_event("result", item.model_dump())
+    yield _sse_event("done", {"errors": errors})
+
+@app.post("/invoke/batch", response_model=BatchResponse)
+async def invoke_agent_batch(
+    request: BatchQueryRequest = Body(...),
+    cache_control: Optional[str] = Header(default=None),
+    x_cache_bypass: Optional[str] = Header(default=None),
+    x_priority: Optional[str] = Header(default=None),
+):
+    """Answer a list of questions with bounded concurrency.
+
+    Returns all results in request order, or with `"stream": true` sends one SSE `result`
+    event (a BatchItemResult) per question as it completes, then a `done` event. A failing
+    question is reported in its item's `error` and does not fail the batch.
+    """
+    await _require_agent("/invoke/batch")
+    if len(request.questions) > settings.batch_max_size:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(request.questions)} questions (max {settings.batch_max_size}).")
+    if any(item.session_id is not None for item in request.questions):
+        raise HTTPException(status_code=400, detail="Batch questions are answered independently; session_id is only supported on /invoke and /invoke/stream.")
+
+    questions = request.questions
+    max_concurrency = min(request.max_concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency)
+    read_cache, write_cache = _cache_directives(cache_control, x_cache_bypass)
+    priority = _priority_class(x_priority, "batch")
+    results = _batch_results(questions, max_concurrency, priority, read_cache, write_cache)
+
+    if request.stream:
+        return StreamingResponse(_batch_event_stream(results), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    ordered = sorted([item async for item in results], key=lambda item: item.index)
+    return BatchResponse(
+        results=ordered,
+        unique_questions=sum(item.duplicate_of is None for item in ordered),
+        errors=sum(item.error is not None for item in ordered),
+    )
 
 
 @app.get("/health")
 async def health_check():
-    agent_status = "initialized" if compiled_agent_graph is not None else "not_initialized"
+    if compiled_agent_graph is not None:
+        agent_status = "initialized"
+    else:
+        agent_status = "warming" if agent_warmup is not None and not agent_warmup.done() else "not_initialized"
     logger.info(f"Health check: App status: healthy, Agent status: {agent_status}")
-    return {"status": "healthy", "agent_status": agent_status, "model_configured": os.getenv("OPENROUTER_MODEL_NAME", "DEFAULT_NOT_SET")}
\ No newline at end of file
+    checkpoints = checkpointer_stats(compiled_agent_graph.checkpointer) if compiled_agent_graph is not None else None
+    cache = answer_cache.stats() if answer_cache is not None else None
+    llm_cache = get_llm_cache()
+    knowledge_index = get_knowledge_index()
+    return {"status": "healthy", "agent_status": agent_status, "model_configured": os.getenv("OPENROUTER_MODEL_NAME", "DEFAULT_NOT_SET"), "checkpointer": checkpoints, "answer_cache": cache, "llm_cache": llm_cache.stats() if llm_cache is not None else None, "llm_router": get_router_stats(), "search": get_search_client().stats(), "knowledge": knowledge_index.stats() if knowledge_index is not None else None, "sandbox": get_sandbox_pool().stats(), "scheduler": get_request_scheduler().stats()}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the agent is compiled and warm, 503 while warming up or after a failed warm-up.
+
+    `/health` is the liveness check and answers as soon as the process serves requests.
+    """
+    if compiled_agent_graph is not None:
+        return {"status": "ready", "startup": startup_timings}
+    status = "warming" if agent_warmup is not None and not agent_warmup.done() else "failed"
+    return JSONResponse(status_code=503, content={"status": status})
+
+def _checkpointer_entries() -> Dict[Tuple[str, ...], float]:
+    stats = checkpointer_stats(compiled_agent_graph.checkpointer) if compiled_agent_graph is not None else {}
+    return {(stats["backend"], kind): stats[kind] for kind in ("threads", "checkpoints") if kind in stats}
+
+def _checkpointer_bytes() -> Dict[Tuple[str, ...], float]:
+    stats = checkpointer_stats(compiled_agent_graph.checkpointer) if compiled_agent_graph is not None else {}
+    return {(stats["backend"],): stats["bytes"]} if "bytes" in stats else {}
+
+# Sizes /health reports, read when /metrics is scraped
+CHECKPOINTER_ENTRIES.set_function(_checkpointer_entries)
+CHECKPOINTER_BYTES.set_function(_checkpointer_bytes)
+SCHEDULER_IN_FLIGHT.set_function(lambda: {(): get_request_scheduler().stats()["in_flight"]})
+SCHEDULER_QUEUE_DEPTH.set_function(lambda: {(priority,): depth for priority, depth in get_request_scheduler().stats()["queued"].items()})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, graph node, LLM, tool and error metrics, and of
+    checkpointer and scheduler sizes."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Stores that must agree across worker processes, and their shared (SQLite) setting
+SHARED_STATE_SETTINGS = {"checkpointer": "sqlite", "answer_cache_backend": "sqlite", "search_cache_backend": "sqlite", "llm_cache_backend": "sqlite"}
+
+def run() -> None:
+    """Serve the API with uvicorn (`python -m app.main [--workers N]`).
+
+    Workers are separate processes, so with more than one, checkpoints and the answer and
+    search caches default to the shared SQLite stores, and each worker compiles its own agent
+    before it starts accepting connections.
+    """
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the GAIA Pathfinder Agent API")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=settings.workers, help="Worker processes (default: WORKERS)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        for field, shared in SHARED_STATE_SETTINGS.items():
+            if field not in settings.model_fields_set:
+                os.environ[field.upper()] = shared  # Inherited by the worker processes
+            elif getattr(settings, field) != shared:
+                logger.warning(f"{field.upper()}={getattr(settings, field)} is per process; {args.workers} workers will not share it.")
+        if "startup_background_warmup" not in settings.model_fields_set:
+            os.environ["STARTUP_BACKGROUND_WARMUP"] = "false"
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    run()
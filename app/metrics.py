@@ -0,0 +1,301 @@
+# app/metrics.py
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default buckets, extended for multi-second LLM and agent runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 6, 7, 8, 10, 15, 20)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic counter per label set."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not REGISTRY.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}_total{_format_labels(self.labelnames, labels)} {value:g}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set, rendered in the Prometheus text format."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not REGISTRY.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._values.get(labels)
+        return series[2] if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((labels, ([*s[0]], s[1], s[2])) for labels, s in self._values.items())
+        for labels, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                le_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:g}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}"
+
+
+class Gauge(_Metric):
+    """Current value per label set, read at scrape time from `collect` (label values -> value).
+
+    For sizes that their owners already track (checkpoints, queue depth): nothing is updated
+    on the request path, and /metrics always shows the value as of the scrape.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def set_function(self, collect: Callable[[], Dict[LabelValues, float]]) -> None:
+        self._collect = collect
+
+    def _samples(self):
+        if self._collect is None or not REGISTRY.enabled:
+            return
+        try:
+            values = self._collect()
+        except Exception as e:  # A failing source must not break the whole scrape
+            logger.warning(f"Could not collect gauge {self.name}: {e!r}")
+            return
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+
+
+class Registry:
+    """Process-wide collection of metrics; `enabled=False` turns every update into a no-op."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry(enabled=settings.metrics_enabled)
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "gaia_http_request_duration_seconds", "HTTP request latency, until the response body is complete.", ("route", "method", "status")))
+NODE_DURATION = REGISTRY.register(Histogram(
+    "gaia_graph_node_duration_seconds", "Time spent in each LangGraph node.", ("node",)))
+LLM_CALL_DURATION = REGISTRY.register(Histogram(
+    "gaia_llm_call_duration_seconds", "LLM call latency, request to last token.", ("model",)))
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.register(Histogram(
+    "gaia_llm_time_to_first_token_seconds", "Time to the first token of an LLM call; a non-streamed call's first token arrives with the whole response.", ("model",)))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "gaia_llm_tokens", "Tokens sent to (input) and generated by (output) the LLM; cached_input is the part of input served from the provider's prompt cache.", ("model", "direction")))
+ANSWER_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "gaia_answer_cache_lookups", "Answer cache lookups by result (exact, similar, miss, or bypassed at the client's request).", ("result",)))
+LLM_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "gaia_llm_cache_lookups", "Model-call cache lookups by result (memory, disk or miss).", ("model", "result")))
+LLM_CACHE_SAVED_TOKENS = REGISTRY.register(Counter(
+    "gaia_llm_cache_saved_tokens", "Tokens not sent to or generated by the LLM thanks to model-call cache hits.", ("model", "direction")))
+LLM_BACKEND_CALLS = REGISTRY.register(Counter(
+    "gaia_llm_backend_calls", "Calls to each routed LLM backend by outcome (ok, error, cancelled by a faster hedge).", ("backend", "outcome")))
+LLM_BACKEND_LATENCY = REGISTRY.register(Histogram(
+    "gaia_llm_backend_latency_seconds", "Time until a routed LLM backend starts answering (full response, or first chunk of a stream).", ("backend",)))
+TOOL_CALLS = REGISTRY.register(Counter(
+    "gaia_tool_calls", "Tool calls by tool and outcome.", ("tool", "status")))
+TOOL_DURATION = REGISTRY.register(Histogram(
+    "gaia_tool_duration_seconds", "Tool execution latency, including the wait for its concurrency limit.", ("tool",)))
+AGENT_ITERATIONS = REGISTRY.register(Histogram(
+    "gaia_agent_iterations", "Agent (LLM) iterations needed per question.", (), buckets=ITERATION_BUCKETS))
+AGENT_TOKENS = REGISTRY.register(Histogram(
+    "gaia_agent_tokens", "LLM tokens (prompt and completion) spent per question.", (), buckets=TOKEN_BUCKETS))
+AGENT_STOPS = REGISTRY.register(Counter(
+    "gaia_agent_stops", "Why agent runs stopped: answer, converged, iterations, tokens, tool_calls, deadline or error.", ("reason",)))
+ANSWERS = REGISTRY.register(Counter(
+    "gaia_answers", "Final answers by how they were obtained: tool (GaiaAnswer call), json, text, repaired or raw.", ("format",)))
+DEADLINES = REGISTRY.register(Counter(
+    "gaia_deadlines", "Requests that ran into their deadline: forced_answer (answered from the reserve) or partial (cut off).", ("outcome",)))
+KNOWLEDGE_SEARCHES = REGISTRY.register(Counter(
+    "gaia_knowledge_searches", "Knowledge searches by outcome: local (hit above the score threshold), web (fallback) or miss.", ("outcome",)))
+OBSERVATION_TOKENS = REGISTRY.register(Counter(
+    "gaia_observation_tokens", "Approximate tokens of tool observations before (raw) and after (compressed) compression.", ("tool", "stage")))
+CHECKPOINTER_ENTRIES = REGISTRY.register(Gauge(
+    "gaia_checkpointer_entries", "Threads (conversations) and checkpoints held by the checkpointer.", ("backend", "kind")))
+CHECKPOINTER_BYTES = REGISTRY.register(Gauge(
+    "gaia_checkpointer_bytes", "Serialized size of the checkpoints held by the checkpointer.", ("backend",)))
+SCHEDULER_IN_FLIGHT = REGISTRY.register(Gauge(
+    "gaia_scheduler_in_flight", "Agent runs executing now (out of SCHEDULER_MAX_IN_FLIGHT).", ()))
+SCHEDULER_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "gaia_scheduler_queue_depth", "Requests waiting for an agent slot, by priority class.", ("priority",)))
+ERRORS = REGISTRY.register(Counter(
+    "gaia_errors", "Errors by type.", ("type",)))
+
+
+def instrument_node(name: str, node):
+    """Wrap an async graph node so its duration is recorded under `node=name`."""
+    async def timed(state):
+        start = time.perf_counter()
+        try:
+            return await node(state)
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - start, name)
+    timed.__name__ = getattr(node, "__name__", name)
+    timed.__doc__ = node.__doc__
+    return timed
+
+
+class LLMMetricsCallbackHandler(BaseCallbackHandler):
+    """Records LLM call latency, time to first token and token usage for one model.
+
+    A sync handler marked `run_inline`, so LangChain calls it directly on the event loop
+    instead of dispatching each callback to a thread pool.
+    """
+
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._runs: Dict[UUID, List[Optional[float]]] = {}  # run_id -> [start, first_token_at]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs[run_id] = [time.perf_counter(), None]
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs[run_id] = [time.perf_counter(), None]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and run[1] is None:
+            run[1] = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN.observe(run[1] - run[0], self.model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            elapsed = time.perf_counter() - run[0]
+            LLM_CALL_DURATION.observe(elapsed, self.model)
+            if run[1] is None:  # Not streamed (no on_llm_new_token): the first token came with the response
+                LLM_TIME_TO_FIRST_TOKEN.observe(elapsed, self.model)
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage is None:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            usage = {"input_tokens": usage.get("prompt_tokens", 0), "output_tokens": usage.get("completion_tokens", 0)}
+        LLM_TOKENS.inc(self.model, "input", amount=usage.get("input_tokens", 0) or 0)
+        LLM_TOKENS.inc(self.model, "output", amount=usage.get("output_tokens", 0) or 0)
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        if cached:
+            LLM_TOKENS.inc(self.model, "cached_input", amount=cached)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+        ERRORS.inc("llm")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency by route template (not raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_DURATION.observe(time.perf_counter() - start, getattr(route, "path", "unmatched"), scope["method"], str(status[0]))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,249 @@
+# app/observations.py
+import json
+import logging
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from .config import settings
+from .metrics import OBSERVATION_TOKENS
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Too common to say anything about relevance
+STOPWORDS = frozenset(
+    "a an and are as at be by can did do does for from had has have how i if in into is it its of on or so than "
+    "that the their them then there these they this to was were what when where which who why will with would you".split()
+)
+CHUNK_SEPARATOR = " … "
+NO_NEW_RESULTS = "No new information: these results repeat earlier observations."
+
+
+def approximate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), as used for prompt budgets elsewhere."""
+    return math.ceil(len(text) / 4)
+
+
+def words(text: str) -> List[str]:
+    return _TERM.findall(text.lower())
+
+
+def terms(text: str) -> List[str]:
+    return [t for t in words(text) if t not in STOPWORDS]
+
+
+def shingles(tokens: List[str], n: int = 3) -> Set[int]:
+    """Hashed word n-grams, for spotting near-identical passages whatever their chunk boundaries."""
+    if len(tokens) < n:
+        return {hash(tuple(tokens))} if tokens else set()
+    return set(map(hash, zip(*(tokens[i:] for i in range(n)))))
+
+
+def bm25_scores(query: Iterable[str], documents: List[Counter], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of each document (term counts) for the query, with IDF from `documents` themselves.
+
+    Term frequencies of the (few) query terms are gathered into a documents x terms
+    matrix once; the saturation, IDF weighting and sum are then whole-array operations.
+    """
+    n = len(documents)
+    query = list(set(query))
+    if not n or not query:
+        return [0.0] * n
+    tf = np.array([[doc.get(term, 0) for term in query] for doc in documents], dtype=float)
+    lengths = np.fromiter((sum(doc.values()) for doc in documents), dtype=float, count=n)
+    norms = k1 * (1 - b + b * lengths / (lengths.mean() or 1.0))
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    saturated = np.divide(tf * (k1 + 1), tf + norms[:, None], out=np.zeros_like(tf), where=tf > 0)
+    return (saturated @ idf).tolist()
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """Split text into passages of whole sentences of up to about `max_tokens` tokens (long sentences are cut)."""
+    max_chars = max_tokens * 4
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of a long text (the end of program output usually holds the result)."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return f"{text[:head]}\n… [{len(text) - head - tail} characters omitted] …\n{text[-tail:]}"
+
+
+def _results(content: str) -> Optional[List[Dict[str, Any]]]:
+    """The result list of a search-style observation (JSON list of objects with `content`), else None."""
+    if not content.startswith("["):
+        return None
+    try:
+        results = json.loads(content)
+    except ValueError:
+        return None
+    if isinstance(results, list) and all(isinstance(r, dict) and isinstance(r.get("content"), str) for r in results):
+        return results
+    return None
+
+
+class _Chunk:
+    __slots__ = ("observation", "result", "text", "tokens", "terms", "shingles", "score", "selected")
+
+    def __init__(self, observation: int, result: int, text: str):
+        self.observation = observation
+        self.result = result
+        self.text = text
+        self.tokens = approximate_tokens(text)
+        tokens = words(text)
+        self.terms = Counter(t for t in tokens if t not in STOPWORDS)
+        self.shingles = shingles(tokens)
+        self.score = 0.0
+        self.selected = False
+
+
+class ObservationCompressor:
+    """Local rerank-and-compress stage between the tools node and the next model call.
+
+    Search-style observations (JSON lists of `{"url", "content"}`) are split into sentence
+    passages of about `chunk_tokens`. Passages that mostly repeat something the model has
+    already seen in this run (earlier observations, or better-ranked passages of this round)
+    are dropped. The rest are ranked with BM25 against the question and the tool call's own
+    arguments (e.g. the search query), and the best are kept until the round's observations
+    fit `max_tokens`: each observation keeps its best new passage, then passages are added by
+    score. Kept passages are returned in their original order and result structure. Other
+    observations (code output, errors) are only trimmed to the budget. Pure Python, no model.
+
+    Repeats are looked for in the last `window` observations, whose shingles are cached, so
+    a round costs the same however long the run has been going.
+    """
+
+    CACHE_SIZE = 4096  # Observations whose shingles are kept
+
+    def __init__(self, max_tokens: int = 1000, chunk_tokens: int = 80, duplicate_threshold: float = 0.8, window: int = 64):
+        self.max_tokens = max_tokens
+        self.chunk_tokens = chunk_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.window = window
+        self._shingles: "OrderedDict[Tuple[str, str], Set[int]]" = OrderedDict()
+
+    def recent_observations(self, messages: Sequence[BaseMessage]) -> List[ToolMessage]:
+        """The last `window` observations among `messages`, newest first."""
+        recent: List[ToolMessage] = []
+        for message in reversed(messages):
+            if isinstance(message, ToolMessage):
+                recent.append(message)
+                if len(recent) == self.window:
+                    break
+        return recent
+
+    def seen_shingles(self, earlier: Iterable[ToolMessage]) -> Set[int]:
+        seen: Set[int] = set()
+        for message in earlier:
+            text = message.text
+            # Keyed by the text object too: its hash is cached, and tool call ids can repeat across runs
+            grams = self._shingles.get((message.tool_call_id, text))
+            if grams is None:
+                grams = self._shingles[(message.tool_call_id, text)] = shingles(words(text))
+                if len(self._shingles) > self.CACHE_SIZE:
+                    self._shingles.popitem(last=False)
+            seen |= grams
+        return seen
+
+    def _is_duplicate(self, chunk: _Chunk, seen: Set[int]) -> bool:
+        grams = chunk.shingles
+        return bool(grams) and len(grams & seen) / len(grams) >= self.duplicate_threshold
+
+    def compress(self, question: str, calls: List[Dict[str, Any]], observations: List[ToolMessage],
+                 earlier: Iterable[ToolMessage] = ()) -> List[ToolMessage]:
+        """Compressed copies of one round's `observations`, produced by `calls` (in the same order);
+        `earlier` are the observations the model has already seen in this run."""
+        parsed = [_results(o.text) for o in observations]
+        chunks: List[_Chunk] = []
+        for i, results in enumerate(parsed):
+            for j, result in enumerate(results or []):
+                chunks.extend(_Chunk(i, j, text) for text in chunk_text(result["content"], self.chunk_tokens))
+        ranked = {chunk.observation for chunk in chunks}
+
+        # Plain-text observations (and result lists without text) are only trimmed to their share
+        contents: List[str] = []
+        budget = self.max_tokens
+        for i, observation in enumerate(observations):
+            content = observation.text
+            if i not in ranked:
+                content = trim_text(content, max(1, self.max_tokens // len(observations)))
+                budget -= approximate_tokens(content)
+            contents.append(content)
+
+        if chunks:
+            # Scored over all passages of the round (shared IDF), each against its own call's query
+            documents = [chunk.terms for chunk in chunks]
+            for i in ranked:
+                args = json.dumps(calls[i].get("args", {})) if i < len(calls) else ""
+                for chunk, score in zip(chunks, bm25_scores(terms(f"{question} {args}"), documents)):
+                    if chunk.observation == i:
+                        chunk.score = score
+
+            # Best first, so of two near-identical passages the better-ranked one survives
+            seen = self.seen_shingles(earlier)
+            fresh: List[_Chunk] = []
+            for chunk in sorted(chunks, key=lambda c: -c.score):
+                if not self._is_duplicate(chunk, seen):
+                    fresh.append(chunk)
+                    seen |= chunk.shingles
+
+            for i in ranked:  # Every observation keeps its best new passage
+                best = next((chunk for chunk in fresh if chunk.observation == i), None)
+                if best is not None:
+                    best.selected = True
+                    budget -= best.tokens
+            for chunk in fresh:
+                if not chunk.selected and chunk.score > 0 and chunk.tokens <= budget:
+                    chunk.selected = True
+                    budget -= chunk.tokens
+
+            for i in ranked:
+                passages: Dict[int, List[str]] = {}
+                for chunk in chunks:  # Original order
+                    if chunk.observation == i and chunk.selected:
+                        passages.setdefault(chunk.result, []).append(chunk.text)
+                results = [{**parsed[i][j], "content": CHUNK_SEPARATOR.join(texts)} for j, texts in sorted(passages.items())]
+                contents[i] = json.dumps(results) if results else NO_NEW_RESULTS
+
+        messages = []
+        for observation, content in zip(observations, contents):
+            tool = observation.name or "unknown"
+            OBSERVATION_TOKENS.inc(tool, "raw", amount=approximate_tokens(observation.text))
+            OBSERVATION_TOKENS.inc(tool, "compressed", amount=approximate_tokens(content))
+            messages.append(observation.model_copy(update={"content": content}))
+        return messages
+
+
+def create_observation_compressor() -> Optional[ObservationCompressor]:
+    """The compressor configured by OBSERVATION_*; None when OBSERVATION_COMPRESSION is off."""
+    if not settings.observation_compression:
+        return None
+    return ObservationCompressor(settings.observation_max_tokens, settings.observation_chunk_tokens,
+                                 settings.observation_duplicate_threshold)
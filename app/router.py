@@ -0,0 +1,313 @@
+# app/router.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .config import settings
+from .metrics import LLM_BACKEND_CALLS, LLM_BACKEND_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Backends are called without the router's callbacks: the router reports the call once
+# (metrics, streamed tokens), so a backend must not report it again
+BACKEND_CONFIG = {"callbacks": []}
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class BackendStats:
+    """Rolling latency and outcome window for one backend, plus a consecutive-failure breaker.
+
+    Latency is the time until the backend starts answering: the whole response for
+    `ainvoke`, the first chunk for streams.
+    """
+
+    def __init__(self, name: str, cost: float = 0.0, window: int = 100):
+        self.name = name
+        self.cost = cost
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)  # True for success
+        self.counters = {"calls": 0, "errors": 0, "hedges": 0, "hedges_won": 0, "cancelled": 0}
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def p50(self) -> Optional[float]:
+        return _percentile(self.latencies, 50)
+
+    def p95(self) -> Optional[float]:
+        return _percentile(self.latencies, 95)
+
+    def cooling(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        LLM_BACKEND_LATENCY.observe(latency, self.name)
+
+    def record_error(self, error: BaseException, failure_threshold: int, cooldown_seconds: float) -> None:
+        self.counters["errors"] += 1
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:200]
+        if self.consecutive_failures >= failure_threshold:
+            self.cooldown_until = time.monotonic() + cooldown_seconds
+            logger.warning(f"LLM backend '{self.name}' failed {self.consecutive_failures} times in a row; cooling down for {cooldown_seconds}s")
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.p50(), self.p95()
+        return {
+            **self.counters,
+            "samples": len(self.latencies),
+            "p50_seconds": round(p50, 4) if p50 is not None else None,
+            "p95_seconds": round(p95, 4) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "cost": self.cost,
+            "cooling_down": self.cooling(time.monotonic()),
+            "last_error": self.last_error,
+        }
+
+
+class BackendRouter:
+    """Ranks backends and runs one call across them with failover and optional hedging.
+
+    Backends are ordered by `p50 * (1 + error_penalty * error_rate) + cost_weight * cost`;
+    a backend without latency samples scores its cost alone, so each one is tried early
+    on. Backends cooling down after `failure_threshold` consecutive failures go last.
+    With `hedge`, a call still unanswered after the primary's p95 latency (at least
+    `hedge_min_delay`; `hedge_delay` until there are `min_samples`) is duplicated on the
+    next backend and the first answer wins; the other call is cancelled.
+    """
+
+    def __init__(
+        self,
+        costs: Dict[str, float],
+        hedge: bool = False,
+        hedge_delay: float = 2.0,
+        hedge_min_delay: float = 0.05,
+        min_samples: int = 5,
+        error_penalty: float = 4.0,
+        cost_weight: float = 0.1,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        window: int = 100,
+    ):
+        self.backends = {name: BackendStats(name, cost, window) for name, cost in costs.items()}
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+        self.error_penalty = error_penalty
+        self.cost_weight = cost_weight
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+    def _score(self, backend: BackendStats) -> float:
+        return (backend.p50() or 0.0) * (1 + self.error_penalty * backend.error_rate) + self.cost_weight * backend.cost
+
+    def ranked(self) -> List[str]:
+        """Backend names, best first (stable for ties, so configuration order breaks them)."""
+        now = time.monotonic()
+        return [b.name for b in sorted(self.backends.values(), key=lambda b: (b.cooling(now), self._score(b)))]
+
+    def hedge_after(self, name: str) -> float:
+        backend = self.backends[name]
+        if len(backend.latencies) < self.min_samples:
+            return self.hedge_delay
+        return max(self.hedge_min_delay, backend.p95())
+
+    async def run(self, call: Callable[[str], Awaitable[Any]]) -> Tuple[str, Any]:
+        """Run `call(name)` on the best backend; return (winning backend, result).
+
+        A failed call moves on to the next backend at once; a slow one is hedged. Raises
+        the last error if every backend fails.
+        """
+        order = self.ranked()
+        pending: Dict[asyncio.Task, Tuple[str, float, bool]] = {}  # task -> (backend, started, is_hedge)
+        next_index, last_error = 0, None
+
+        def launch(is_hedge: bool) -> None:
+            nonlocal next_index
+            name = order[next_index]
+            next_index += 1
+            self.backends[name].counters["calls"] += 1
+            if is_hedge:
+                self.backends[name].counters["hedges"] += 1
+            pending[asyncio.ensure_future(call(name))] = (name, time.perf_counter(), is_hedge)
+
+        launch(False)
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and next_index < len(order) and len(pending) == 1:
+                    name, started, _ = next(iter(pending.values()))
+                    timeout = max(0.0, self.hedge_after(name) - (time.perf_counter() - started))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"LLM backend '{name}' slower than its hedge delay; hedging on '{order[next_index]}'")
+                    launch(True)
+                    continue
+                for task in done:
+                    name, started, is_hedge = pending.pop(task)
+                    backend = self.backends[name]
+                    error = task.exception()
+                    if error is None:
+                        backend.record_success(time.perf_counter() - started)
+                        LLM_BACKEND_CALLS.inc(name, "ok")
+                        if is_hedge:
+                            backend.counters["hedges_won"] += 1
+                        return name, task.result()
+                    backend.record_error(error, self.failure_threshold, self.cooldown_seconds)
+                    LLM_BACKEND_CALLS.inc(name, "error")
+                    logger.warning(f"LLM backend '{name}' failed: {error!r}")
+                    last_error = error
+                if not pending and next_index < len(order):
+                    launch(False)  # Fail over
+            raise last_error
+        finally:
+            for task, (name, started, _) in pending.items():
+                task.cancel()
+                # A lower bound, but it keeps a backend that keeps losing hedges from looking fast
+                self.backends[name].latencies.append(time.perf_counter() - started)
+                self.backends[name].counters["cancelled"] += 1
+                LLM_BACKEND_CALLS.inc(name, "cancelled")
+            # Wait for the losers to unwind, so callers can clean up after them (e.g. close their streams)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hedge": self.hedge, "order": self.ranked(), "backends": {name: b.stats() for name, b in self.backends.items()}}
+
+
+class RouterChatModel(BaseChatModel):
+    """Chat model spreading calls over several backends (`LLM_PROVIDER=router`).
+
+    Each call goes through `router` (see BackendRouter). Streams are routed on their first
+    chunk: once a backend has started answering, the rest of its stream is passed through.
+    """
+
+    model_name: str = "router"
+    backends: Dict[str, Any]  # name -> chat model (tool-bound after bind_tools)
+    router: BackendRouter
+    temperature: Optional[float] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "backends": list(self.backends), "temperature": self.temperature}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "RouterChatModel":
+        return self.model_copy(update={"backends": {name: llm.bind_tools(tools, **kwargs) for name, llm in self.backends.items()}})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # Blocking callers get failover in ranked order, without hedging
+        last_error = None
+        for name in self.router.ranked():
+            backend = self.router.backends[name]
+            backend.counters["calls"] += 1
+            start = time.perf_counter()
+            try:
+                message = self.backends[name].invoke(messages, config=BACKEND_CONFIG, stop=stop, **kwargs)
+            except Exception as e:
+                backend.record_error(e, self.router.failure_threshold, self.router.cooldown_seconds)
+                LLM_BACKEND_CALLS.inc(name, "error")
+                last_error = e
+                continue
+            backend.record_success(time.perf_counter() - start)
+            LLM_BACKEND_CALLS.inc(name, "ok")
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise last_error
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        _, message = await self.router.run(
+            lambda name: self.backends[name].ainvoke(messages, config=BACKEND_CONFIG, stop=stop, **kwargs)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        result = self._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        message = result.generations[0].message
+        if run_manager and message.text:
+            run_manager.on_llm_new_token(message.text)
+        yield ChatGenerationChunk(message=AIMessageChunk(content=message.content, tool_calls=message.tool_calls,
+                                                         usage_metadata=message.usage_metadata))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        streams: Dict[str, AsyncIterator] = {}
+
+        async def first_chunk(name: str):
+            stream = streams[name] = self.backends[name].astream(messages, config=BACKEND_CONFIG, stop=stop, **kwargs)
+            return await stream.__anext__()
+
+        try:
+            winner, chunk = await self.router.run(first_chunk)
+            while True:
+                if run_manager and (chunk.content or chunk.tool_call_chunks):
+                    await run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+                try:
+                    chunk = await streams[winner].__anext__()
+                except StopAsyncIteration:
+                    break
+        finally:
+            for stream in streams.values():
+                await stream.aclose()
+
+
+_router: Optional[BackendRouter] = None
+
+
+def parse_backend_spec(spec: str) -> Tuple[str, Optional[str]]:
+    """'openrouter:anthropic/claude-3-haiku' -> ('openrouter', 'anthropic/claude-3-haiku'); the model may contain ':'."""
+    provider, _, model = spec.strip().partition(":")
+    return provider.lower(), model or None
+
+
+def create_router_llm(create_backend: Callable[[str, Optional[str]], BaseChatModel]) -> RouterChatModel:
+    """Build the router over `settings.router_backends`, creating each backend with `create_backend(provider, model)`."""
+    global _router
+    if len(settings.router_backends) < 1:
+        logger.critical("LLM_PROVIDER is 'router' but ROUTER_BACKENDS is empty.")
+        raise ValueError("ROUTER_BACKENDS must list at least one 'provider:model' backend for the router provider.")
+    if any(parse_backend_spec(spec)[0] == "router" for spec in settings.router_backends):
+        logger.critical("ROUTER_BACKENDS cannot contain the router itself.")
+        raise ValueError("Unsupported router backend: router")
+    backends = {spec: create_backend(*parse_backend_spec(spec)) for spec in settings.router_backends}
+    _router = BackendRouter(
+        {spec: settings.router_backend_costs.get(spec, 0.0) for spec in backends},
+        hedge=settings.router_hedge,
+        hedge_delay=settings.router_hedge_delay_seconds,
+        hedge_min_delay=settings.router_hedge_min_delay_seconds,
+        min_samples=settings.router_min_samples,
+        error_penalty=settings.router_error_penalty,
+        cost_weight=settings.router_cost_weight,
+        failure_threshold=settings.router_failure_threshold,
+        cooldown_seconds=settings.router_cooldown_seconds,
+    )
+    return RouterChatModel(backends=backends, router=_router, temperature=settings.llm_temperature)
+
+
+def get_router_stats() -> Optional[Dict[str, Any]]:
+    """Per-backend health and latency of the active router (None unless LLM_PROVIDER=router)."""
+    return _router.stats() if _router is not None else None
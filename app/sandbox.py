@@ -0,0 +1,449 @@
+# app/sandbox.py
+import ast
+import asyncio
+import builtins
+import contextlib
+import importlib
+import io
+import logging
+import math
+import multiprocessing
+import os
+import re
+import signal
+import string
+import tempfile
+import time
+import types
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource  # Unix only; limits are skipped where unavailable
+except ImportError:  # pragma: no cover
+    resource = None
+
+# Settings are imported where they're used, not here: workers import this module, and
+# loading Settings would read the API keys from .env into their memory.
+
+logger = logging.getLogger(__name__)
+
+# Modules snippets may import; everything else is refused inside the sandbox
+ALLOWED_MODULES = frozenset({
+    "math", "cmath", "statistics", "decimal", "fractions", "random", "itertools", "functools",
+    "operator", "collections", "heapq", "bisect", "datetime", "re", "json", "string",
+})
+
+_SAFE_BUILTIN_NAMES = (
+    "abs", "all", "any", "ascii", "bin", "bool", "bytes", "callable", "chr", "complex", "dict",
+    "divmod", "enumerate", "filter", "float", "format", "frozenset", "hash", "hex", "int",
+    "isinstance", "issubclass", "iter", "len", "list", "map", "max", "min", "next", "oct", "ord",
+    "pow", "print", "range", "repr", "reversed", "round", "set", "slice", "sorted", "str", "sum",
+    "tuple", "zip", "Exception", "ArithmeticError", "AssertionError", "AttributeError",
+    "IndexError", "KeyError", "NameError", "OverflowError", "StopIteration", "TypeError",
+    "ValueError", "ZeroDivisionError", "True", "False", "None",
+)
+
+# Environment variables workers keep; everything else (API keys above all) is dropped
+WORKER_ENVIRONMENT = ("PATH", "LANG", "LC_ALL", "LC_CTYPE", "TZ", "TMPDIR")
+# Attributes that reach frames, and from there any module's globals
+BLOCKED_ATTRIBUTES = frozenset({
+    "gi_frame", "gi_code", "gi_yieldfrom", "cr_frame", "cr_code", "cr_await", "ag_frame", "ag_code", "ag_await",
+    "f_back", "f_builtins", "f_code", "f_globals", "f_locals", "tb_frame", "tb_next",
+})
+# Module members that look attributes up by a run-time string (or evaluate strings, as
+# singledispatch does with annotations), past the static checks
+BLOCKED_MODULE_MEMBERS = frozenset({
+    "attrgetter", "methodcaller", "Formatter", "update_wrapper", "wraps", "singledispatch", "singledispatchmethod",
+})
+_FORMAT_LOOKUP = re.compile(r"\.([^.\[]*)|\[([^\]]*)\]")
+
+
+class SandboxViolation(Exception):
+    """The snippet reaches for something the sandbox doesn't allow (dunders, private attributes, frames)."""
+
+
+class _CPUTimeExceeded(BaseException):
+    """Raised from the SIGXCPU handler; a BaseException so snippets can't swallow it with `except Exception`."""
+
+
+@dataclass
+class SandboxResult:
+    ok: bool
+    stdout: str = ""
+    result: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    def to_text(self) -> str:
+        """Render the result the way the code_execution tool reports it to the LLM."""
+        if not self.ok:
+            return f"Error executing code: {self.error}"
+        if self.result is not None:
+            prefix = f"{self.stdout.rstrip()}\n" if self.stdout else ""
+            return f"{prefix}Execution Result: {self.result}"
+        return self.stdout if self.stdout else "Execution finished with no output."
+
+
+# --- Worker process side ---
+def _blocked_attribute(name: str) -> bool:
+    return name.startswith("_") or name in BLOCKED_ATTRIBUTES
+
+
+def _check_format_string(text: str) -> None:
+    """Refuse `str.format` fields that look up private attributes or keys, e.g. "{0.__class__}"."""
+    try:
+        fields = list(string.Formatter().parse(text))
+    except ValueError:
+        return  # Not a valid format string; .format() fails on it anyway
+    for _, field, spec, _ in fields:
+        for attribute, key in _FORMAT_LOOKUP.findall(field or ""):
+            if _blocked_attribute(attribute or key.strip("'\"")):
+                raise SandboxViolation(f"Format field '{{{field}}}' is not allowed in the sandbox")
+        if spec:
+            _check_format_string(spec)
+
+
+def _check_code(tree: ast.AST) -> None:
+    """Reject what the restricted builtins can't stop: dunder names, private and frame attributes
+    (the way from any object to `object.__subclasses__()` or a module's globals) and
+    `str.format` on anything but a string literal, whose fields are checked."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id.startswith("__") and node.id.endswith("__"):
+            raise SandboxViolation(f"Name '{node.id}' is not allowed in the sandbox")
+        if isinstance(node, ast.Attribute):
+            if _blocked_attribute(node.attr):
+                raise SandboxViolation(f"Attribute '{node.attr}' is not allowed in the sandbox")
+            if node.attr in ("format", "format_map"):
+                if not (isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+                    raise SandboxViolation(f"'{node.attr}' is only allowed on string literals in the sandbox")
+                _check_format_string(node.value.value)
+        elif isinstance(node, ast.alias) and _blocked_attribute(node.name.rsplit(".", 1)[-1]):
+            raise SandboxViolation(f"Import of '{node.name}' is not allowed in the sandbox")
+        elif isinstance(node, ast.MatchClass):
+            for name in node.kwd_attrs:
+                if _blocked_attribute(name):
+                    raise SandboxViolation(f"Attribute '{name}' is not allowed in the sandbox")
+
+
+class _ModuleProxy(types.ModuleType):
+    """What an import returns in the sandbox: the module's public members, except modules outside
+    ALLOWED_MODULES (`datetime.sys`, `statistics.sys`, ...) and BLOCKED_MODULE_MEMBERS."""
+
+    def __init__(self, module: types.ModuleType):
+        super().__init__(module.__name__)
+        self._module = module
+
+    def __getattr__(self, name: str) -> Any:
+        if _blocked_attribute(name) or name in BLOCKED_MODULE_MEMBERS:
+            raise AttributeError(f"'{self.__name__}.{name}' is not available in the sandbox")
+        value = getattr(self._module, name)
+        if isinstance(value, types.ModuleType):
+            if value.__name__.split(".")[0] not in ALLOWED_MODULES:
+                raise AttributeError(f"'{self.__name__}.{name}' is not available in the sandbox")
+            return _module_proxy(value)
+        return value
+
+
+_module_proxies: Dict[str, _ModuleProxy] = {}
+
+
+def _module_proxy(module: types.ModuleType) -> _ModuleProxy:
+    proxy = _module_proxies.get(module.__name__)
+    if proxy is None:
+        proxy = _module_proxies[module.__name__] = _ModuleProxy(module)
+    return proxy
+
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split(".")[0] not in ALLOWED_MODULES:
+        raise ImportError(f"Import of '{name}' is not allowed in the sandbox")
+    return _module_proxy(builtins.__import__(name, globals, locals, fromlist, level))
+
+
+def _safe_builtins() -> Dict[str, Any]:
+    safe = {name: getattr(builtins, name) for name in _SAFE_BUILTIN_NAMES}
+    safe["__import__"] = _restricted_import
+    return safe
+
+
+def _execute(code: str, max_output_chars: int) -> Dict[str, Any]:
+    """Run one snippet with real `print` semantics; a lone expression also returns its value."""
+    stdout = io.StringIO()
+    namespace = {"__builtins__": _safe_builtins(), "__name__": "__sandbox__"}
+    try:
+        try:
+            tree, is_expression = ast.parse(code, "<sandbox>", "eval"), True
+        except SyntaxError:
+            tree, is_expression = ast.parse(code, "<sandbox>", "exec"), False
+        _check_code(tree)
+        compiled = compile(tree, "<sandbox>", "eval" if is_expression else "exec")
+        with contextlib.redirect_stdout(stdout):
+            value = eval(compiled, namespace) if is_expression else exec(compiled, namespace)
+        result = str(value) if is_expression and value is not None else None
+        return {"ok": True, "stdout": stdout.getvalue()[:max_output_chars], "result": result}
+    except _CPUTimeExceeded:
+        return {"ok": False, "stdout": stdout.getvalue()[:max_output_chars], "error": "CPU time limit exceeded"}
+    except MemoryError:
+        return {"ok": False, "stdout": stdout.getvalue()[:max_output_chars], "error": "Memory limit exceeded"}
+    except Exception as e:
+        return {"ok": False, "stdout": stdout.getvalue()[:max_output_chars], "error": f"{type(e).__name__}: {e}"}
+
+
+def _raise_cpu_exceeded(signum, frame):
+    raise _CPUTimeExceeded()
+
+
+def _scrub_environment() -> None:
+    for key in list(os.environ):
+        if key not in WORKER_ENVIRONMENT:
+            del os.environ[key]
+
+
+def _isolate(user: Optional[str]) -> None:
+    """Leave the server's working directory (and its .env) and, when running as root, its user.
+
+    The static checks are a denylist; this is what a snippet that gets past them still runs
+    into. The worker moves to an empty temporary directory, removed at once, so relative
+    paths resolve to nothing and nothing is left behind. Then it switches to the
+    unprivileged `user`, which can't read the server's files or other processes' memory.
+    """
+    workdir = tempfile.mkdtemp(prefix="sandbox-")
+    os.chdir(workdir)
+    os.rmdir(workdir)
+    if user and hasattr(os, "geteuid") and os.geteuid() == 0:
+        import pwd
+
+        entry = pwd.getpwnam(user)
+        os.setgroups([])
+        os.setgid(entry.pw_gid)
+        os.setuid(entry.pw_uid)
+
+
+def _worker_main(conn, memory_limit_bytes: int, cpu_seconds: int, max_output_chars: int, user: Optional[str] = None) -> None:
+    """Entry point of a sandbox worker: apply limits once, then serve snippets until the pipe closes."""
+    _scrub_environment()  # Before any snippet runs: the worker inherits the server's environment
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Shutdown is driven by the parent
+    try:
+        for name in ALLOWED_MODULES:  # While the server's files are still readable
+            importlib.import_module(name)
+        _isolate(user)
+    except Exception as e:
+        conn.send(f"isolation failed: {e!r}")  # Fail closed: the parent refuses the worker
+        return
+    if resource is not None:
+        if memory_limit_bytes > 0:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        if hasattr(resource, "RLIMIT_NPROC"):
+            resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))  # No fork/exec, e.g. of a shell
+        signal.signal(signal.SIGXCPU, _raise_cpu_exceeded)
+    conn.send("ready")  # Tells the parent that imports, isolation and limits are in place
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if resource is not None and cpu_seconds > 0:
+            # RLIMIT_CPU counts the process lifetime, so move the soft limit forward per snippet
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            soft = math.ceil(used.ru_utime + used.ru_stime) + cpu_seconds
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.RLIM_INFINITY))
+        conn.send(_execute(code, max_output_chars))
+
+
+# --- Parent side ---
+class _Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def kill(self) -> None:
+        with contextlib.suppress(Exception):
+            self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+
+
+class SandboxPool:
+    """Prewarmed pool of isolated worker processes for the code_execution tool.
+
+    Each snippet runs in a separate process with an address-space rlimit, a per-snippet
+    CPU-time rlimit and a wall-clock timeout enforced by the parent; a worker that
+    overruns is killed and replaced in the background, so a runaway snippet only
+    costs one worker for one timeout, never the API's event loop. Workers run in an
+    empty working directory and, when the server runs as root, as the unprivileged `user`.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 5.0,
+        cpu_seconds: int = 5,
+        memory_mb: int = 256,
+        max_output_chars: int = 10000,
+        user: Optional[str] = "nobody",
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output_chars = max_output_chars
+        self.user = user
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+        self._closed = False
+        self._counters = {"executions": 0, "timeouts": 0, "crashes": 0, "respawns": 0}
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.memory_mb * 1024 * 1024, self.cpu_seconds, self.max_output_chars, self.user),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        # Block (in an executor thread) until the worker has finished importing, so a
+        # prewarmed worker never spends a snippet's timeout on its own startup
+        reply = parent_conn.recv() if parent_conn.poll(30) else "no reply"
+        if reply != "ready":
+            process.kill()
+            raise RuntimeError(f"Sandbox worker failed to start: {reply}")
+        worker = _Worker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    async def start(self) -> None:
+        """Spawn and prewarm all workers; safe to call more than once."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        if not (self.user and hasattr(os, "geteuid") and os.geteuid() == 0):
+            logger.warning("Sandbox workers run as the server's own user: code that escapes the sandbox can read "
+                           "whatever the server can. Run the server as root with SANDBOX_USER set to drop privileges.")
+        loop = asyncio.get_running_loop()
+        workers = await asyncio.gather(*(loop.run_in_executor(None, self._spawn) for _ in range(self.size)))
+        for worker in workers:
+            self._idle.put_nowait(worker)
+        logger.info(f"Sandbox pool started with {self.size} worker processes")
+
+    async def _replace(self, worker: _Worker) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, worker.kill)
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if self._closed:
+            return
+        self._counters["respawns"] += 1
+        replacement = await loop.run_in_executor(None, self._spawn)
+        if self._closed:
+            await loop.run_in_executor(None, replacement.kill)
+            return
+        self._idle.put_nowait(replacement)
+
+    async def _wait_readable(self, worker: _Worker, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = worker.conn.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(True))
+        try:
+            await asyncio.wait_for(ready, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fd)
+
+    async def run(self, code: str, timeout: Optional[float] = None) -> SandboxResult:
+        """Execute `code` in an idle worker, waiting for one if all are busy."""
+        await self.start()
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        worker = await self._idle.get()
+        start = time.perf_counter()
+        self._counters["executions"] += 1
+        try:
+            worker.conn.send(code)
+            if not await self._wait_readable(worker, timeout):
+                self._counters["timeouts"] += 1
+                logger.warning(f"Sandbox execution exceeded {timeout}s; killing worker pid={worker.process.pid}")
+                asyncio.ensure_future(self._replace(worker))
+                worker = None
+                return SandboxResult(ok=False, error=f"Execution timed out after {timeout}s", elapsed=time.perf_counter() - start)
+            reply = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            # The worker died, most likely killed by the kernel for exceeding its limits
+            self._counters["crashes"] += 1
+            logger.warning(f"Sandbox worker pid={worker.process.pid} died: {e!r}")
+            asyncio.ensure_future(self._replace(worker))
+            worker = None
+            return SandboxResult(ok=False, error="Sandbox worker crashed (resource limit exceeded?)", elapsed=time.perf_counter() - start)
+        except asyncio.CancelledError:
+            # The caller gave up mid-execution; the worker may still be busy, so recycle it
+            asyncio.ensure_future(self._replace(worker))
+            worker = None
+            raise
+        finally:
+            if worker is not None:
+                self._idle.put_nowait(worker)
+        return SandboxResult(elapsed=time.perf_counter() - start, **reply)
+
+    def stats(self) -> Dict[str, Any]:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {"size": self.size, "alive": sum(w.process.is_alive() for w in self._workers), "idle": idle, **self._counters}
+
+    async def close(self) -> None:
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        workers, self._workers = self._workers, []
+        await asyncio.gather(*(loop.run_in_executor(None, w.kill) for w in workers))
+
+
+def run_isolated_sync(code: str) -> SandboxResult:
+    """One-off blocking execution in a fresh worker, for sync callers outside the event loop."""
+    from .config import settings
+
+    pool = SandboxPool(size=1, timeout=settings.sandbox_timeout_seconds, cpu_seconds=settings.sandbox_cpu_seconds,
+                       memory_mb=settings.sandbox_memory_mb, max_output_chars=settings.sandbox_max_output_chars,
+                       user=settings.sandbox_user)
+    worker = pool._spawn()
+    start = time.perf_counter()
+    try:
+        worker.conn.send(code)
+        if not worker.conn.poll(pool.timeout):
+            return SandboxResult(ok=False, error=f"Execution timed out after {pool.timeout}s", elapsed=time.perf_counter() - start)
+        return SandboxResult(elapsed=time.perf_counter() - start, **worker.conn.recv())
+    except (EOFError, OSError) as e:
+        return SandboxResult(ok=False, error=f"Sandbox worker crashed: {e!r}", elapsed=time.perf_counter() - start)
+    finally:
+        worker.kill()
+
+
+_sandbox_pool: Optional[SandboxPool] = None
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the process-wide sandbox pool, creating it (not yet started) on first use."""
+    global _sandbox_pool
+    if _sandbox_pool is None:
+        from .config import settings
+
+        _sandbox_pool = SandboxPool(
+            size=settings.sandbox_pool_size,
+            timeout=settings.sandbox_timeout_seconds,
+            cpu_seconds=settings.sandbox_cpu_seconds,
+            memory_mb=settings.sandbox_memory_mb,
+            max_output_chars=settings.sandbox_max_output_chars,
+            user=settings.sandbox_user,
+        )
+    return _sandbox_pool
+
+
+async def close_sandbox_pool() -> None:
+    global _sandbox_pool
+    if _sandbox_pool is not None:
+        await _sandbox_pool.close()
+        _sandbox_pool = None
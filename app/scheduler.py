@@ -0,0 +1,216 @@
+# app/scheduler.py
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first; queued requests of an earlier class are always admitted first
+PRIORITY_CLASSES = ("interactive", "batch")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted; carries the HTTP status and Retry-After to send."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "future", "enqueued_at")
+
+    def __init__(self, priority: str, future: "asyncio.Future[None]"):
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class Slot:
+    """An admitted request's place in the scheduler; release it exactly once (extra calls are no-ops)."""
+    __slots__ = ("_scheduler", "_admitted_at", "_released")
+
+    def __init__(self, scheduler: "RequestScheduler"):
+        self._scheduler = scheduler
+        self._admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release(time.monotonic() - self._admitted_at)
+
+
+class RequestScheduler:
+    """Admission control in front of the agent graph.
+
+    At most `max_in_flight` runs execute at once. Further requests wait in per-class
+    FIFO queues (higher classes first) holding at most `max_queue` requests in total;
+    when the queue is full a higher-priority arrival evicts the newest lower-priority
+    waiter, otherwise the arrival is rejected with 429. A waiter that isn't admitted
+    within its class's queue timeout gets 503. Both carry a Retry-After estimated from
+    the recent service time and the current backlog.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 64,
+        queue_timeouts: Optional[Dict[str, float]] = None,
+        default_queue_timeout: float = 10.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeouts = dict(queue_timeouts or {})
+        self.default_queue_timeout = default_queue_timeout
+        self._in_flight = 0
+        self._queues: Dict[str, Deque[_Waiter]] = {name: deque() for name in PRIORITY_CLASSES}
+        self._service_time_ewma: Optional[float] = None
+        self._recent_waits: Deque[float] = deque(maxlen=1024)
+        self._counters = {name: {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "evicted": 0}
+                          for name in PRIORITY_CLASSES}
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog is likely to have drained."""
+        service_time = self._service_time_ewma or 1.0
+        return max(1, math.ceil(service_time * (self._queued() + 1) / self.max_in_flight))
+
+    def _reject(self, priority: str, status_code: int, reason: str, counter: str) -> AdmissionRejected:
+        self._counters[priority][counter] += 1
+        logger.warning(f"Admission rejected ({priority}): {reason}")
+        return AdmissionRejected(status_code, reason, self._retry_after())
+
+    def _evict_lower_than(self, priority: str) -> bool:
+        """Drop the newest waiter of the lowest class below `priority`, if any."""
+        rank = PRIORITY_CLASSES.index(priority)
+        for name in reversed(PRIORITY_CLASSES[rank + 1:]):
+            queue = self._queues[name]
+            while queue:
+                waiter = queue.pop()
+                if not waiter.future.done():
+                    waiter.future.set_exception(self._reject(name, 429, "Evicted from the queue by a higher-priority request", "evicted"))
+                    return True
+        return False
+
+    async def acquire(self, priority: str = PRIORITY_CLASSES[0]) -> Slot:
+        """Wait for a slot, or raise AdmissionRejected."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}. Choose one of {PRIORITY_CLASSES}.")
+        if self._in_flight < self.max_in_flight and not self._queued():
+            return self._admit(priority, 0.0)
+        if self._queued() >= self.max_queue and not self._evict_lower_than(priority):
+            raise self._reject(priority, 429, f"Server busy: {self._in_flight} running, {self._queued()} queued", "rejected_queue_full")
+
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        self._queues[priority].append(waiter)
+        self._counters[priority]["queued"] += 1
+        timeout = self.queue_timeouts.get(priority, self.default_queue_timeout)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                if waiter.future.exception() is not None:
+                    raise waiter.future.exception() from None # Evicted just as the deadline passed
+                return self._admitted(waiter) # Admitted just as the deadline passed; keep the slot
+            self._remove(waiter)
+            raise self._reject(priority, 503, f"Queue deadline of {timeout}s exceeded", "rejected_timeout") from None
+        except asyncio.CancelledError:
+            # The client went away while queued; hand back a slot it may already have been given
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self._release(None)
+            else:
+                self._remove(waiter)
+            raise
+        return self._admitted(waiter)
+
+    def _admit(self, priority: str, waited: float) -> Slot:
+        self._in_flight += 1
+        self._counters[priority]["admitted"] += 1
+        self._recent_waits.append(waited)
+        return Slot(self)
+
+    def _admitted(self, waiter: _Waiter) -> Slot:
+        # `_release` already counted this waiter as in flight when it resolved the future
+        self._in_flight -= 1
+        return self._admit(waiter.priority, time.monotonic() - waiter.enqueued_at)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues[waiter.priority]
+        if waiter in queue:
+            queue.remove(waiter)
+        if not waiter.future.done():
+            waiter.future.cancel()
+
+    def _release(self, service_time: Optional[float]) -> None:
+        self._in_flight -= 1
+        if service_time is not None:
+            ewma = self._service_time_ewma
+            self._service_time_ewma = service_time if ewma is None else 0.8 * ewma + 0.2 * service_time
+        # Hand the freed slot to the oldest waiter of the highest non-empty class
+        for name in PRIORITY_CLASSES:
+            queue = self._queues[name]
+            while queue and self._in_flight < self.max_in_flight:
+                waiter = queue.popleft()
+                if not waiter.future.done():
+                    self._in_flight += 1
+                    waiter.future.set_result(None)
+                    return
+
+    def slot(self, priority: str = PRIORITY_CLASSES[0]) -> "_SlotContext":
+        """`async with scheduler.slot(priority):` acquires on entry and releases on exit."""
+        return _SlotContext(self, priority)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._recent_waits)
+        percentile = lambda p: waits[min(len(waits) - 1, int(len(waits) * p))] if waits else 0.0
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "max_queue": self.max_queue,
+            "queued": {name: len(q) for name, q in self._queues.items()},
+            "wait_seconds": {"p50": percentile(0.5), "p95": percentile(0.95), "max": waits[-1] if waits else 0.0},
+            "service_time_ewma_seconds": self._service_time_ewma,
+            "classes": self._counters,
+        }
+
+
+class _SlotContext:
+    __slots__ = ("_scheduler", "_priority", "_slot")
+
+    def __init__(self, scheduler: RequestScheduler, priority: str):
+        self._scheduler = scheduler
+        self._priority = priority
+        self._slot: Optional[Slot] = None
+
+    async def __aenter__(self) -> Slot:
+        self._slot = await self._scheduler.acquire(self._priority)
+        return self._slot
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._slot.release()
+
+
+_request_scheduler: Optional[RequestScheduler] = None
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Return the process-wide request scheduler, creating it on first use."""
+    global _request_scheduler
+    if _request_scheduler is None:
+        _request_scheduler = RequestScheduler(
+            max_in_flight=settings.scheduler_max_in_flight,
+            max_queue=settings.scheduler_max_queue,
+            queue_timeouts=settings.scheduler_queue_timeouts,
+            default_queue_timeout=settings.scheduler_queue_timeout_seconds,
+        )
+    return _request_scheduler
@@ -1,8 +1,22 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Any, Dict
 
+class AgentBudgetRequest(BaseModel):
+    """Per-question limits; unset fields use MAX_AGENT_*, and all are capped by BUDGET_MAX_*."""
+    max_iterations: Optional[int] = Field(default=None, ge=1, description="Agent model calls before a final answer is forced.")
+    max_tokens: Optional[int] = Field(default=None, ge=1, description="LLM tokens (prompt and completion) the question may spend.")
+    max_tool_calls: Optional[int] = Field(default=None, ge=0, description="Tool calls the question may make.")
+
 class QueryRequest(BaseModel):
     question: str
+    session_id: Optional[str] = Field(default=None, min_length=1, max_length=128, description="Continue this conversation; omit to start a new one (its id is returned in X-Session-Id).")
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, description="End-to-end time limit for this question; capped by REQUEST_DEADLINE_MAX_SECONDS, defaults to REQUEST_DEADLINE_SECONDS.")
+    budget: Optional[AgentBudgetRequest] = Field(default=None, description="Iteration, token and tool-call limits for this question; spend is reported in X-Agent-Budget.")
+
+class BatchQueryRequest(BaseModel):
+    questions: List[QueryRequest]
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="Agent runs in flight at once; capped by BATCH_MAX_CONCURRENCY.")
+    stream: bool = Field(default=False, description="Stream results as Server-Sent Events as they complete instead of returning them in order.")
 
 class ToolCallRepresentation(BaseModel): # Renamed for clarity
     tool_name: str
@@ -22,7 +36,7 @@ class AgentResponse(BaseModel):
     final_answer: Optional[str] = None
     intermediate_steps: List[StepDetail] = []
     error_message: Optional[str] = None # More prominent error field
-    session_id: Optional[str] = None # For future stateful use
+    session_id: Optional[str] = None # Conversation id; pass it back in QueryRequest.session_id to continue
 
 class GaiaAnswer(BaseModel):
     """Structured response format for GAIA benchmark questions."""
@@ -34,4 +48,20 @@ class GaiaAnswer(BaseModel):
     def answer_not_empty(cls, v):
         if not v or not v.strip():
             raise ValueError("Answer cannot be empty")
-        return v
\ No newline at end of file
+        return v
+
+class BatchItemResult(BaseModel):
+    """Outcome of one question in a batch; exactly one of `answer` or `error` is set."""
+    index: int
+    question: str
+    answer: Optional[GaiaAnswer] = None
+    error: Optional[str] = None
+    cache: Optional[str] = None # X-Cache value for this item: HIT-EXACT, HIT-SIMILAR, MISS or BYPASS
+    duplicate_of: Optional[int] = None # Index of the identical question whose run this result reuses
+    deadline_exceeded: bool = False # The answer is a best-effort one assembled when the question's deadline expired
+    budget: Optional[Dict[str, Any]] = None # Iterations, tokens, tool calls and seconds spent, with the limits and why the run stopped
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    unique_questions: int
+    errors: int
@@ -0,0 +1,322 @@
+# app/search.py
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import AnswerCacheBackend, SqliteAnswerCacheBackend, normalize_question
+from .config import settings
+from .stub import LatencyDistribution, seeded_rng, stub_page_text
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BACKENDS = ("tavily", "mock", "stub")
+
+SearchResults = List[Dict[str, str]]
+
+
+# --- Backends ---
+class SearchBackend(ABC):
+    """A web search provider returning a list of {"url", "content"} results."""
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> SearchResults:
+        ...
+
+    @abstractmethod
+    def search_sync(self, query: str, max_results: int) -> SearchResults:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class TavilySearchBackend(SearchBackend):
+    """Tavily search through one long-lived client per mode, so connections are reused."""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._async_client = None
+        self._sync_client = None
+
+    @staticmethod
+    def _format(response: Dict[str, Any]) -> SearchResults:
+        return [{"url": res["url"], "content": res["content"]} for res in response.get("results", [])]
+
+    async def search(self, query, max_results):
+        if self._async_client is None:
+            # Import locally to avoid dependency error if Tavily isn't installed/used
+            from tavily import AsyncTavilyClient
+            self._async_client = AsyncTavilyClient(api_key=self.api_key)
+        response = await self._async_client.search(query=query, search_depth="basic", max_results=max_results)
+        return self._format(response)
+
+    def search_sync(self, query, max_results):
+        if self._sync_client is None:
+            from tavily import TavilyClient
+            self._sync_client = TavilyClient(api_key=self.api_key)
+        return self._format(self._sync_client.search(query=query, search_depth="basic", max_results=max_results))
+
+    async def aclose(self):
+        close = getattr(self._async_client, "close", None)
+        if close is not None:
+            await close()
+        self._async_client = None
+
+
+class MockSearchBackend(SearchBackend):
+    """Offline stand-in for Tavily used when no API key is set, in tests and in benchmarks."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def _results(self, query: str, max_results: int) -> SearchResults:
+        self.calls += 1
+        if "capital of france" in query.lower():
+            return [{"url": "https://en.wikipedia.org/wiki/Paris", "content": "The capital of France is Paris."}]
+        return [{"url": "mock://search", "content": f"Mocked search results for: {query}. (TAVILY_API_KEY not set)"}][:max_results]
+
+    async def search(self, query, max_results):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._results(query, max_results)
+
+    def search_sync(self, query, max_results):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._results(query, max_results)
+
+
+class StubSearchBackend(SearchBackend):
+    """Offline backend for benchmarks: `max_results` results per query after a sampled latency.
+
+    Latency and results are seeded by the query, so repeated runs behave identically. With
+    `result_words`, each result carries that much page text instead of a one-line snippet.
+    """
+
+    def __init__(self, latency: Optional[LatencyDistribution] = None, seed: int = 0, result_words: int = 0):
+        self.latency = latency or LatencyDistribution()
+        self.seed = seed
+        self.result_words = result_words
+        self.calls = 0
+
+    def _delay(self, query: str) -> float:
+        return self.latency.sample(seeded_rng(self.seed, "search", query))
+
+    def _results(self, query: str, max_results: int) -> SearchResults:
+        self.calls += 1
+        slug = normalize_question(query).replace(" ", "_")[:64] or "empty"
+        return [{"url": f"https://stub.example/{slug}/{i}", "content": self._content(query, i)} for i in range(max_results)]
+
+    def _content(self, query: str, i: int) -> str:
+        if not self.result_words:
+            return f"Stub result {i + 1} for: {query}"
+        return stub_page_text(seeded_rng(self.seed, "page", query, str(i)), query, self.result_words)
+
+    async def search(self, query, max_results):
+        await asyncio.sleep(self._delay(query))
+        return self._results(query, max_results)
+
+    def search_sync(self, query, max_results):
+        time.sleep(self._delay(query))
+        return self._results(query, max_results)
+
+
+# --- Caching, deduplicating client ---
+class SearchClient:
+    """Web search front-end shared by all requests.
+
+    Results are cached per normalized query (TTL + LRU bound), identical queries
+    already in flight are coalesced onto one backend call, and every backend call
+    is bounded by `timeout`. With a `store` (e.g. SQLite shared by all workers) the
+    cache lives there instead of in this process.
+    """
+
+    def __init__(
+        self,
+        backend: SearchBackend,
+        max_results: int = 3,
+        ttl_seconds: Optional[float] = 600.0,
+        max_entries: int = 512,
+        timeout: Optional[float] = 10.0,
+        store: Optional[AnswerCacheBackend] = None,
+    ):
+        self.backend = backend
+        self.store = store
+        self.max_results = max_results
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._cache: "OrderedDict[str, Tuple[SearchResults, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, "asyncio.Task[SearchResults]"] = {}
+        # Sync callers: backend calls run here so a caller can stop waiting at `timeout`
+        self._executor = ThreadPoolExecutor(thread_name_prefix="search")
+        self._inflight_sync: Dict[str, "Future[SearchResults]"] = {}
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def _get_cached(self, key: str) -> Optional[SearchResults]:
+        if self.store is not None:
+            payload = self.store.get(key)
+            return payload["results"] if payload is not None else None
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return None
+            if self.ttl_seconds is not None and time.time() - item[1] > self.ttl_seconds:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return item[0]
+
+    def _put_cached(self, key: str, results: SearchResults) -> None:
+        if self.store is not None:
+            self.store.set(key, "search", key, {"results": results})
+            return
+        with self._lock:
+            self._cache[key] = (results, time.time())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def _fetch(self, key: str, query: str) -> SearchResults:
+        try:
+            results = await asyncio.wait_for(self.backend.search(query, self.max_results), self.timeout)
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            raise TimeoutError(f"Search timed out after {self.timeout}s") from None
+        except Exception:
+            self._counters["errors"] += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self._put_cached(key, results)
+        return results
+
+    async def search(self, query: str, timeout: Optional[float] = None) -> SearchResults:
+        """Search, serving from cache or joining an identical in-flight call when possible.
+
+        `timeout` further bounds how long this caller waits; the shared backend call
+        keeps its own timeout so other waiters are unaffected.
+        """
+        key = normalize_question(query)
+        cached = self._get_cached(key)
+        if cached is not None:
+            self._counters["hits"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._counters["misses"] += 1
+            task = self._inflight[key] = asyncio.ensure_future(self._fetch(key, query))
+        else:
+            self._counters["coalesced"] += 1
+        # Shield so one caller's cancellation doesn't abort the call for everyone sharing it
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _fetch_sync(self, key: str, query: str) -> SearchResults:
+        try:
+            results = self.backend.search_sync(query, self.max_results)
+            self._put_cached(key, results)
+            return results
+        except Exception:
+            self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight_sync.pop(key, None)
+
+    def search_sync(self, query: str) -> SearchResults:
+        """Blocking variant for sync callers, with the same cache, coalescing and timeout.
+
+        The backend call runs on a worker thread and every caller waits on its future
+        for at most `timeout`, so a hung provider can't hold up the callers sharing it.
+        """
+        key = normalize_question(query)
+        cached = self._get_cached(key)
+        if cached is not None:
+            self._counters["hits"] += 1
+            return cached
+
+        with self._lock:
+            future = self._inflight_sync.get(key)
+            if future is None:
+                self._counters["misses"] += 1
+                future = self._inflight_sync[key] = self._executor.submit(self._fetch_sync, key, query)
+            else:
+                self._counters["coalesced"] += 1
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._counters["timeouts"] += 1
+            raise TimeoutError(f"Search timed out after {self.timeout}s") from None
+
+    def stats(self) -> Dict[str, Any]:
+        entries = len(self.store) if self.store is not None else len(self._cache)
+        return {"backend": type(self.backend).__name__, "entries": entries, "inflight": len(self._inflight) + len(self._inflight_sync),
+                **self._counters}
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        await self.backend.aclose()
+        if self.store is not None:
+            self.store.close()
+
+
+_search_client: Optional[SearchClient] = None
+
+
+def create_search_backend(name: Optional[str] = None) -> SearchBackend:
+    name = (name or settings.search_backend).lower().strip('"\'')
+    if name == "mock":
+        return MockSearchBackend()
+    if name == "stub":
+        return StubSearchBackend(LatencyDistribution.parse(settings.stub_search_latency), seed=settings.stub_seed,
+                                 result_words=settings.stub_search_result_words)
+    if name == "tavily":
+        if not settings.tavily_api_key:
+            logger.warning("TAVILY_API_KEY not set. Using mocked search results.")
+            return MockSearchBackend()
+        return TavilySearchBackend(settings.tavily_api_key)
+    logger.critical(f"Unsupported SEARCH_BACKEND in config: '{name}'. Choose one of {SEARCH_BACKENDS}.")
+    raise ValueError(f"Unsupported SEARCH_BACKEND: {name}")
+
+
+def create_search_cache_store(name: Optional[str] = None) -> Optional[AnswerCacheBackend]:
+    """Shared store for search results, or None to cache in process memory."""
+    name = (name or settings.search_cache_backend).lower().strip('"\'')
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        return SqliteAnswerCacheBackend(settings.search_cache_path, settings.search_cache_max_entries,
+                                        settings.search_cache_ttl_seconds, table="search_results")
+    logger.critical(f"Unsupported SEARCH_CACHE_BACKEND in config: '{name}'. Choose 'memory' or 'sqlite'.")
+    raise ValueError(f"Unsupported SEARCH_CACHE_BACKEND: {name}")
+
+
+def get_search_client() -> SearchClient:
+    """Return the process-wide search client, creating it on first use."""
+    global _search_client
+    if _search_client is None:
+        _search_client = SearchClient(
+            create_search_backend(),
+            max_results=settings.search_max_results,
+            ttl_seconds=settings.search_cache_ttl_seconds,
+            max_entries=settings.search_cache_max_entries,
+            timeout=settings.search_timeout_seconds,
+            store=create_search_cache_store(),
+        )
+    return _search_client
+
+
+async def close_search_client() -> None:
+    global _search_client
+    if _search_client is not None:
+        await _search_client.aclose()
+        _search_client = None
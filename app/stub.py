@@ -0,0 +1,269 @@
+# app/stub.py
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+STUB_ANSWER = {
+    "answer": "Paris is the capital of France.",
+    "reasoning": "It is the seat of the French government.",
+    "sources": ["https://en.wikipedia.org/wiki/Paris"],
+}
+
+# One web search for the question, then the answer as a GaiaAnswer call: exercises the
+# whole agent -> tools -> agent loop
+DEFAULT_STUB_SCRIPT = [
+    {"tool_calls": [{"name": "web_search", "args": {"query": "{question}"}}]},
+    {"tool_calls": [{"name": "GaiaAnswer", "args": STUB_ANSWER}]},
+]
+
+TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+class LatencyDistribution:
+    """Seeded sampler for stub latencies, parsed from a spec string.
+
+    Specs: `0.5` (fixed), `uniform:0.2,0.8`, `normal:0.5,0.1`, `lognormal:<median>,<sigma>`
+    and `exp:<mean>`. Samples are clamped at zero.
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exp")
+
+    def __init__(self, kind: str = "fixed", params: Sequence[float] = (0.0,)):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unsupported latency distribution '{kind}'. Choose one of {self.KINDS}.")
+        expected = {"fixed": 1, "exp": 1}.get(kind, 2)
+        if len(params) != expected:
+            raise ValueError(f"Latency distribution '{kind}' takes {expected} parameter(s), got {len(params)}.")
+        self.kind = kind
+        self.params = tuple(params)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        spec = spec.strip()
+        kind, _, raw = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        try:
+            params = [float(p) for p in raw.split(",")] if raw else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec '{spec}'") from None
+        return cls(kind.strip().lower(), params)
+
+    def sample(self, rng: random.Random) -> float:
+        a = self.params[0]
+        if self.kind == "fixed":
+            value = a
+        elif self.kind == "uniform":
+            value = rng.uniform(a, self.params[1])
+        elif self.kind == "normal":
+            value = rng.gauss(a, self.params[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(a), self.params[1]) if a > 0 else 0.0
+        else:
+            value = rng.expovariate(1 / a) if a > 0 else 0.0
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+def seeded_rng(seed: int, *parts: str) -> random.Random:
+    """RNG that depends only on `seed` and `parts`, so concurrent runs stay reproducible."""
+    return random.Random(zlib.crc32("\x00".join((str(seed), *parts)).encode()))
+
+
+# Site chrome that real pages repeat around their content
+STUB_BOILERPLATE = [
+    "This site uses cookies to improve your experience and to analyse traffic.",
+    "Subscribe to our newsletter to get the latest articles delivered to your inbox.",
+    "All rights reserved; content may not be reproduced without written permission.",
+]
+STUB_FILLER_WORDS = (
+    "history region period research report team early later local annual major public record source "
+    "several general system century population official archive museum national university study article"
+).split()
+
+
+def stub_page_text(rng: random.Random, query: str, words: int) -> str:
+    """About `words` words of seeded page text for a search result: sentences on the query's
+    terms, filler sentences and repeated site boilerplate, as in a scraped web page."""
+    terms = re.findall(r"\w+", query) or ["topic"]
+    sentences: List[str] = []
+    count = 0
+    while count < words:
+        roll = rng.random()
+        if roll < 0.2:
+            sentence = rng.choice(STUB_BOILERPLATE)
+        elif roll < 0.5:
+            picked = rng.sample(terms, min(len(terms), 3))
+            sentence = f"The {' '.join(picked)} entry lists the {rng.choice(STUB_FILLER_WORDS)} figure as {rng.randint(2, 9999)}."
+        else:
+            sentence = " ".join(rng.choice(STUB_FILLER_WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        sentences.append(sentence)
+        count += len(sentence.split())
+    return " ".join(sentences)
+
+
+def load_stub_script(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read a stub script (a JSON list of turns) or return the default one."""
+    if not path:
+        return DEFAULT_STUB_SCRIPT
+    with open(path, encoding="utf-8") as f:
+        script = json.load(f)
+    if not isinstance(script, list) or not script:
+        raise ValueError(f"Stub script {path} must be a non-empty JSON list of turns.")
+    return script
+
+
+def _fill(value: Any, question: str) -> Any:
+    """Substitute `{question}` in strings nested anywhere in `value`."""
+    if isinstance(value, str):
+        return value.replace("{question}", question)
+    if isinstance(value, dict):
+        return {k: _fill(v, question) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, question) for v in value]
+    return value
+
+
+class StubChatModel(BaseChatModel):
+    """Offline chat model replaying a script of turns, selected with `LLM_PROVIDER=stub`.
+
+    Each turn is `{"content": "..."}` and/or `{"tool_calls": [{"name": ..., "args": {...}}]}`;
+    `{question}` is replaced by the latest human message. The turn played is the number of AI
+    messages since that human message (the last turn repeats). A model without bound tools, or
+    bound with a forced `tool_choice`, always plays the script's final turn; without tools, a
+    final GaiaAnswer call is replied as its JSON text (like JSON mode). Every call waits a sample of `latency` plus
+    `prefill_interval` per prompt word before the first token and `token_interval` between streamed
+    words; samples are seeded by the question and turn, so runs are reproducible regardless of concurrency.
+    """
+
+    model_name: str = "stub"
+    script: List[Dict[str, Any]] = DEFAULT_STUB_SCRIPT
+    latency: LatencyDistribution = LatencyDistribution()
+    token_interval: float = 0.0
+    prefill_interval: float = 0.0
+    seed: int = 0
+    temperature: Optional[float] = None  # Not used for sampling; 0 declares the replies deterministic (model-call cache)
+    tools_bound: bool = False
+    tool_choice: Optional[str] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "StubChatModel":
+        return self.model_copy(update={"tools_bound": True, "tool_choice": kwargs.get("tool_choice")})
+
+    def _turn(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        question, turn = "", 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                question = message.text
+                break
+            if isinstance(message, AIMessage):
+                turn += 1
+        spec = self.script[min(turn, len(self.script) - 1)] if self.tools_bound and not self.tool_choice else self.script[-1]
+        spec = _fill(spec, question)
+        if not self.tools_bound and not spec.get("content"):
+            answer = next((call for call in spec.get("tool_calls") or [] if call["name"] == "GaiaAnswer"), None)
+            if answer is not None:
+                spec = {**spec, "content": json.dumps(answer.get("args", {}))}
+        return {"question": question, "turn": turn, **spec}
+
+    def _message(self, turn: Dict[str, Any], messages: List[BaseMessage]) -> AIMessage:
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": call.get("id") or f"call_stub_{turn['turn']}_{i}"}
+            for i, call in enumerate(turn.get("tool_calls") or [])
+        ] if self.tools_bound else []
+        content = turn.get("content", "")
+        return AIMessage(content=content, tool_calls=tool_calls, usage_metadata=self._usage(messages, content, tool_calls))
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], content: str, tool_calls: Sequence[Dict[str, Any]] = ()) -> Dict[str, int]:
+        """Whitespace-token counts, so token metrics see realistic numbers."""
+        input_tokens = sum(len(m.text.split()) for m in messages)
+        output_tokens = len(content.split()) + sum(len(json.dumps(call["args"]).split()) for call in tool_calls)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    @staticmethod
+    def _output_pieces(message: AIMessage) -> int:
+        """Streamed pieces after the first: words of the content and of each tool call's arguments."""
+        pieces = len(TOKEN_PATTERN.findall(message.text))
+        pieces += sum(len(TOKEN_PATTERN.findall(json.dumps(call["args"]))) for call in message.tool_calls)
+        return max(0, pieces - 1)
+
+    def _first_token_delay(self, turn: Dict[str, Any], message: AIMessage) -> float:
+        prefill = self.prefill_interval * message.usage_metadata["input_tokens"] if self.prefill_interval else 0.0
+        return self.latency.sample(seeded_rng(self.seed, turn["question"], str(turn["turn"]))) + prefill
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        turn = self._turn(messages)
+        message = self._message(turn, messages)
+        time.sleep(self._first_token_delay(turn, message) + self.token_interval * self._output_pieces(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        turn = self._turn(messages)
+        message = self._message(turn, messages)
+        await asyncio.sleep(self._first_token_delay(turn, message) + self.token_interval * self._output_pieces(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        for token in TOKEN_PATTERN.findall(message.text):
+            yield AIMessageChunk(content=token)
+        # Tool call arguments arrive in word-sized fragments, as from a real provider
+        for i, call in enumerate(message.tool_calls):
+            for j, fragment in enumerate(TOKEN_PATTERN.findall(json.dumps(call["args"]))):
+                yield AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": None if j else call["name"], "args": fragment, "id": None if j else call["id"], "index": i,
+                }])
+        yield AIMessageChunk(content="", usage_metadata=message.usage_metadata)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        turn = self._turn(messages)
+        message = self._message(turn, messages)
+        time.sleep(self._first_token_delay(turn, message))
+        for i, chunk in enumerate(self._chunks(message)):
+            if i and (chunk.content or chunk.tool_call_chunks) and self.token_interval:
+                time.sleep(self.token_interval)
+            if run_manager and (chunk.content or chunk.tool_call_chunks):
+                run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        turn = self._turn(messages)
+        message = self._message(turn, messages)
+        await asyncio.sleep(self._first_token_delay(turn, message))
+        for i, chunk in enumerate(self._chunks(message)):
+            if i and (chunk.content or chunk.tool_call_chunks) and self.token_interval:
+                await asyncio.sleep(self.token_interval)
+            if run_manager and (chunk.content or chunk.tool_call_chunks):
+                await run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+def create_stub_llm() -> StubChatModel:
+    """Build the stub provider from the STUB_* settings."""
+    return StubChatModel(
+        script=load_stub_script(settings.stub_script_path),
+        latency=LatencyDistribution.parse(settings.stub_latency),
+        token_interval=settings.stub_token_interval,
+        prefill_interval=settings.stub_prefill_interval,
+        seed=settings.stub_seed,
+        temperature=settings.llm_temperature,
+    )
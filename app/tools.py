@@ -1,4 +1,5 @@
 # app/tools.py
+import asyncio
 import json
 import logging
 from typing import Dict, Any, Type
@@ -8,6 +9,10 @@ from pydantic import BaseModel, Field
 
 # Import settings for API keys etc.
 from .config import settings
+from .search import get_search_client
+from .knowledge import get_knowledge_index
+from .metrics import KNOWLEDGE_SEARCHES
+from .sandbox import get_sandbox_pool, run_isolated_sync
 
 # --- Basic Logging Setup ---
 logger = logging.getLogger(__name__) # Gets logger named 'app.tools'
@@ -16,6 +21,9 @@ logger = logging.getLogger(__name__) # Gets logger named 'app.tools'
 class WebSearchInput(BaseModel):
     query: str = Field(description="The search query string to find information on the web.")
 
+class KnowledgeSearchInput(BaseModel):
+    query: str = Field(description="Keywords to look up in the local knowledge base.")
+
 class CodeExecutionInput(BaseModel):
     code: str = Field(description="A snippet of Python code to execute for calculation or simple data manipulation. The code should aim to `print()` its result to be captured.")
 
@@ -27,61 +35,107 @@ class WebSearchTool(BaseTool):
     
     def _run(self, query: str) -> str:
         logger.info(f"Executing web_search_tool with query: '{query}'")
-        # Access config via settings object
-        if not settings.tavily_api_key:
-            logger.warning("TAVILY_API_KEY not set. Using mocked search results.")
-            # ... (mock logic) ...
-            if "capital of france" in query.lower(): return "The capital of France is Paris."
-            return f"Mocked search results for: {query}. (TAVILY_API_KEY not set)"
         try:
-            # Import locally to avoid dependency error if Tavily isn't installed/used
-            from tavily import TavilyClient
-            tavily = TavilyClient(api_key=settings.tavily_api_key) # Use settings
-            response = tavily.search(query=query, search_depth="basic", max_results=3)
-            results = json.dumps([{"url": res["url"], "content": res["content"]} for res in response.get("results", [])])
+            results = json.dumps(get_search_client().search_sync(query))
+            logger.info(f"Web search successful.")
+            return results
+        except ImportError:
+            logger.error("Tavily client library not found. Please install tavily-python.")
+            return "Error: Tavily client library not installed."
+        except Exception as e:
+            logger.error(f"Error during web search: {e}", exc_info=True)
+            return f"Error during web search: {str(e)}"
+
+    async def _arun(self, query: str) -> str:
+        logger.info(f"Executing web_search_tool (async) with query: '{query}'")
+        try:
+            # Shared client: cached, deduplicated across concurrent requests and time-bounded
+            results = json.dumps(await get_search_client().search(query))
             logger.info(f"Web search successful.")
             return results
         except ImportError:
             logger.error("Tavily client library not found. Please install tavily-python.")
             return "Error: Tavily client library not installed."
         except Exception as e:
-            logger.error(f"Error during Tavily search: {e}", exc_info=True)
-            return f"Error during Tavily search: {str(e)}"
+            logger.error(f"Error during web search: {e}", exc_info=True)
+            return f"Error during web search: {str(e)}"
+
+class KnowledgeSearchTool(BaseTool):
+    name: str = "knowledge_search"
+    description: str = "Searches the local knowledge base first and falls back to a web search when it holds nothing relevant. Prefer it over web_search for factual lookups."
+    args_schema: Type[BaseModel] = KnowledgeSearchInput
+
+    @staticmethod
+    def _local_hits(query: str) -> list:
+        index = get_knowledge_index()
+        hits = index.search(query, settings.knowledge_max_results) if index is not None else []
+        return [hit for hit in hits if hit["score"] >= settings.knowledge_min_score]
+
+    def _miss(self, query: str) -> str:
+        KNOWLEDGE_SEARCHES.inc("miss")
+        return f"No relevant documents in the local knowledge base for '{query}'."
+
+    def _run(self, query: str) -> str:
+        logger.info(f"Executing knowledge_search_tool with query: '{query}'")
+        try:
+            hits = self._local_hits(query)
+            if hits:
+                KNOWLEDGE_SEARCHES.inc("local")
+                return json.dumps(hits)
+            if not settings.knowledge_web_fallback:
+                return self._miss(query)
+            KNOWLEDGE_SEARCHES.inc("web")
+            return json.dumps(get_search_client().search_sync(query))
+        except Exception as e:
+            logger.error(f"Error during knowledge search: {e}", exc_info=True)
+            return f"Error during knowledge search: {str(e)}"
+
+    async def _arun(self, query: str) -> str:
+        logger.info(f"Executing knowledge_search_tool (async) with query: '{query}'")
+        try:
+            # Page faults on a cold index block, so the lookup runs off the event loop
+            hits = await asyncio.to_thread(self._local_hits, query)
+            if hits:
+                KNOWLEDGE_SEARCHES.inc("local")
+                return json.dumps(hits)
+            if not settings.knowledge_web_fallback:
+                return self._miss(query)
+            KNOWLEDGE_SEARCHES.inc("web")
+            return json.dumps(await get_search_client().search(query))
+        except Exception as e:
+            logger.error(f"Error during knowledge search: {e}", exc_info=True)
+            return f"Error during knowledge search: {str(e)}"
 
 class CodeExecutionTool(BaseTool):
     name: str = "code_execution"
-    description: str = "Executes a given snippet of Python code, useful for calculations or simple data manipulations."
+    description: str = "Executes a given snippet of Python code, useful for calculations or simple data manipulations. Use print() to output results; a single expression returns its value."
     args_schema: Type[BaseModel] = CodeExecutionInput
     
     def _run(self, code: str) -> str:
-        logger.info(f"Executing code_execution_tool.")
+        logger.info(f"Executing code_execution_tool (one-off sandbox process).")
         logger.warning("SECURITY WARNING: Using simplified sandbox. Use proper sandboxing in production.")
-        resolved_code = code.strip()
-        try:
-            if resolved_code.startswith("print("):
-                try:
-                    inner_content_str = resolved_code[len("print("):-1]
-                    if (inner_content_str.startswith("'") and inner_content_str.endswith("'")) or \
-                       (inner_content_str.startswith('"') and inner_content_str.endswith('"')):
-                        result = inner_content_str[1:-1]
-                    else:
-                        result = str(eval(inner_content_str, {"__builtins__": {}}, {}))
-                    logger.info(f"Code execution (print) successful.")
-                    return result
-                except Exception as e_print:
-                    logger.error(f"Error evaluating print content: {e_print}", exc_info=True)
-                    return f"Error evaluating print content: {str(e_print)}"
-            else:
-                result = str(eval(resolved_code, {"__builtins__": {}}, {}))
-                logger.info(f"Code execution (eval) successful.")
-                return f"Execution Result: {result}"
-        except Exception as e:
-            logger.error(f"Error executing code: {e}", exc_info=True)
-            return f"Error executing code: {str(e)}."
+        result = run_isolated_sync(code.strip())
+        if not result.ok:
+            logger.error(f"Error executing code: {result.error}")
+        return result.to_text()
+
+    async def _arun(self, code: str) -> str:
+        logger.info(f"Executing code_execution_tool (sandbox pool).")
+        logger.warning("SECURITY WARNING: Using simplified sandbox. Use proper sandboxing in production.")
+        # Runs in a prewarmed worker process with timeouts and rlimits, never in the API process
+        result = await get_sandbox_pool().run(code.strip())
+        if result.ok:
+            logger.info(f"Code execution successful in {result.elapsed:.3f}s.")
+        else:
+            logger.error(f"Error executing code: {result.error}")
+        return result.to_text()
 
 # Create tool instances
 web_search_tool = WebSearchTool()
+knowledge_search_tool = KnowledgeSearchTool()
 code_execution_tool = CodeExecutionTool()
 
-# List of available tools
+# List of available tools; knowledge_search only when a local index is configured
 TOOLS = [web_search_tool, code_execution_tool]
+if settings.knowledge_index_path:
+    TOOLS.insert(0, knowledge_search_tool)
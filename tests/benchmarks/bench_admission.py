@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Admission control benchmark.
+
+Points the agent at a slow stub LLM with a small scheduler (in-flight and queue
+limits), then bursts more /invoke requests than it can hold. Reports how many
+were served or rejected, how quickly rejections came back with Retry-After, and
+that queued interactive requests overtake queued batch-priority ones.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import free_port, start_in_thread, wait_until_ready
+
+NO_STORE = {"Cache-Control": "no-store"}
+
+
+async def run(burst: int) -> None:
+    import httpx
+    from app.main import app
+    from app.scheduler import get_request_scheduler
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await wait_until_ready(client)
+
+            async def invoke(i: int, priority: str = "interactive"):
+                start = time.perf_counter()
+                response = await client.post("/invoke", json={"question": f"Burst question {i}"},
+                                             headers={**NO_STORE, "X-Priority": priority})
+                return response.status_code, time.perf_counter() - start, response.headers.get("Retry-After"), i
+
+            results = await asyncio.gather(*(invoke(i) for i in range(burst)))
+            statuses = Counter(status for status, *_ in results)
+            rejected = [elapsed for status, elapsed, *_ in results if status in (429, 503)]
+            served = [elapsed for status, elapsed, *_ in results if status == 200]
+            print(f"Burst of {burst}: {dict(statuses)}")
+            if served:
+                print(f"  served   mean latency {sum(served) / len(served) * 1000:8.1f}ms")
+            if rejected:
+                retry_after = {r for status, _, r, _ in results if status in (429, 503)}
+                print(f"  rejected mean latency {sum(rejected) / len(rejected) * 1000:8.1f}ms  Retry-After: {sorted(retry_after)}")
+
+            # Fill the slots, queue batch requests first, then interactive ones: interactive must finish first
+            scheduler = get_request_scheduler()
+            finish_order = []
+
+            async def tracked(i: int, priority: str):
+                status, *_ = await invoke(1000 + i, priority)
+                finish_order.append((priority, status))
+
+            blockers = [asyncio.create_task(tracked(i, "interactive")) for i in range(scheduler.max_in_flight)]
+            await asyncio.sleep(0.05)
+            queued = [asyncio.create_task(tracked(100 + i, "batch")) for i in range(2)]
+            await asyncio.sleep(0.05)
+            queued += [asyncio.create_task(tracked(200 + i, "interactive")) for i in range(2)]
+            await asyncio.gather(*blockers, *queued)
+            print(f"Completion order after the blockers: {[p for p, _ in finish_order[len(blockers):]]}")
+            print(f"Scheduler stats: {scheduler.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst /invoke past the admission limits against a slow stub LLM")
+    parser.add_argument("--burst", "-n", type=int, default=40, help="Concurrent requests in the burst")
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub LLM latency in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="SCHEDULER_MAX_IN_FLIGHT for the run")
+    parser.add_argument("--max-queue", type=int, default=8, help="SCHEDULER_MAX_QUEUE for the run")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    port = free_port()
+    os.environ["LLM_PROVIDER"] = "ollama"
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OLLAMA_MODEL_NAME"] = "stub"
+    os.environ["SCHEDULER_MAX_IN_FLIGHT"] = str(args.max_in_flight)
+    os.environ["SCHEDULER_MAX_QUEUE"] = str(args.max_queue)
+    # Import the app before the server thread starts so the two never race on module imports
+    import app.main  # noqa: F401
+    start_in_thread(latency=args.latency, port=port)
+    asyncio.run(run(args.burst))
+
+
+if __name__ == "__main__":
+    main()
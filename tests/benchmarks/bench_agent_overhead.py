@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Per-iteration overhead microbenchmark for the agent node.
+
+The LLM is replaced by an instant in-process fake, so the numbers are the cost
+of the graph, prompt formatting, answer parsing and bookkeeping alone. It also
+times rebuilding the prompt and chain per call (the old behaviour) for contrast.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from fakes import DEFAULT_RESPONSE, FakeToolChatModel
+
+
+def _report(name: str, samples) -> None:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<32} median {median(samples) * 1e6:8.1f}us   p99 {p99 * 1e6:8.1f}us")
+
+
+async def run(iterations: int) -> None:
+    from langchain_core.messages import HumanMessage
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from app.agent import AGENT_SYSTEM_PROMPT, AgentState, GaiaAnswerParser, build_agent_chain, get_compiled_agent
+
+    llm = FakeToolChatModel(responses=[DEFAULT_RESPONSE])
+    graph = get_compiled_agent(llm=llm, checkpointer_backend="none")
+    chain = build_agent_chain(llm)
+    parser = GaiaAnswerParser()
+    question = "What is the capital of France?"
+
+    async def graph_iteration():
+        state = AgentState(messages=[HumanMessage(content=question)], current_gaia_question=question)
+        await graph.ainvoke(state)
+
+    async def prebuilt_pipeline():
+        parser.parse((await chain.ainvoke({"messages": [HumanMessage(content=question)]})).text)
+
+    async def rebuilt_pipeline():
+        prompt = ChatPromptTemplate.from_messages([("system", AGENT_SYSTEM_PROMPT), MessagesPlaceholder("messages")])
+        rebuilt = prompt | llm.bind_tools([])
+        GaiaAnswerParser().parse((await rebuilt.ainvoke({"messages": [HumanMessage(content=question)]})).text)
+
+    for name, fn in [("graph invocation", graph_iteration),
+                     ("prebuilt pipeline + parse", prebuilt_pipeline),
+                     ("rebuilt-per-call pipeline", rebuilt_pipeline)]:
+        for _ in range(min(100, iterations)):  # Warm-up
+            await fn()
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await fn()
+            samples.append(time.perf_counter() - start)
+        _report(name, samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure agent per-iteration overhead with the LLM stubbed out")
+    parser.add_argument("--iterations", "-n", type=int, default=2000, help="Timed iterations per scenario")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
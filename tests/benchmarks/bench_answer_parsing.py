@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Cost of turning a model reply into a GaiaAnswer.
+
+Times, per answer of `--words` words:
+
+* the structured fast path: validating GaiaAnswer tool-call arguments;
+* a JSON text reply (fenced) through GaiaAnswerParser;
+* a prose reply with "Reasoning:"/"Source:" lines through GaiaAnswerParser (regex scan);
+* incremental extraction of `answer` from the GaiaAnswer call streamed in word-sized
+  argument fragments (AnswerStreamParser), for the whole stream.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def _time(fn, iterations: int):
+    for _ in range(min(100, iterations)):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GaiaAnswer parsing paths")
+    parser.add_argument("--words", type=int, default=200, help="Words in the answer")
+    parser.add_argument("--iterations", "-n", type=int, default=2000, help="Timed iterations per path")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    from langchain_core.messages import AIMessageChunk
+    from app.agent import ANSWER_TOOL, AnswerStreamParser, GaiaAnswerParser, parse_structured_answer
+    from app.stub import TOKEN_PATTERN
+
+    answer = " ".join(f"word{i}" for i in range(args.words))
+    fields = {"answer": answer, "reasoning": "Because the sources say so.", "sources": ["https://example.com/a", "https://example.com/b"]}
+    json_reply = f"```json\n{json.dumps(fields)}\n```"
+    prose_reply = f"{answer}\n\nReasoning: {fields['reasoning']}\n\n" + "\n".join(f"Source: {url}" for url in fields["sources"])
+    fragments = TOKEN_PATTERN.findall(json.dumps(fields))
+    chunks = [AIMessageChunk(content="", id="run-1", tool_call_chunks=[{"name": None if i else ANSWER_TOOL, "args": fragment, "id": None, "index": 0}])
+              for i, fragment in enumerate(fragments)]
+    text_parser = GaiaAnswerParser()
+
+    def stream():
+        stream_parser = AnswerStreamParser()
+        streamed = "".join(stream_parser.feed(chunk) for chunk in chunks)
+        assert streamed == answer
+
+    print(f"Answer of {args.words} words ({len(json.dumps(fields))} JSON chars, {len(chunks)} stream fragments)")
+    for name, fn in [("tool-call arguments", lambda: parse_structured_answer(fields)),
+                     ("JSON text reply", lambda: text_parser.parse(json_reply)),
+                     ("prose reply (regex)", lambda: text_parser.parse(prose_reply)),
+                     ("streamed tool call (whole)", stream)]:
+        print(f"{name:<28} median {_time(fn, args.iterations) * 1e6:9.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Batch endpoint benchmark.
+
+Sends the same question set (with duplicates) once as a serial loop of /invoke
+calls and once as a single /invoke/batch request against a stub LLM with fixed
+latency, reporting wall time and how many LLM calls each approach made.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import create_app, free_port, serve_in_thread, wait_until_ready
+
+NO_STORE = {"Cache-Control": "no-store"}  # Measure the agent, not the answer cache
+
+
+async def run(stub, questions, concurrency: int) -> None:
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await wait_until_ready(client)
+            calls_before, start = stub.state.requests, time.perf_counter()
+            for question in questions:
+                (await client.post("/invoke", json={"question": question}, headers=NO_STORE)).raise_for_status()
+            print(f"serial /invoke loop   {time.perf_counter() - start:7.2f}s  LLM calls: {stub.state.requests - calls_before}")
+
+            calls_before, start = stub.state.requests, time.perf_counter()
+            response = await client.post("/invoke/batch", headers=NO_STORE, json={
+                "questions": [{"question": q} for q in questions], "max_concurrency": concurrency})
+            response.raise_for_status()
+            body = response.json()
+            assert [item["index"] for item in body["results"]] == list(range(len(questions))), "results out of order"
+            print(f"/invoke/batch (c={concurrency:<2}) {time.perf_counter() - start:7.2f}s  LLM calls: {stub.state.requests - calls_before}"
+                  f"  unique: {body['unique_questions']}  errors: {body['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a serial /invoke loop with one /invoke/batch request")
+    parser.add_argument("--questions", "-n", type=int, default=24, help="Questions in the set")
+    parser.add_argument("--duplicate-every", type=int, default=4, help="Every k-th question repeats an earlier one")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="max_concurrency for the batch")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    port = free_port()
+    os.environ["LLM_PROVIDER"] = "ollama"
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OLLAMA_MODEL_NAME"] = "stub"
+    os.environ.setdefault("BATCH_MAX_CONCURRENCY", str(args.concurrency))
+    # Import the app before the server thread starts so the two never race on module imports
+    import app.main  # noqa: F401
+    stub = create_app(args.latency)
+    serve_in_thread(stub, port)
+    questions = [f"Question {i // args.duplicate_every if i % args.duplicate_every == 0 and i else i}" for i in range(args.questions)]
+    asyncio.run(run(stub, questions, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Iterations, tokens and latency per question with and without early stopping.
+
+The stub LLM follows a "wandering" script: it repeats the same web search `--repeats`
+times before answering, like a model that keeps re-checking what it already found.
+Sends `--requests` questions through /invoke (in process, answer cache bypassed) with
+EARLY_STOPPING off and on, and reports the mean spend from the X-Agent-Budget header
+and how the runs stopped.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def _parse_budget(header: str):
+    fields = dict(part.split("=", 1) for part in header.split(", "))
+    return {key: value.split("/")[0] for key, value in fields.items()}
+
+
+async def run_setup(early_stopping: bool, requests: int):
+    import httpx
+    from app.config import settings
+    from app.main import app
+
+    settings.early_stopping = early_stopping
+    spent, stops, latencies = [], Counter(), []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for i in range(requests):
+                start = time.perf_counter()
+                response = await client.post("/invoke", json={"question": f"Question {i}: what is the capital of country number {i}?"},
+                                             headers={"Cache-Control": "no-store"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                budget = _parse_budget(response.headers["X-Agent-Budget"])
+                spent.append((int(budget["iterations"]), int(budget["tokens"]), int(budget["tool_calls"])))
+                stops[budget["stop"]] += 1
+    mean = lambda values: sum(values) / len(values)
+    return [mean([s[i] for s in spent]) for i in range(3)], mean(latencies), stops
+
+
+async def run(args) -> None:
+    print(f"{args.requests} requests, wandering script with {args.repeats} repeated searches, stub latency {args.latency}s")
+    print(f"{'early stopping':>14} {'iterations':>11} {'tokens':>8} {'tool calls':>11} {'mean':>9}  stops")
+    for early_stopping in (False, True):
+        (iterations, tokens, tool_calls), latency, stops = await run_setup(early_stopping, args.requests)
+        print(f"{'on' if early_stopping else 'off':>14} {iterations:>11.1f} {tokens:>8.0f} {tool_calls:>11.1f} "
+              f"{latency * 1000:>7.1f}ms  {dict(stops)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-question spend with and without early stopping")
+    parser.add_argument("--requests", "-n", type=int, default=50, help="Requests per setup")
+    parser.add_argument("--repeats", type=int, default=4, help="Times the scripted model repeats its search before answering")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub LLM time to first token in seconds")
+    args = parser.parse_args()
+
+    search = {"tool_calls": [{"name": "web_search", "args": {"query": "{question}"}}]}
+    answer = {"tool_calls": [{"name": "GaiaAnswer", "args": {"answer": "Paris.", "reasoning": "Found it.", "sources": []}}]}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as script:
+        json.dump([search] * (args.repeats + 1) + [answer], script)
+
+    logging.disable(logging.WARNING)
+    os.environ.update({"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_SCRIPT_PATH": script.name,
+                       "STUB_LATENCY": str(args.latency), "STUB_SEARCH_LATENCY": "0.01", "MAX_AGENT_ITERATIONS": "10",
+                       "LITELLM_LOCAL_MODEL_COST_MAP": "True", "STARTUP_BACKGROUND_WARMUP": "false"})
+    try:
+        asyncio.run(run(args))
+    finally:
+        os.unlink(script.name)
+
+
+if __name__ == "__main__":
+    main()
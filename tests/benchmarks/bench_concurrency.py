@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the /invoke endpoint.
+
+Starts a stub OpenAI-compatible server with a fixed latency, points the agent at
+it and fires N concurrent /invoke requests. With a non-blocking agent the batch
+should finish in roughly one LLM latency; a blocking agent needs about N of them.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import free_port, start_in_thread, wait_until_ready
+
+
+async def run(concurrency: int, latency: float) -> None:
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await wait_until_ready(client)
+
+            async def invoke(i: int) -> float:
+                start = time.perf_counter()
+                response = await client.post("/invoke", json={"question": f"Question {i}: what is the capital of France?"})
+                response.raise_for_status()
+                return time.perf_counter() - start
+
+            async def health() -> float:
+                await asyncio.sleep(latency / 4)  # Let the invocations get in flight first
+                start = time.perf_counter()
+                (await client.get("/health")).raise_for_status()
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            health_task = asyncio.create_task(health())
+            latencies = await asyncio.gather(*(invoke(i) for i in range(concurrency)))
+            wall = time.perf_counter() - start
+            health_latency = await health_task
+
+    print(f"Concurrent requests:   {concurrency}")
+    print(f"Stub LLM latency:      {latency:.3f}s")
+    print(f"Wall time:             {wall:.3f}s ({wall / latency:.2f}x LLM latency)")
+    print(f"Mean request latency:  {sum(latencies) / len(latencies):.3f}s")
+    print(f"/health during load:   {health_latency * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent /invoke calls against a stub LLM")
+    parser.add_argument("--concurrency", "-n", type=int, default=20, help="Number of concurrent requests")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # Per-request agent logs would drown the report
+    port = free_port()
+    os.environ["LLM_PROVIDER"] = "ollama"
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OLLAMA_MODEL_NAME"] = "stub"
+    # Import the app before the server thread starts so the two never race on module imports
+    import app.main  # noqa: F401
+    start_in_thread(latency=args.latency, port=port)
+    asyncio.run(run(args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tail latency of /invoke under a degraded provider, with and without request deadlines.
+
+The stub LLM and search sample heavy-tailed latencies (lognormal by default), like a
+provider with occasional very slow calls. Sends `--requests` distinct questions
+(bounded concurrency, in process, answer cache bypassed) once without a deadline and
+once per `--deadlines` value, and reports p50/p95/p99/max latency and how many answers
+were complete, forced early from the deadline's reserve, or assembled from partial results.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from load_test import percentile
+
+
+async def run_deadline(deadline, args):
+    import httpx
+    from app.config import settings
+    from app.main import app
+
+    settings.request_deadline_seconds = deadline
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, outcomes = [], {"complete": 0, "forced_answer": 0, "partial": 0}
+
+    async def one(client, i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/invoke", json={"question": f"Question {i}: what is the capital of country number {i}?"},
+                                         headers={"Cache-Control": "no-store"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            outcomes[response.headers.get("X-Deadline-Exceeded", "complete")] += 1
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            await asyncio.gather(*(one(client, i) for i in range(args.requests)))
+    return sorted(latencies), outcomes
+
+
+async def run(args) -> None:
+    print(f"{args.requests} requests, concurrency {args.concurrency}, LLM latency {args.latency}, search latency {args.search_latency}")
+    print(f"{'deadline':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'complete':>9} {'forced':>7} {'partial':>8}")
+    for deadline in [None, *args.deadlines]:
+        latencies, outcomes = await run_deadline(deadline, args)
+        ms = lambda q: f"{percentile(latencies, q) * 1000:7.0f}ms"
+        label = "none" if deadline is None else f"{deadline:g}s"
+        print(f"{label:>9} {ms(50)} {ms(95)} {ms(99)} {latencies[-1] * 1000:7.0f}ms "
+              f"{outcomes['complete']:>9} {outcomes['forced_answer']:>7} {outcomes['partial']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /invoke tail latency with request deadlines")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Requests per setup")
+    parser.add_argument("--concurrency", "-c", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--latency", default="lognormal:0.1,1.0", help="Stub LLM latency (STUB_LATENCY format)")
+    parser.add_argument("--search-latency", default="lognormal:0.05,1.0", help="Stub search latency (STUB_LATENCY format)")
+    parser.add_argument("--deadlines", type=float, nargs="+", default=[1.0, 2.0], help="Deadlines to compare, in seconds")
+    parser.add_argument("--reserve", type=float, default=0.5, help="REQUEST_DEADLINE_ANSWER_RESERVE_SECONDS")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    os.environ.update({"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_LATENCY": args.latency,
+                       "STUB_SEARCH_LATENCY": args.search_latency, "SEARCH_TIMEOUT_SECONDS": "60",
+                       "REQUEST_DEADLINE_ANSWER_RESERVE_SECONDS": str(args.reserve),
+                       "LITELLM_LOCAL_MODEL_COST_MAP": "True", "STARTUP_BACKGROUND_WARMUP": "false"})
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
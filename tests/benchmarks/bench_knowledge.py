@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Knowledge index at scale: build time, size, query latency and RSS.
+
+Builds an index of `--docs` synthetic documents (Zipf-distributed words from a seeded
+vocabulary, 30-80 words each) with the same code as `python -m app.knowledge add`, or
+reuses `--index` if it already holds one. Then, in a fresh process so the build doesn't
+inflate the numbers, opens the index and runs `--queries` searches: three words drawn
+from a random indexed document, plus `--miss-ratio` of queries of random vocabulary
+words. Reports p50/p95/p99 latency, how many queries scored above KNOWLEDGE_MIN_SCORE
+(answered locally rather than by a web search) and RSS split into private (anon) and
+file-backed pages, which the OS shares between worker processes mapping the same index.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from load_test import percentile
+
+SYLLABLES = "ba be bi bo bu ka ke ki ko ku la le li lo lu ma me mi mo mu na ne ni no nu ra re ri ro ru sa se si so su ta te ti to tu".split()
+
+
+def vocabulary(size: int):
+    rng = random.Random(0)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def document_words(i: int, words, weights):
+    rng = random.Random(i)
+    return rng.choices(words, cum_weights=weights, k=rng.randint(30, 80))
+
+
+def synthetic_documents(count: int, words, weights):
+    for i in range(count):
+        text = document_words(i, words, weights)
+        yield {"url": f"kb://synthetic/{i}", "title": " ".join(text[:3]), "content": " ".join(text)}
+
+
+def status_mb() -> dict:
+    """RSS fields of this process in MiB (Linux)."""
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+
+def measure(args) -> None:
+    """Runs in the fresh process: open the index, query it, print one JSON line."""
+    from app.config import settings
+    from app.knowledge import KnowledgeIndex
+
+    words, weights = vocabulary(args.vocabulary)
+    rng = random.Random(1)
+    documents = int(args.measure_documents)
+    queries = []
+    for _ in range(args.queries):
+        if rng.random() < args.miss_ratio:
+            queries.append(" ".join(rng.sample(words, 3)))
+        else:
+            queries.append(" ".join(rng.sample(sorted(set(document_words(rng.randrange(documents), words, weights))), 3)))
+
+    before = status_mb()
+    index = KnowledgeIndex(args.index, settings.knowledge_max_postings)
+    index.refresh()
+    opened = status_mb()
+    latencies, local = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, settings.knowledge_max_results)
+        latencies.append(time.perf_counter() - start)
+        local += bool(hits) and hits[0]["score"] >= settings.knowledge_min_score
+    print(json.dumps({"before": before, "opened": opened, "after": status_mb(), "latencies": sorted(latencies),
+                      "local": local, "min_score": settings.knowledge_min_score}))
+
+
+def run(args) -> None:
+    from app.knowledge import KnowledgeIndex
+
+    index = KnowledgeIndex(args.index)
+    stats = index.stats()
+    if stats["documents"] < args.docs:
+        words, weights = vocabulary(args.vocabulary)
+        print(f"Building an index of {args.docs} documents in {args.index} ...")
+        start = time.perf_counter()
+        index.add_documents(synthetic_documents(args.docs, words, weights), args.segment_documents, rebuild=True)
+        elapsed = time.perf_counter() - start
+        stats = index.stats()
+        print(f"built in {elapsed:.1f}s ({stats['documents'] / elapsed:,.0f} docs/s)")
+    print(f"{stats['documents']:,} documents, {stats['segments']} segments, {stats['terms']:,} segment terms, "
+          f"{stats['bytes'] / 2 ** 20:,.0f} MiB on disk")
+
+    command = [sys.executable, __file__, "--index", args.index, "--measure-documents", str(stats["documents"]),
+               "--queries", str(args.queries), "--miss-ratio", str(args.miss_ratio), "--vocabulary", str(args.vocabulary)]
+    result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+    latencies = result["latencies"]
+    ms = lambda q: f"{percentile(latencies, q) * 1000:.2f}ms"
+    print(f"{args.queries} queries: p50 {ms(50)}  p95 {ms(95)}  p99 {ms(99)}  max {latencies[-1] * 1000:.2f}ms")
+    print(f"answered locally (score >= {result['min_score']}): {result['local']}/{args.queries}; the rest fall back to the web")
+    print(f"{'RSS MiB':>16} {'total':>8} {'anon':>8} {'file':>8}")
+    for stage in ("before", "opened", "after"):
+        rss = result[stage]
+        label = {"before": "before open", "opened": "after open", "after": "after queries"}[stage]
+        print(f"{label:>16} {rss['VmRSS']:>8.1f} {rss['RssAnon']:>8.1f} {rss['RssFile']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure knowledge index build, query latency and RSS")
+    parser.add_argument("--docs", type=int, default=1_000_000, help="Documents to index")
+    parser.add_argument("--index", help="Index directory to build or reuse (default: a temporary one)")
+    parser.add_argument("--queries", "-n", type=int, default=1000, help="Queries to time")
+    parser.add_argument("--miss-ratio", type=float, default=0.2, help="Share of queries made of unrelated words")
+    parser.add_argument("--vocabulary", type=int, default=100_000, help="Distinct words in the synthetic corpus")
+    parser.add_argument("--segment-documents", type=int, default=100_000, help="Documents per segment")
+    parser.add_argument("--measure-documents", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    if args.measure_documents:
+        measure(args)
+    elif args.index:
+        run(args)
+    else:
+        with tempfile.TemporaryDirectory() as scratch:
+            args.index = scratch
+            run(args)
+
+
+if __name__ == "__main__":
+    main()
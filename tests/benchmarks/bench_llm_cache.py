@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Model-call cache: latency and tokens saved on repeated agent steps.
+
+Sends `--requests` questions drawn from `--distinct` different ones through /invoke
+(stub provider at temperature 0, in process) with `Cache-Control: no-store`, so the
+answer cache is bypassed and every request runs the graph. Runs once without the
+model-call cache and once per enabled tier, and reports mean latency, the cache hit
+ratio and the LLM tokens sent vs. saved.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+async def run_backend(backend: str, questions, path: str):
+    import httpx
+    from app.config import settings
+    from app.main import app
+    from app.metrics import LLM_TOKENS
+
+    settings.llm_cache_backend = backend
+    settings.llm_cache_path = path
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            before = LLM_TOKENS.value("stub", "input") + LLM_TOKENS.value("stub", "output")
+            latencies = []
+            for question in questions:
+                start = time.perf_counter()
+                response = await client.post("/invoke", json={"question": question}, headers={"Cache-Control": "no-store"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            sent = LLM_TOKENS.value("stub", "input") + LLM_TOKENS.value("stub", "output") - before
+            stats = (await client.get("/health")).json()["llm_cache"] or {}
+    saved = stats.get("saved_input_tokens", 0) + stats.get("saved_output_tokens", 0)
+    return sum(latencies) / len(latencies), stats.get("hit_ratio", 0.0), sent, saved
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    pool = [f"Question {i}: what is the capital of country number {i}?" for i in range(args.distinct)]
+    questions = [rng.choice(pool) for _ in range(args.requests)]
+
+    print(f"{args.requests} requests over {args.distinct} distinct questions, stub latency {args.latency}s")
+    print(f"{'cache':>7} {'mean':>9} {'hit ratio':>10} {'tokens sent':>12} {'tokens saved':>13}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for backend in ("none", "memory", "sqlite"):
+            mean, hit_ratio, sent, saved = await run_backend(backend, questions, os.path.join(scratch, "llm_cache.sqlite3"))
+            print(f"{backend:>7} {mean * 1000:>7.1f}ms {hit_ratio:>10.1%} {sent:>12.0f} {saved:>13.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the model-call cache on repeated questions")
+    parser.add_argument("--requests", "-n", type=int, default=40, help="Requests to send")
+    parser.add_argument("--distinct", type=int, default=8, help="Distinct questions they are drawn from")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub LLM time to first token in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the question order")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    os.environ.update({"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_LATENCY": str(args.latency),
+                       "STUB_SEARCH_LATENCY": "0", "LLM_TEMPERATURE": "0", "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+                       # Each run recompiles the agent with its cache; don't serve requests before that
+                       "STARTUP_BACKGROUND_WARMUP": "false"})
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
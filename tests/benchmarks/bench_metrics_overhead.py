@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Overhead benchmark for the /metrics instrumentation.
+
+Times the metric primitives on their own, then a full graph invocation (LLM
+replaced by an instant fake) with metrics on and off, and fails if the
+instrumented run is slower than the uninstrumented one by more than the budget.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from fakes import DEFAULT_RESPONSE, FakeToolChatModel
+
+
+def _time(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+async def _atime(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+async def run(iterations: int, budget: float) -> int:
+    from langchain_core.messages import HumanMessage
+    from app.agent import AgentState, get_compiled_agent
+    from app.metrics import ERRORS, REGISTRY, TOOL_DURATION, render_metrics
+
+    print(f"{'counter inc':<32} median {_time(lambda: ERRORS.inc('bench'), iterations) * 1e9:8.0f}ns")
+    print(f"{'histogram observe':<32} median {_time(lambda: TOOL_DURATION.observe(0.1, 'bench'), iterations) * 1e9:8.0f}ns")
+
+    question = "What is the capital of France?"
+    REGISTRY.enabled = True
+    instrumented = get_compiled_agent(llm=FakeToolChatModel(responses=[DEFAULT_RESPONSE]), checkpointer_backend="none")
+    REGISTRY.enabled = False
+    plain = get_compiled_agent(llm=FakeToolChatModel(responses=[DEFAULT_RESPONSE]), checkpointer_backend="none")
+
+    def invocation(graph):
+        async def invoke():
+            await graph.ainvoke(AgentState(messages=[HumanMessage(content=question)], current_gaia_question=question))
+        return invoke
+
+    # Interleave rounds so drift (thermal, GC, other load) hits both variants equally
+    on, off = [], []
+    for _ in range(5):
+        REGISTRY.enabled = False
+        off.append(await _atime(invocation(plain), iterations // 5 or 1))
+        REGISTRY.enabled = True
+        on.append(await _atime(invocation(instrumented), iterations // 5 or 1))
+    on, off = median(on), median(off)
+    overhead = on / off - 1
+
+    start = time.perf_counter()
+    exposition = render_metrics()
+    render_time = time.perf_counter() - start
+
+    print(f"{'graph invocation, metrics off':<32} median {off * 1e6:8.1f}us")
+    print(f"{'graph invocation, metrics on':<32} median {on * 1e6:8.1f}us   overhead {overhead:+.1%}")
+    print(f"{'/metrics render':<32} {render_time * 1e6:8.1f}us   ({len(exposition.splitlines())} lines)")
+    if overhead > budget:
+        print(f"FAIL: instrumentation overhead {overhead:.1%} exceeds budget {budget:.1%}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of the metrics instrumentation")
+    parser.add_argument("--iterations", "-n", type=int, default=2000, help="Timed iterations per scenario")
+    parser.add_argument("--budget", type=float, default=0.05, help="Allowed relative slowdown of a graph invocation")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    sys.exit(asyncio.run(run(args.iterations, args.budget)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Prompt tokens and latency per question with and without observation compression.
+
+Runs the GAIA test questions through /invoke (in process, answer cache bypassed). The
+stub search returns `--result-words` words of seeded page text per result (query terms,
+filler and repeated site boilerplate) and the stub LLM adds `--prefill` seconds per
+prompt token, so longer prompts cost time as they would with a real provider. The
+scripted model searches twice in parallel, once more, then answers. Reports the prompt
+tokens sent to the model, observation tokens before and after compression, and mean
+latency, then times `ObservationCompressor.compress` itself on one round of results.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "gaia")))
+
+SCRIPT = [
+    {"tool_calls": [{"name": "web_search", "args": {"query": "{question}"}},
+                    {"name": "web_search", "args": {"query": "{question} background"}}]},
+    {"tool_calls": [{"name": "web_search", "args": {"query": "{question} sources"}}]},
+    {"tool_calls": [{"name": "GaiaAnswer", "args": {"answer": "Scripted answer.", "reasoning": "From the searches.", "sources": []}}]},
+]
+
+
+async def run_setup(compression: bool, questions):
+    import httpx
+    from app.config import settings
+    from app.main import app
+    from app.metrics import LLM_TOKENS, OBSERVATION_TOKENS
+
+    settings.observation_compression = compression
+    latencies = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            before = LLM_TOKENS.value("stub", "input")
+            raw_before = OBSERVATION_TOKENS.value("web_search", "raw")
+            compressed_before = OBSERVATION_TOKENS.value("web_search", "compressed")
+            for question in questions:
+                start = time.perf_counter()
+                response = await client.post("/invoke", json={"question": question}, headers={"Cache-Control": "no-store"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            prompt = LLM_TOKENS.value("stub", "input") - before
+            raw = OBSERVATION_TOKENS.value("web_search", "raw") - raw_before
+            compressed = OBSERVATION_TOKENS.value("web_search", "compressed") - compressed_before
+    n = len(questions)
+    return prompt / n, raw / n, compressed / n, sum(latencies) / n
+
+
+def time_compress(args, question: str) -> float:
+    from langchain_core.messages import ToolMessage
+    from app.observations import ObservationCompressor
+    from app.search import StubSearchBackend
+
+    backend = StubSearchBackend(result_words=args.result_words)
+    queries = [question, f"{question} background"]
+    calls = [{"name": "web_search", "args": {"query": q}, "id": f"call_{i}"} for i, q in enumerate(queries)]
+    observations = [ToolMessage(content=json.dumps(backend._results(q, 3)), name="web_search", tool_call_id=c["id"])
+                    for q, c in zip(queries, calls)]
+    compressor = ObservationCompressor()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        compressor.compress(question, calls, observations)
+    return (time.perf_counter() - start) / args.repeat
+
+
+async def run(args) -> None:
+    from test_api import GAIA_TEST_QUESTIONS
+
+    questions = [q["question"] for q in GAIA_TEST_QUESTIONS][:args.questions]
+    print(f"{len(questions)} GAIA questions, {args.result_words} words per search result, "
+          f"stub latency {args.latency}s + {args.prefill * 1000:g}ms per prompt token")
+    print(f"{'compression':>11} {'prompt tokens':>14} {'observations':>13} {'compressed':>11} {'mean':>9}")
+    for compression in (False, True):
+        prompt, raw, compressed, latency = await run_setup(compression, questions)
+        observed = f"{raw:>13.0f} {compressed:>11.0f}" if compression else f"{'-':>13} {'-':>11}"
+        print(f"{'on' if compression else 'off':>11} {prompt:>14.0f} {observed} {latency * 1000:>7.1f}ms")
+    print(f"compress() on one round of 2 x 3 results: {time_compress(args, questions[0]) * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt tokens and latency with observation compression")
+    parser.add_argument("--questions", "-n", type=int, default=None, help="GAIA test questions to run (default: all)")
+    parser.add_argument("--result-words", type=int, default=400, help="Words of page text per stub search result")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM time to first token in seconds")
+    parser.add_argument("--prefill", type=float, default=0.00005, help="Stub LLM seconds per prompt token")
+    parser.add_argument("--repeat", type=int, default=200, help="Repetitions when timing compress()")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as script:
+        json.dump(SCRIPT, script)
+
+    logging.disable(logging.WARNING)
+    os.environ.update({"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_SCRIPT_PATH": script.name,
+                       "STUB_LATENCY": str(args.latency), "STUB_PREFILL_INTERVAL": str(args.prefill),
+                       "STUB_SEARCH_LATENCY": "0.01", "STUB_SEARCH_RESULT_WORDS": str(args.result_words),
+                       "LITELLM_LOCAL_MODEL_COST_MAP": "True", "STARTUP_BACKGROUND_WARMUP": "false"})
+    try:
+        asyncio.run(run(args))
+    finally:
+        os.unlink(script.name)
+
+
+if __name__ == "__main__":
+    main()
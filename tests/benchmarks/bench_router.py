@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tail latency of LLM calls through the provider router, with and without hedging.
+
+Two stub backends share a heavy-tailed latency distribution (lognormal by default)
+but sample it independently (different seeds), like two providers with occasional
+slow calls. Sends `--calls` calls (bounded concurrency) directly to:
+
+* one backend alone;
+* the router with failover only;
+* the router hedging after each backend's p95;
+* the same, streamed (`astream`, as /invoke/stream calls the model), where the losing
+  backend's stream is cancelled and closed once the winner's first chunk arrives;
+
+and reports p50/p95/p99 latency plus how many calls were hedged. A third, failing
+backend can be added with `--failing` to show failover and the breaker at work.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from load_test import percentile
+
+
+async def measure(llm, calls: int, concurrency: int, tag: str, stream: bool = False):
+    from langchain_core.messages import HumanMessage
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                messages = [HumanMessage(content=f"{tag} question {i}")]
+                if stream:
+                    async for _ in llm.astream(messages):
+                        pass
+                else:
+                    await llm.ainvoke(messages)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return sorted(latencies), errors
+
+
+async def run(args) -> None:
+    from app.router import BackendRouter, RouterChatModel
+    from app.stub import LatencyDistribution, StubChatModel
+
+    class FailingChatModel(StubChatModel):
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(0.01)
+            raise ConnectionError("backend unavailable")
+
+    latency = LatencyDistribution.parse(args.latency)
+    backends = {"stub-a": StubChatModel(model_name="stub-a", latency=latency, seed=1),
+                "stub-b": StubChatModel(model_name="stub-b", latency=latency, seed=2)}
+    if args.failing:
+        backends = {"failing": FailingChatModel(model_name="failing"), **backends}
+
+    def router(hedge: bool) -> RouterChatModel:
+        routing = BackendRouter({name: 0.0 for name in backends}, hedge=hedge, hedge_delay=args.hedge_delay)
+        return RouterChatModel(backends=backends, router=routing)
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, backend latency {latency!r}")
+    print(f"{'setup':<18} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7} {'hedged':>7}")
+    setups = [("single backend", backends["stub-a"], False), ("router", router(False), False),
+              ("router + hedging", router(True), False), ("  streamed", router(True), True)]
+    for label, llm, stream in setups:
+        latencies, errors = await measure(llm, args.calls, args.concurrency, label, stream)
+        stats = llm.router.stats()["backends"] if isinstance(llm, RouterChatModel) else {}
+        hedged = sum(b["hedges"] for b in stats.values())
+        ms = lambda q: f"{percentile(latencies, q) * 1000:7.1f}ms" if latencies else "      n/a"
+        print(f"{label:<18} {ms(50)} {ms(95)} {ms(99)} {errors:>7} {hedged:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure LLM call tail latency through the provider router")
+    parser.add_argument("--calls", "-n", type=int, default=400, help="Calls per setup")
+    parser.add_argument("--concurrency", "-c", type=int, default=16, help="Calls in flight at once")
+    parser.add_argument("--latency", default="lognormal:0.1,0.8", help="Backend latency distribution (STUB_LATENCY format)")
+    parser.add_argument("--hedge-delay", type=float, default=0.5, help="Hedge delay before backends have enough samples")
+    parser.add_argument("--failing", action="store_true", help="Rank a backend that always fails first")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Code execution sandbox benchmark.
+
+Runs a stream of small snippets through the prewarmed SandboxPool for a fixed
+duration while a second task keeps submitting a runaway `while True: pass`.
+Reports executions/sec and latency percentiles of the well-behaved snippets, so
+the cost of killing and replacing runaway workers is visible in the tail.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(pool_size: int, concurrency: int, duration: float, timeout: float, runaway: bool) -> None:
+    from app.sandbox import SandboxPool
+
+    pool = SandboxPool(size=pool_size, timeout=timeout, cpu_seconds=max(1, int(timeout) * 2))
+    await pool.start()
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(i: int) -> None:
+        n = 0
+        while time.perf_counter() < deadline:
+            submitted = time.perf_counter()
+            result = await pool.run(f"print(sum(range({1000 + i + n})))")
+            assert result.ok, result.error
+            latencies.append(time.perf_counter() - submitted)  # Includes waiting for a free worker
+            n += 1
+
+    async def runaway_client() -> None:
+        while time.perf_counter() < deadline:
+            await pool.run("while True: pass")
+
+    start = time.perf_counter()
+    tasks = [client(i) for i in range(concurrency)] + ([runaway_client()] if runaway else [])
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+    stats = pool.stats()
+    await pool.close()
+
+    print(f"Pool size {pool_size}, {concurrency} clients, runaway snippet: {'yes' if runaway else 'no'}")
+    print(f"Executions:     {len(latencies)} in {wall:.2f}s ({len(latencies) / wall:.0f}/s)")
+    print(f"Latency p50:    {_percentile(latencies, 50) * 1000:.2f}ms")
+    print(f"Latency p99:    {_percentile(latencies, 99) * 1000:.2f}ms")
+    print(f"Latency max:    {max(latencies) * 1000:.2f}ms")
+    print(f"Pool stats:     {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sandbox throughput and tail latency under a runaway snippet")
+    parser.add_argument("--pool-size", type=int, default=4, help="Number of sandbox workers")
+    parser.add_argument("--concurrency", "-n", type=int, default=3, help="Concurrent well-behaved clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Benchmark duration in seconds")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-execution wall-clock timeout")
+    parser.add_argument("--no-runaway", action="store_true", help="Do not submit the runaway snippet")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args.pool_size, args.concurrency, args.duration, args.timeout, not args.no_runaway))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Web search client benchmark.
+
+Drives the shared SearchClient with a mock backend of fixed latency: a burst of
+concurrent identical queries (single-flight), a repeat of the same burst (cache),
+and a burst of distinct queries. Reports wall time and how many calls actually
+reached the backend.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+async def run(concurrency: int, latency: float) -> None:
+    from app.search import MockSearchBackend, SearchClient
+
+    backend = MockSearchBackend(latency=latency)
+    client = SearchClient(backend, ttl_seconds=60, max_entries=1024, timeout=5)
+
+    async def burst(name, queries):
+        calls_before = backend.calls
+        start = time.perf_counter()
+        await asyncio.gather(*(client.search(q) for q in queries))
+        wall = time.perf_counter() - start
+        print(f"{name:<28} {len(queries):>4} queries  {wall * 1000:8.1f}ms  backend calls: {backend.calls - calls_before}")
+
+    same = ["What is the capital of France?"] * concurrency
+    await burst("identical, cold (coalesced)", same)
+    await burst("identical, warm (cached)", [q.upper() + "  " for q in same])
+    await burst("distinct, cold", [f"query number {i}" for i in range(concurrency)])
+    print(f"\nClient stats: {client.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cached, deduplicating search client")
+    parser.add_argument("--concurrency", "-n", type=int, default=50, help="Queries per burst")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock backend latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Prompt size over a long conversation session.
+
+Sends `--turns` follow-up questions in one session through /invoke (stub provider,
+in process) and reads the LLM input-token counter from /metrics' registry after
+every turn. With history trimming the prompt tokens per turn plateau at the budget;
+without it (`SESSION_HISTORY_MAX_TOKENS` unset) they grow with every turn.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import wait_until_ready
+
+
+async def run_session(client, turns: int):
+    from app.metrics import LLM_TOKENS
+
+    tokens, session_id = [], None
+    for turn in range(turns):
+        before = LLM_TOKENS.value("stub", "input")
+        body = {"question": f"Question {turn}: what is the capital of country number {turn}?"}
+        if session_id:
+            body["session_id"] = session_id
+        response = await client.post("/invoke", json=body)
+        response.raise_for_status()
+        session_id = response.headers["X-Session-Id"]
+        tokens.append(LLM_TOKENS.value("stub", "input") - before)
+    return tokens
+
+
+async def run(turns: int, budget: int, every: int) -> None:
+    import httpx
+    from app.config import settings
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            await wait_until_ready(client)
+            settings.session_history_max_tokens = None
+            untrimmed = await run_session(client, turns)
+            settings.session_history_max_tokens = budget
+            trimmed = await run_session(client, turns)
+
+    print(f"Prompt tokens per turn (stub whitespace tokens, all LLM calls of the turn), budget {budget}")
+    print(f"{'turn':>5} {'untrimmed':>10} {'trimmed':>8}")
+    for turn in range(0, turns, every):
+        print(f"{turn + 1:>5} {untrimmed[turn]:>10.0f} {trimmed[turn]:>8.0f}")
+    print(f"{turns:>5} {untrimmed[-1]:>10.0f} {trimmed[-1]:>8.0f}")
+    tail = trimmed[-every:]
+    print(f"Trimmed spread over the last {len(tail)} turns: {min(tail):.0f}-{max(tail):.0f} tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prompt tokens per turn over a long session")
+    parser.add_argument("--turns", "-n", type=int, default=60, help="Turns in the session")
+    parser.add_argument("--budget", type=int, default=500, help="SESSION_HISTORY_MAX_TOKENS for the trimmed run")
+    parser.add_argument("--every", type=int, default=10, help="Print every N-th turn")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    os.environ.update({"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_LATENCY": "0", "STUB_SEARCH_LATENCY": "0",
+                       "ANSWER_CACHE_BACKEND": "none", "CHECKPOINTER": "bounded"})
+    asyncio.run(run(args.turns, args.budget, args.every))
+
+
+if __name__ == "__main__":
+    main()
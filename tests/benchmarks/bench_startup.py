@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the API.
+
+Measures, each in a fresh interpreter so module caches don't help:
+
+1. `import app.main`;
+2. compiling the agent graph (`get_compiled_agent`) after that import;
+3. a real uvicorn server: time until `/health` answers (process up), until
+   `/ready` answers 200 (agent warm) and the latency of the first `/invoke`.
+
+The agent uses the in-process stub provider, so no network is needed.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from statistics import median
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import free_port
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+STUB_ENV = {"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_LATENCY": "0", "STUB_SEARCH_LATENCY": "0",
+            "LITELLM_LOCAL_MODEL_COST_MAP": "True"}
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+COMPILE_SNIPPET = ("import time, logging; logging.disable(logging.INFO); import app.agent as a; t = time.perf_counter(); "
+                   "a.get_compiled_agent(checkpointer_backend='none'); print(time.perf_counter() - t)")
+
+
+def _python(snippet: str) -> float:
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, env={**os.environ, **STUB_ENV},
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _server_start(timeout: float):
+    import httpx
+
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=ROOT, env={**os.environ, **STUB_ENV}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    up = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            while ready is None:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"server not ready after {timeout}s")
+                try:
+                    if up is None and client.get("/health").status_code == 200:
+                        up = time.perf_counter() - start
+                    if up is not None and client.get("/ready").status_code == 200:
+                        ready = time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+            first = time.perf_counter()
+            client.post("/invoke", json={"question": "What is the capital of France?"}).raise_for_status()
+            first = time.perf_counter() - first
+    finally:
+        server.terminate()
+        server.wait()
+    return up, ready, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import, graph compile and server cold-start times")
+    parser.add_argument("--runs", "-n", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server to become ready")
+    args = parser.parse_args()
+
+    imports = [_python(IMPORT_SNIPPET) for _ in range(args.runs)]
+    compiles = [_python(COMPILE_SNIPPET) for _ in range(args.runs)]
+    servers = [_server_start(args.timeout) for _ in range(args.runs)]
+
+    ms = lambda xs: f"median {median(xs) * 1000:8.1f}ms   max {max(xs) * 1000:8.1f}ms"
+    print(f"{'import app.main':<28} {ms(imports)}")
+    print(f"{'graph compile':<28} {ms(compiles)}")
+    print(f"{'server: /health up':<28} {ms([s[0] for s in servers])}")
+    print(f"{'server: /ready (agent warm)':<28} {ms([s[1] for s in servers])}")
+    print(f"{'server: first /invoke':<28} {ms([s[2] for s in servers])}")
+
+
+if __name__ == "__main__":
+    main()
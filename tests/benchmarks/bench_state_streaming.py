@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Per-step overhead of long agent runs, as seen by the API's stream consumer.
+
+A looping fake model requests one web search (mock backend, no latency, no cache) per
+turn for `--rounds` turns and then answers, each turn at constant cost, so what grows
+with the run is the agent's own bookkeeping. Each run is consumed two ways:
+
+  updates  what /invoke and /invoke/stream do: "updates" events (only what each node
+           added, appended to the state by reducers) accumulated in a RunLog
+  values   the previous graph and consumer: every step hands over the full accumulated
+           state, validated into the previous AgentState (no reducers, every message
+           checked) as its nodes received and returned it, streamed whole, every message
+           rescanned and the step log diffed against what was already sent
+
+Each step's event is serialised to JSON, as a stream would send it. Reports the mean cost
+per tool round over the whole run and over its last 10 rounds, and the size of the last
+event; both stay flat for `updates` and grow with the run for `values`.
+With a checkpointer (`--checkpointer bounded`) every step also serialises the state,
+which grows with the run whatever the consumer does.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, messages_to_dict
+from pydantic import BaseModel, Field
+
+from fakes import LoopingToolModel
+
+
+class PreviousAgentState(BaseModel):
+    """AgentState before the append-only reducers: nodes took and returned the whole state."""
+    messages: List[BaseMessage] = Field(default_factory=list)
+    current_gaia_question: Optional[str] = None
+    iteration: int = 0
+    intermediate_steps_log: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+def event_size(payload: Dict[str, Any]) -> int:
+    """Bytes of one stream event carrying `payload`."""
+    payload = {**payload, "messages": messages_to_dict(payload.get("messages") or [])}
+    return len(json.dumps(payload, default=str))
+
+
+async def consume_updates(graph, state, config):
+    from app.main import RunLog
+
+    run, times, size = RunLog(), [], 0
+    async for event in graph.astream(state, config=config, stream_mode="updates"):
+        for node, update in event.items():
+            if isinstance(update, dict):
+                size = event_size(update)
+            for step in run.apply(update):
+                run.detail(step).model_dump()
+            if node == "tools":
+                times.append(time.perf_counter())
+    return run.answer(), times, size
+
+
+async def consume_values(graph, state, config):
+    from langchain_core.messages import AIMessage, ToolMessage
+    from app.schemas import StepDetail
+
+    steps_sent, answer, times, size = 0, None, [], 0
+    async for values in graph.astream(state, config=config, stream_mode="values"):
+        values = dict(PreviousAgentState.model_validate(values))
+        size = event_size(values)
+        observations = {}
+        for message in values.get("messages", []):
+            if isinstance(message, ToolMessage):
+                observations[message.tool_call_id] = message.text
+            elif isinstance(message, AIMessage) and not message.tool_calls:
+                answer = message.text
+        steps = values.get("intermediate_steps_log", [])
+        for step in steps[steps_sent:]:
+            if step["type"] == "tool_observation":
+                step = {**step, "content": {**step["content"], "content": observations.get(step["content"]["tool_call_id"], "")}}
+            StepDetail(**step).model_dump()
+        steps_sent = len(steps)
+        if values.get("messages") and isinstance(values["messages"][-1], ToolMessage):
+            times.append(time.perf_counter())
+    return answer, times, size
+
+
+async def run(args) -> None:
+    from langchain_core.messages import HumanMessage
+    import app.search
+    from app.agent import Replace, get_compiled_agent
+    from app.search import MockSearchBackend, SearchClient
+
+    app.search._search_client = SearchClient(MockSearchBackend(), max_entries=0, timeout=30)
+    question = "What did each step find?"
+    print(f"Looping fake model, one mock web search per round, checkpointer {args.checkpointer}")
+    print(f"{'rounds':>6} {'updates us/round':>17} {'last 10':>9} {'event B':>8} "
+          f"{'values us/round':>16} {'last 10':>9} {'event B':>8}")
+    run_id = 0
+    for rounds in args.rounds:
+        graph = get_compiled_agent(llm=LoopingToolModel(rounds=rounds), checkpointer_backend=args.checkpointer)
+        row = []
+        for consume in (consume_updates, consume_values):
+            per_round, last, size = [], [], 0
+            for _ in range(args.repeats):
+                run_id += 1
+                config = {"configurable": {"thread_id": f"bench-{run_id}"}, "recursion_limit": 2 * rounds + 10}
+                state = {"messages": Replace([HumanMessage(content=question)]), "current_gaia_question": question,
+                         "iteration": 0, "intermediate_steps_log": Replace()}
+                start = time.perf_counter()
+                answer, times, size = await consume(graph, state, config)
+                assert answer and len(times) == rounds, f"expected {rounds} tool rounds and an answer"
+                per_round.append((times[-1] - start) / rounds)
+                tail = times[-11:]
+                last.append((tail[-1] - tail[0]) / (len(tail) - 1))
+            row.append((min(per_round), min(last), size))
+        (updates, updates_last, updates_size), (values, values_last, values_size) = row
+        print(f"{rounds:>6} {updates * 1e6:>17.0f} {updates_last * 1e6:>9.0f} {updates_size:>8} "
+              f"{values * 1e6:>16.0f} {values_last * 1e6:>9.0f} {values_size:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-step overhead of long agent runs")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 50, 100, 200, 400], help="Tool rounds per run")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per setup (the fastest is reported)")
+    parser.add_argument("--checkpointer", default="none", choices=["none", "bounded", "memory"], help="Checkpointer backend")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # The per-question iteration cap is read at import; the runs here are longer on purpose
+    os.environ.update({"MAX_AGENT_ITERATIONS": str(max(args.rounds) + 1), "ANSWER_CACHE_BACKEND": "none",
+                       "LITELLM_LOCAL_MODEL_COST_MAP": "True"})
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
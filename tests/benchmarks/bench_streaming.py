@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-byte benchmark for /invoke/stream.
+
+Runs the API and a streaming stub LLM under uvicorn, then compares how long a
+client waits for anything with /invoke versus for the first token event of
+/invoke/stream. It also disconnects mid-stream and checks that the abandoned
+run stopped pulling tokens from the LLM.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import create_app, free_port, serve_in_thread, wait_until_ready
+
+NO_STORE = {"Cache-Control": "no-store"}  # Every request must reach the model
+
+
+async def run(api_url: str, stub, latency: float, requests: int) -> None:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=None) as client:
+        await wait_until_ready(client)
+        invoke_walls, first_tokens, stream_walls = [], [], []
+        for i in range(requests):
+            start = time.perf_counter()
+            (await client.post("/invoke", json={"question": f"Blocking question {i}"}, headers=NO_STORE)).raise_for_status()
+            invoke_walls.append(time.perf_counter() - start)
+
+            start, first_token, events = time.perf_counter(), None, {}
+            async with client.stream("POST", "/invoke/stream", json={"question": f"Streamed question {i}"}, headers=NO_STORE) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                        events[event] = events.get(event, 0) + 1
+                        if event == "token" and first_token is None:
+                            first_token = time.perf_counter() - start
+            stream_walls.append(time.perf_counter() - start)
+            first_tokens.append(first_token)
+            assert events.get("answer") == 1, f"stream ended without an answer: {events}"
+
+        mean = lambda xs: sum(xs) / len(xs) * 1000
+        print(f"Stub time to first token:        {latency * 1000:8.1f}ms")
+        print(f"/invoke        first byte:       {mean(invoke_walls):8.1f}ms  (whole answer)")
+        print(f"/invoke/stream first token:      {mean(first_tokens):8.1f}ms")
+        print(f"/invoke/stream complete:         {mean(stream_walls):8.1f}ms  events: {events}")
+
+        # Disconnect after the first token; the server should cancel the run and its LLM stream
+        aborted_before = stub.state.streams_aborted
+        async with client.stream("POST", "/invoke/stream", json={"question": "Abandoned question"}, headers=NO_STORE) as response:
+            async for line in response.aiter_lines():
+                if line == "event: token":
+                    break
+        await asyncio.sleep(0.5)
+        aborted = stub.state.streams_aborted - aborted_before
+        print(f"LLM streams aborted on client disconnect: {aborted}")
+        assert aborted == 1, "abandoned stream kept consuming LLM tokens"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first byte of /invoke/stream against a streaming stub LLM")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM time to first token in seconds")
+    parser.add_argument("--token-interval", type=float, default=0.05, help="Stub LLM seconds between streamed words")
+    parser.add_argument("--requests", "-n", type=int, default=3, help="Requests per endpoint")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    port = free_port()
+    os.environ["LLM_PROVIDER"] = "ollama"
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OLLAMA_MODEL_NAME"] = "stub"
+    # Import the app before the server threads start so they never race on module imports
+    from app.main import app
+    stub = create_app(args.latency, token_interval=args.token_interval)
+    serve_in_thread(stub, port)
+    api_url = serve_in_thread(app)
+    asyncio.run(run(api_url, stub, args.latency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
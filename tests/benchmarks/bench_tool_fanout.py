@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tool fan-out benchmark for the ReAct loop.
+
+A scripted model requests K web searches in one message and answers once the
+observations are back; search goes to a mock backend with fixed latency and no
+cache. With parallel tool execution one round costs ~1x the search latency
+instead of Kx, which is what the serial run (tool concurrency 1) shows.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from fakes import ScriptedToolCallingModel
+
+
+async def run(fanout: int, search_latency: float, llm_latency: float, repeats: int) -> None:
+    from langchain_core.messages import HumanMessage
+    import app.search
+    from app.agent import AgentState, get_compiled_agent
+    from app.config import settings
+    from app.search import MockSearchBackend, SearchClient
+
+    backend = MockSearchBackend(latency=search_latency)
+    app.search._search_client = SearchClient(backend, max_entries=0, timeout=30)  # No caching: every call hits the backend
+    llm = ScriptedToolCallingModel(fanout=fanout, latency=llm_latency)
+    question = "Compare several facts"
+
+    for name, concurrency in [("parallel tools", fanout), ("serial tools (concurrency 1)", 1)]:
+        settings.tool_max_concurrency = concurrency
+        graph = get_compiled_agent(llm=llm, checkpointer_backend="none")
+        walls = []
+        for _ in range(repeats):
+            calls_before = backend.calls
+            start = time.perf_counter()
+            final = await graph.ainvoke(AgentState(messages=[HumanMessage(content=question)], current_gaia_question=question))
+            walls.append(time.perf_counter() - start)
+            observations = sum(1 for step in final["intermediate_steps_log"] if step["type"] == "tool_observation")
+            assert observations == fanout and backend.calls - calls_before == fanout, "every tool call should run once"
+        print(f"{name:<30} K={fanout}  mean {sum(walls) / len(walls) * 1000:8.1f}ms  "
+              f"(ideal parallel ~{(search_latency + 2 * llm_latency) * 1000:.0f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ReAct round latency with K parallel tool calls")
+    parser.add_argument("--fanout", "-k", type=int, default=8, help="Tool calls requested in one model turn")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="Mock search latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Scripted model latency in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="Graph runs per scenario")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(run(args.fanout, args.search_latency, args.llm_latency, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling across uvicorn worker processes.
+
+For each worker count, starts `python -m app.main --workers N` with the stub
+provider and shared SQLite stores in a scratch directory, then drives it with
+`load_test.py` (closed loop) and reports throughput and tail latency per count.
+The stub LLM answers instantly by default, so the numbers measure the app's own
+CPU cost per request — the part that extra workers parallelize. The load
+generator is one process and can itself saturate at high worker counts.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from stub_llm_server import free_port
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, "..", ".."))
+
+
+def _wait_ready(url: str, timeout: float) -> None:
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{url}/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def run_workers(workers: int, args, scratch: str) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub",
+        "STUB_LATENCY": str(args.latency), "STUB_SEARCH_LATENCY": "0",
+        "CHECKPOINTER": "sqlite", "ANSWER_CACHE_BACKEND": "sqlite", "SEARCH_CACHE_BACKEND": "sqlite",
+        "CHECKPOINT_PATH": os.path.join(scratch, f"checkpoints-{workers}.sqlite3"),
+        "ANSWER_CACHE_PATH": os.path.join(scratch, f"answers-{workers}.sqlite3"),
+        "SEARCH_CACHE_PATH": os.path.join(scratch, f"search-{workers}.sqlite3"),
+        "SANDBOX_POOL_SIZE": "1",
+        "SCHEDULER_MAX_IN_FLIGHT": str(args.concurrency), "SCHEDULER_MAX_QUEUE": str(args.concurrency),
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+    }
+    server = subprocess.Popen([sys.executable, "-m", "app.main", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    output = os.path.join(scratch, f"result-{workers}.json")
+    try:
+        _wait_ready(url, args.timeout)
+        time.sleep(args.settle)  # Give every worker time to finish its own warm-up
+        subprocess.run([sys.executable, os.path.join(HERE, "load_test.py"), "--base-url", url, "--concurrency", str(args.concurrency),
+                        "--duration", str(args.duration), "--warmup", str(workers * 2), "--output", output],
+                       check=True, stdout=subprocess.DEVNULL)
+    finally:
+        server.terminate()
+        server.wait()
+    with open(output) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /invoke throughput over 1, 2, 4 and 8 uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to test")
+    parser.add_argument("--concurrency", "-c", type=int, default=32, help="Concurrent client requests")
+    parser.add_argument("--duration", "-d", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub LLM time to first token in seconds")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait after the first worker is ready")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the server to become ready")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}, client concurrency: {args.concurrency}, stub latency: {args.latency}s")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50':>9} {'p99':>9} {'errors':>7}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as scratch:
+        for workers in args.workers:
+            result = run_workers(workers, args, scratch)
+            baseline = baseline or result["throughput_rps"]
+            latency = result["latency_seconds"]
+            print(f"{workers:>7} {result['throughput_rps']:>9.1f} {result['throughput_rps'] / baseline:>7.2f}x "
+                  f"{latency['p50'] * 1000:>7.1f}ms {latency['p99'] * 1000:>7.1f}ms {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
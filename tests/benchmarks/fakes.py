@@ -0,0 +1,97 @@
+"""
+In-process fake chat models for benchmarks that should not touch the network.
+"""
+
+import asyncio
+import time
+from typing import Any, List, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+DEFAULT_RESPONSE = "Paris.\n\nReasoning: It is the capital of France.\n\nSource: https://en.wikipedia.org/wiki/Paris"
+
+
+class FakeToolChatModel(FakeListChatModel):
+    """FakeListChatModel that accepts `bind_tools`, like the real providers do."""
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "FakeToolChatModel":
+        return self
+
+
+class ScriptedToolCallingModel(BaseChatModel):
+    """Chat model that plays one ReAct round: first it requests `fanout` tool calls
+    in a single message, then, once observations are present, it answers.
+
+    `latency` is slept per call to stand in for the provider round-trip.
+    """
+
+    fanout: int = 4
+    tool_name: str = "web_search"
+    latency: float = 0.0
+    answer: str = DEFAULT_RESPONSE
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-tool-calling"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedToolCallingModel":
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        if any(isinstance(m, ToolMessage) for m in messages):
+            message = AIMessage(content=self.answer)
+        else:
+            message = AIMessage(content="", tool_calls=[
+                {"name": self.tool_name, "args": {"query": f"sub-question {i}"}, "id": f"call_{i}"}
+                for i in range(self.fanout)
+            ])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+class LoopingToolModel(BaseChatModel):
+    """Chat model that requests one tool call per turn for `rounds` turns, then answers.
+
+    Each reply looks only at the last message, so a turn costs the same however long
+    the conversation has grown: what's left is the agent's own per-step overhead.
+    """
+
+    rounds: int = 10
+    tool_name: str = "web_search"
+    answer: str = DEFAULT_RESPONSE
+
+    @property
+    def _llm_type(self) -> str:
+        return "looping-tool-calling"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "LoopingToolModel":
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        last = messages[-1]
+        turn = int(last.tool_call_id.rsplit("_", 1)[1]) + 1 if isinstance(last, ToolMessage) else 0
+        if turn >= self.rounds:
+            message = AIMessage(content=self.answer)
+        else:
+            message = AIMessage(content="", tool_calls=[
+                {"name": self.tool_name, "args": {"query": f"step {turn}"}, "id": f"call_{turn}"}
+            ])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self._reply(messages)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Load test and latency benchmark for the agent API.
+
+Drives `/invoke` (or `/invoke/stream`) with an async client in one of two modes:
+
+* closed loop (`--concurrency N`): N workers, each sending its next request as
+  soon as the previous one returns;
+* open loop (`--rate R`): requests arrive at R/s (fixed spacing, or Poisson with
+  `--poisson`) whether or not earlier ones have finished. Latency is measured
+  from the scheduled arrival, so a backed-up server cannot hide its queueing.
+
+Without `--base-url` the API and a stub LLM are started locally under uvicorn,
+so runs are reproducible offline: `--llm http` serves the stub over HTTP (through
+the pooled provider client), `--llm stub` uses the in-process `LLM_PROVIDER=stub`
+model with the stub search backend. Results (p50/p95/p99, throughput, error rate,
+status and cache counts) are printed and, with `--output`, written as JSON;
+`--compare` prints the change against an earlier JSON result.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "gaia")))
+
+from stub_llm_server import create_app, free_port, serve_in_thread, wait_until_ready
+from test_api import GAIA_TEST_QUESTIONS
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Collects one sample per request."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_bytes: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.cache: Dict[str, int] = {}
+        self.errors = 0
+
+    def record(self, latency: float, status: str, ok: bool, cache: Optional[str] = None, first_byte: Optional[float] = None) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if cache:
+            self.cache[cache] = self.cache.get(cache, 0) + 1
+        if ok:
+            self.latencies.append(latency)
+            if first_byte is not None:
+                self.first_bytes.append(first_byte)
+        else:
+            self.errors += 1
+
+    def summary(self, wall: float) -> Dict[str, Any]:
+        latencies, first_bytes = sorted(self.latencies), sorted(self.first_bytes)
+        total = len(latencies) + self.errors
+        result = {
+            "requests": total,
+            "successes": len(latencies),
+            "errors": self.errors,
+            "error_rate": self.errors / total if total else 0.0,
+            "wall_seconds": wall,
+            "throughput_rps": len(latencies) / wall if wall else 0.0,
+            "latency_seconds": {
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None,
+            },
+            "statuses": self.statuses,
+            "cache": self.cache,
+        }
+        if first_bytes:
+            result["first_token_seconds"] = {"p50": percentile(first_bytes, 50), "p95": percentile(first_bytes, 95), "p99": percentile(first_bytes, 99)}
+        return result
+
+
+async def send(client, args, recorder: Recorder, i: int, scheduled: float) -> None:
+    """Send request `i` and record its latency measured from `scheduled`."""
+    import httpx
+
+    question = GAIA_TEST_QUESTIONS[i % len(GAIA_TEST_QUESTIONS)]["question"]
+    if args.unique:
+        question = f"{question} (request {i})"
+    headers = {"X-Priority": args.priority}
+    if not args.cache:
+        headers["Cache-Control"] = "no-store"
+    try:
+        if args.stream:
+            first_byte, ok = None, False
+            async with client.stream("POST", "/invoke/stream", json={"question": question}, headers=headers) as response:
+                async for line in response.aiter_lines():
+                    if first_byte is None and line == "event: token":
+                        first_byte = time.perf_counter() - scheduled
+                    elif line == "event: answer":
+                        ok = True
+            recorder.record(time.perf_counter() - scheduled, str(response.status_code), ok and response.status_code == 200, first_byte=first_byte)
+        else:
+            response = await client.post("/invoke", json={"question": question}, headers=headers)
+            recorder.record(time.perf_counter() - scheduled, str(response.status_code), response.status_code == 200, response.headers.get("X-Cache"))
+    except httpx.HTTPError as e:
+        recorder.record(time.perf_counter() - scheduled, type(e).__name__, False)
+
+
+async def closed_loop(client, args, recorder: Recorder) -> None:
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    counter = iter(range(args.requests or sys.maxsize))
+
+    async def worker():
+        for i in counter:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            await send(client, args, recorder, i, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def open_loop(client, args, recorder: Recorder) -> None:
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    scheduled, tasks = start, []
+    for i in range(args.requests or sys.maxsize):
+        if args.duration and scheduled - start >= args.duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(client, args, recorder, i, scheduled)))
+        scheduled += rng.expovariate(args.rate) if args.poisson else 1 / args.rate
+    await asyncio.gather(*tasks)
+
+
+async def run(api_url: str, args) -> Dict[str, Any]:
+    import httpx
+
+    recorder = Recorder()
+    # Open loop must never be throttled by the client's own pool
+    limits = httpx.Limits(max_connections=None if args.rate else args.concurrency, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client)
+        for i in range(args.warmup):
+            await send(client, args, Recorder(), -1 - i, time.perf_counter())
+        start = time.perf_counter()
+        await (open_loop if args.rate else closed_loop)(client, args, recorder)
+        wall = time.perf_counter() - start
+    return recorder.summary(wall)
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value * 1000:9.1f}ms" if value is not None else "        n/a"
+
+
+def report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    mode = result["config"]
+    print(f"Mode:          {'open loop @ %.1f req/s' % mode['rate'] if mode['rate'] else 'closed loop x%d' % mode['concurrency']}"
+          f"{' (stream)' if mode['stream'] else ''}")
+    print(f"Requests:      {result['requests']} ({result['errors']} errors, {result['error_rate']:.1%})")
+    print(f"Throughput:    {result['throughput_rps']:.2f} req/s over {result['wall_seconds']:.2f}s")
+    for key in ("mean", "p50", "p95", "p99", "max"):
+        line = f"Latency {key:<5} {_ms(result['latency_seconds'][key])}"
+        before = (baseline or {}).get("latency_seconds", {}).get(key)
+        if before and result["latency_seconds"][key] is not None:
+            line += f"   ({result['latency_seconds'][key] / before - 1:+.1%} vs baseline)"
+        print(line)
+    if "first_token_seconds" in result:
+        print(f"First token:   p50 {_ms(result['first_token_seconds']['p50'])}  p99 {_ms(result['first_token_seconds']['p99'])}")
+    if baseline and baseline.get("throughput_rps"):
+        print(f"Throughput vs baseline: {result['throughput_rps'] / baseline['throughput_rps'] - 1:+.1%}")
+    print(f"Statuses:      {result['statuses']}")
+    if result["cache"]:
+        print(f"X-Cache:       {result['cache']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the agent API and report latency percentiles")
+    parser.add_argument("--base-url", help="API to test; when omitted the API and a stub LLM are started locally")
+    loop = parser.add_mutually_exclusive_group()
+    loop.add_argument("--concurrency", "-c", type=int, default=8, help="Closed loop: number of concurrent workers")
+    loop.add_argument("--rate", "-r", type=float, help="Open loop: request arrival rate per second")
+    parser.add_argument("--poisson", action="store_true", help="Open loop: exponential inter-arrival times instead of fixed spacing")
+    parser.add_argument("--requests", "-n", type=int, help="Total requests (default 200 unless --duration is given)")
+    parser.add_argument("--duration", "-d", type=float, help="Stop issuing requests after this many seconds")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests sent first")
+    parser.add_argument("--stream", action="store_true", help="Use /invoke/stream and also report time to first token")
+    parser.add_argument("--cache", action="store_true", help="Allow answer cache hits (by default every request reaches the model)")
+    parser.add_argument("--unique", action="store_true", help="Make every question distinct (defeats similarity caching)")
+    parser.add_argument("--priority", default="interactive", help="X-Priority header value")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for Poisson arrivals")
+    parser.add_argument("--llm", choices=("http", "stub"), default="http", help="Local mode: stub LLM served over HTTP, or the in-process stub provider")
+    parser.add_argument("--latency", type=float, default=0.5, help="Local stub LLM latency in seconds")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="Local stub LLM seconds between streamed words")
+    parser.add_argument("--output", "-o", help="Write the result as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON result to compare against")
+    args = parser.parse_args()
+    if not args.requests and not args.duration:
+        args.requests = 200
+
+    api_url = args.base_url
+    if api_url is None:
+        logging.disable(logging.INFO)  # Per-request agent logs would drown the report
+        if args.llm == "stub":
+            os.environ.update({"LLM_PROVIDER": "stub", "SEARCH_BACKEND": "stub", "STUB_LATENCY": str(args.latency),
+                               "STUB_TOKEN_INTERVAL": str(args.token_interval)})
+            from app.main import app
+        else:
+            port = free_port()
+            os.environ["LLM_PROVIDER"] = "ollama"
+            os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+            os.environ["OLLAMA_MODEL_NAME"] = "stub"
+            # Import the app before the server threads start so they never race on module imports
+            from app.main import app
+            serve_in_thread(create_app(args.latency, token_interval=args.token_interval), port)
+        api_url = serve_in_thread(app)
+
+    result = asyncio.run(run(api_url, args))
+    result["config"] = {
+        "target": args.base_url or "local-stub",
+        "concurrency": None if args.rate else args.concurrency,
+        "rate": args.rate,
+        "poisson": args.poisson,
+        "stream": args.stream,
+        "cache": args.cache,
+        "llm": None if args.base_url else args.llm,
+        "stub_latency": None if args.base_url else args.latency,
+    }
+    result["timestamp"] = datetime.now(timezone.utc).isoformat()
+    result["host"] = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 1 if result["successes"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
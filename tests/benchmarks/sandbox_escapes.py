@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Sandbox escape regression check.
+
+Runs known escape payloads through SandboxPool from a working directory holding a
+`.env` with a random canary secret (also set in the server's environment), plus a few
+legitimate snippets that must keep working. A payload escapes if its output contains
+the canary or its ESCAPED marker. On Linux the workers' uid and working directory are
+checked as well, since the static checks alone are not the isolation boundary.
+
+Exits with status 1 if any payload escapes or any legitimate snippet fails.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+# (name, code); every payload prints ESCAPED (or the canary) only if it gets out
+PAYLOADS = [
+    ("functools.update_wrapper copies module globals", """
+import functools, statistics
+def f(): pass
+functools.update_wrapper(f, statistics.mean, assigned=(), updated=("__globals__",))
+print("ESCAPED", sys.modules["builtins"].open(".env").read())
+print(sys.modules["builtins"].open(ENV_PATH).read())
+"""),
+    ("functools.wraps copies module globals", """
+import functools, statistics
+@functools.wraps(statistics.mean, assigned=(), updated=("__globals__",))
+def f(): pass
+print("ESCAPED", sys.modules["os"].environ)
+"""),
+    ("singledispatch evaluates string annotations", """
+import functools
+@functools.singledispatch
+def f(x): pass
+def g(x: "[c for c in ().__class__.__base__.__subclasses__() if c.__name__ == 'catch_warnings'][0]"): pass
+f.register(g)
+print("ESCAPED")
+"""),
+    ("object subclasses", "print('ESCAPED', ().__class__.__bases__[0].__subclasses__())"),
+    ("function globals", "def f(): pass\nprint('ESCAPED', f.__globals__)"),
+    ("sys through an allowed module", "import datetime\nprint('ESCAPED', datetime.sys.modules['os'].environ)"),
+    ("os through a private member", "import random\nprint('ESCAPED', random._os.environ)"),
+    ("operator.attrgetter", "import operator\nprint('ESCAPED', operator.attrgetter('__globals__'))"),
+    ("str.format attribute field", "print('ESCAPED', '{0.__class__.__base__}'.format(1))"),
+    ("str.format on a variable", "template = '{0.__globals__}'\ndef f(): pass\nprint('ESCAPED', template.format(f))"),
+    ("string.Formatter.get_field", "import string\nprint('ESCAPED', string.Formatter().get_field)"),
+    ("generator frame", "g = (x for x in [1])\nprint('ESCAPED', g.gi_frame.f_back.f_globals)"),
+    ("plain import of os", "import os\nprint('ESCAPED', os.environ)"),
+    ("open builtin", "print('ESCAPED', open('.env').read())"),
+]
+
+LEGITIMATE = [
+    ("functools.reduce", "from functools import reduce\nprint(reduce(lambda a, b: a * b, range(1, 6)))", "120"),
+    ("functools.lru_cache", "import functools\n@functools.lru_cache(None)\ndef fib(n): return n if n < 2 else fib(n - 1) + fib(n - 2)\nprint(fib(50))", "12586269025"),
+    ("statistics", "import statistics\nprint(statistics.mean([1, 2, 3, 4]))", "2.5"),
+    ("datetime", "import datetime\nprint((datetime.date(2024, 3, 1) - datetime.date(2024, 2, 1)).days)", "29"),
+    ("str.format literal", "print('{:.2f} {name}'.format(3.14159, name='pi'))", "3.14 pi"),
+]
+
+
+def _worker_isolation(pool) -> list:
+    """Problems with the workers' uid and working directory, read from /proc (Linux only)."""
+    problems = []
+    for worker in pool._workers:
+        proc = f"/proc/{worker.process.pid}"
+        if not os.path.isdir(proc):
+            return []
+        if pool.user and os.geteuid() == 0 and os.stat(proc).st_uid == 0:
+            problems.append(f"worker {worker.process.pid} still runs as root")
+        cwd = os.readlink(f"{proc}/cwd")
+        if not cwd.endswith("(deleted)"):
+            problems.append(f"worker {worker.process.pid} runs in {cwd}")
+    return problems
+
+
+async def run(verbose: bool) -> int:
+    from app.sandbox import SandboxPool
+
+    canary = secrets.token_hex(16)
+    workdir = tempfile.mkdtemp(prefix="sandbox-escapes-")
+    env_path = os.path.join(workdir, ".env")
+    with open(env_path, "w") as f:
+        f.write(f"OPENROUTER_API_KEY={canary}\n")
+    os.chmod(env_path, 0o600)
+    os.environ["OPENROUTER_API_KEY"] = canary
+    os.chdir(workdir)
+
+    pool = SandboxPool(size=2, timeout=10, cpu_seconds=10)
+    await pool.start()
+    failures = 0
+    try:
+        for problem in _worker_isolation(pool):
+            print(f"NOT ISOLATED  {problem}")
+            failures += 1
+        for name, code in PAYLOADS:
+            text = (await pool.run(code.replace("ENV_PATH", repr(env_path)))).to_text()
+            escaped = canary in text or "ESCAPED" in text
+            failures += escaped
+            print(f"{'ESCAPED' if escaped else 'blocked':<13} {name}")
+            if verbose or escaped:
+                print(f"              {text.strip()[:300]}")
+        for name, code, expected in LEGITIMATE:
+            text = (await pool.run(code)).to_text()
+            ok = expected in text
+            failures += not ok
+            print(f"{'ok' if ok else 'BROKEN':<13} {name}")
+            if verbose or not ok:
+                print(f"              {text.strip()[:300]}")
+    finally:
+        await pool.close()
+        os.remove(env_path)
+        os.rmdir(workdir)
+    print(f"\n{failures} failure(s)")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that known sandbox escapes stay blocked")
+    parser.add_argument("--verbose", action="store_true", help="Print every snippet's output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(asyncio.run(run(args.verbose)))
+
+
+if __name__ == "__main__":
+    main()
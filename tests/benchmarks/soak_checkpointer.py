@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Checkpointer soak test.
+
+Runs the compiled agent graph many times with a fresh thread_id per invocation,
+exactly like /invoke does, using a fake in-process LLM. Prints RSS and checkpoint
+store size as it goes and exits non-zero if memory keeps growing after warm-up.
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+def rss_mb() -> float:
+    """Current resident set size in MiB (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+async def run(iterations: int, backend: str, report_every: int, max_growth_mb: float) -> bool:
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import HumanMessage
+    from app.agent import get_compiled_agent, AgentState
+    from app.checkpoint import checkpointer_stats
+
+    llm = FakeListChatModel(responses=["Paris.\n\nReasoning: It is the capital.\n\nSource: https://example.org/paris"])
+    graph = get_compiled_agent(llm=llm, checkpointer_backend=backend)
+
+    baseline = None
+    start = time.perf_counter()
+    for i in range(1, iterations + 1):
+        question = f"What is the capital of France? ({i})"
+        state = AgentState(messages=[HumanMessage(content=question)], current_gaia_question=question)
+        await graph.ainvoke(state, config={"configurable": {"thread_id": str(uuid4())}})
+        if i % report_every == 0:
+            gc.collect()
+            stats = checkpointer_stats(graph.checkpointer)
+            rss = rss_mb()
+            if baseline is None:
+                baseline = rss  # First report is the post-warm-up baseline
+            rate = i / (time.perf_counter() - start)
+            print(f"{i:>8} invocations | RSS {rss:8.1f} MiB ({rss - baseline:+.1f}) | "
+                  f"threads {stats.get('threads', '-'):>6} | checkpoints {stats.get('checkpoints', '-'):>7} | "
+                  f"bytes {stats.get('bytes', '-'):>10} | {rate:.0f} inv/s")
+
+    growth = rss_mb() - (baseline or rss_mb())
+    print(f"\nRSS growth after warm-up: {growth:+.1f} MiB (limit {max_growth_mb} MiB)")
+    return growth <= max_growth_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test the agent checkpointer for memory growth")
+    parser.add_argument("--iterations", "-n", type=int, default=100_000, help="Number of graph invocations")
+    parser.add_argument("--backend", default="bounded", choices=["bounded", "memory", "none"], help="Checkpointer backend")
+    parser.add_argument("--report-every", type=int, default=10_000, help="Print stats every N invocations")
+    parser.add_argument("--max-growth-mb", type=float, default=20.0, help="Allowed RSS growth after warm-up")
+    args = parser.parse_args()
+
+    os.environ["CHECKPOINT_MAX_THREADS"] = os.environ.get("CHECKPOINT_MAX_THREADS", "1000")
+    logging.disable(logging.WARNING)
+    ok = asyncio.run(run(args.iterations, args.backend, args.report_every, args.max_growth_mb))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
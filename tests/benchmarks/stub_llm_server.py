@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI-compatible LLM server for offline benchmarks.
+
+Serves `/v1/chat/completions` with a canned answer after a fixed delay, so the
+agent API can be exercised without OpenRouter or Ollama. Streaming requests get
+the first chunk after the delay and one word per `token_interval` after that. Point the app at it
+with `LLM_PROVIDER=ollama` and `OLLAMA_BASE_URL=http://127.0.0.1:<port>/v1`.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+from typing import Any, Dict
+from uuid import uuid4
+
+import uvicorn
+from fastapi import Body, FastAPI
+from fastapi.responses import StreamingResponse
+
+DEFAULT_ANSWER = "Paris is the capital of France.\n\nReasoning: It is the seat of the French government.\n\nSource: https://en.wikipedia.org/wiki/Paris"
+
+
+def create_app(latency: float = 0.5, answer: str = DEFAULT_ANSWER, token_interval: float = 0.02) -> FastAPI:
+    """Build a stub app that answers every chat completion after `latency` seconds.
+
+    `app.state` counts requests, and streams that were completed or aborted by the client.
+    """
+    app = FastAPI(title="Stub LLM")
+    app.state.requests = 0
+    app.state.streams_completed = 0
+    app.state.streams_aborted = 0
+
+    def usage(payload: Dict[str, Any]) -> Dict[str, int]:
+        """Whitespace-token counts, so token metrics and prompt-size benchmarks see real numbers."""
+        prompt = sum(len(str(m.get("content") or "").split()) for m in payload.get("messages", []))
+        completion = len(answer.split())
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    async def stream_chunks(payload: Dict[str, Any]):
+        model = payload.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid4().hex}"
+
+        def chunk(delta: Dict[str, Any], finish_reason=None) -> str:
+            body = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(body)}\n\n"
+
+        completed = False
+        try:
+            await asyncio.sleep(latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(re.findall(r"\S+\s*", answer)):
+                if i and token_interval:
+                    await asyncio.sleep(token_interval)
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [], 'usage': usage(payload)})}\n\n"
+            yield "data: [DONE]\n\n"
+            completed = True
+        finally:
+            if completed:
+                app.state.streams_completed += 1
+            else:
+                app.state.streams_aborted += 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: Dict[str, Any] = Body(...)):
+        app.state.requests += 1
+        if payload.get("stream"):
+            return StreamingResponse(stream_chunks(payload), media_type="text/event-stream")
+        await asyncio.sleep(latency)
+        return {
+            "id": f"chatcmpl-{uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": usage(payload),
+        }
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(app, port: int = 0) -> str:
+    """Serve an ASGI app with uvicorn in a daemon thread and return its base URL."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def wait_until_ready(client, timeout: float = 60.0) -> None:
+    """Poll the agent API's /ready until the agent is warm.
+
+    With STARTUP_BACKGROUND_WARMUP the API serves requests while the graph compiles and the
+    sandbox starts, so a benchmark that starts timing right after startup measures the warm-up.
+    """
+    deadline = time.monotonic() + timeout
+    while (await client.get("/ready")).status_code != 200:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"agent API not ready after {timeout:g}s")
+        await asyncio.sleep(0.05)
+
+
+def start_in_thread(latency: float = 0.5, port: int = 0) -> str:
+    """Start the stub server in a daemon thread and return its OpenAI base URL."""
+    return serve_in_thread(create_app(latency), port) + "/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8100, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before answering")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="Seconds between streamed words")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, token_interval=args.token_interval), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -47,15 +47,22 @@ GAIA_TEST_QUESTIONS = [
     }
 ]
 
-def test_api_health(base_url: str) -> bool:
-    """Test if the API is healthy and running."""
+def test_api_health(base_url: str, ready_timeout: float = 60.0) -> bool:
+    """Test if the API is healthy and running, waiting up to `ready_timeout` seconds for the agent to warm up."""
     try:
         response = requests.get(f"{base_url}/health")
-        if response.status_code == 200:
-            health_data = response.json()
-            print(f"API Health: {health_data}")
-            return health_data.get("status") == "healthy" and health_data.get("agent_status") == "initialized"
-        return False
+        if response.status_code != 200:
+            return False
+        print(f"API Health: {response.json()}")
+        deadline = time.time() + ready_timeout
+        while True:
+            ready = requests.get(f"{base_url}/ready")
+            if ready.status_code == 200:
+                return True
+            if ready.json().get("status") != "warming" or time.time() >= deadline:
+                print(f"API not ready: {ready.json()}")
+                return False
+            time.sleep(0.5)
     except requests.RequestException as e:
         print(f"Error checking API health: {e}")
         return False
@@ -151,11 +158,55 @@ def test_question(base_url: str, question: Dict[str, Any], verbose: bool = False
             "elapsed_time": time.time() - start_time
         }
 
+def test_batch(base_url: str, questions: List[Dict[str, Any]], max_concurrency: Optional[int] = None, verbose: bool = False) -> List[Dict[str, Any]]:
+    """Test all questions with one /invoke/batch request and return per-question results."""
+    print(f"\nTesting {len(questions)} questions with /invoke/batch (max_concurrency={max_concurrency})")
+    payload = {"questions": [{"question": q["question"]} for q in questions]}
+    if max_concurrency:
+        payload["max_concurrency"] = max_concurrency
+    
+    start_time = time.time()
+    try:
+        response = requests.post(f"{base_url}/invoke/batch", json=payload, headers={"Content-Type": "application/json"})
+    except requests.RequestException as e:
+        return [{"question_id": q["id"], "success": False, "error": f"Request error: {str(e)}", "elapsed_time": time.time() - start_time} for q in questions]
+    elapsed_time = time.time() - start_time
+    
+    if response.status_code != 200:
+        return [{"question_id": q["id"], "success": False, "error": f"HTTP Error: {response.status_code}", "elapsed_time": elapsed_time} for q in questions]
+    
+    batch_data = response.json()
+    print(f"Batch completed in {elapsed_time:.2f} seconds ({batch_data['unique_questions']} unique questions, {batch_data['errors']} errors)")
+    
+    results = []
+    for question, item in zip(questions, batch_data["results"]):
+        if verbose:
+            print(f"\nResponse for question {question['id']}:")
+            print(json.dumps(item, indent=2))
+        if item.get("error"):
+            results.append({"question_id": question["id"], "success": False, "error": item["error"], "elapsed_time": elapsed_time})
+            continue
+        validation_errors = validate_gaia_answer(item.get("answer") or {})
+        if validation_errors:
+            results.append({"question_id": question["id"], "success": False, "error": f"Validation errors: {', '.join(validation_errors)}", "elapsed_time": elapsed_time})
+            continue
+        results.append({
+            "question_id": question["id"],
+            "success": True,
+            "elapsed_time": elapsed_time,
+            "answer_length": len(item["answer"].get("answer", "")),
+            "has_reasoning": bool(item["answer"].get("reasoning", "")),
+            "has_sources": len(item["answer"].get("sources", [])) > 0
+        })
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description="Test the GAIA Pathfinder Agent API")
     parser.add_argument("--base-url", default="http://localhost:8000", help="Base URL of the API")
     parser.add_argument("--question-id", type=int, help="Test only a specific question ID")
     parser.add_argument("--verbose", "-v", action="store_true", help="Show full responses")
+    parser.add_argument("--batch", action="store_true", help="Send all questions in one /invoke/batch request")
+    parser.add_argument("--max-concurrency", type=int, help="Concurrent agent runs for --batch (server default if omitted)")
     args = parser.parse_args()
     
     print(f"Testing GAIA Pathfinder Agent API at {args.base_url}")
@@ -179,9 +230,12 @@ def main():
     
     # Run tests
     results = []
-    for question in questions_to_test:
-        result = test_question(args.base_url, question, args.verbose)
-        results.append(result)
+    if args.batch:
+        results = test_batch(args.base_url, questions_to_test, args.max_concurrency, args.verbose)
+    else:
+        for question in questions_to_test:
+            result = test_question(args.base_url, question, args.verbose)
+            results.append(result)
     
     # Print summary
     print("\n=== Test Summary ===")